@@ -0,0 +1,102 @@
+"""
+Microbenchmark of the JSON work done per model request.
+
+Compares the previous path with the fast codec path for payloads of growing size.
+The previous path parses the request body, runs FastAPI's jsonable_encoder and
+stdlib json on the response, and parses the response again in the logger
+middleware. The fast path parses the request once and encodes the response once,
+with either the stdlib or the orjson codec.
+
+Payloads are chat requests with a long conversationHistory, and the response
+carries about as much data as the request, like a summarize call would.
+
+Usage:
+    python benchmarks/jsonCodecBenchmark.py [--sizes-kb 1 10 100 1024 10240] [--min-seconds 0.5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from fastapi.encoders import jsonable_encoder
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.jsonCodec import JSONCodec, orjson
+
+def build_payload(size_bytes):
+    """
+    Build a chat request of roughly the given encoded size
+
+    Returns:
+        tuple: Encoded request body and the response object for it
+    """
+    turn = {"actor": "user", "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 2}
+    turn_size = len(json.dumps(turn)) + 1
+    turns = max(1, size_bytes // turn_size)
+
+    request = {
+        "modelName": "echo",
+        "userMessage": "Summarize our conversation so far",
+        "conversationHistory": [dict(turn) for _ in range(turns)]
+    }
+    response = {
+        "actor": "model",
+        "content": " ".join(item["content"] for item in request["conversationHistory"])
+    }
+    return json.dumps(request).encode("utf-8"), response
+
+def previous_path(body, response):
+    request = json.loads(body)
+    encoded = json.dumps(jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    json.loads(encoded)
+    return request
+
+def make_fast_path(codec):
+    def fast_path(body, response):
+        request = codec.loads(body)
+        codec.dumps(response)
+        return request
+    return fast_path
+
+def measure(function, body, response, min_seconds):
+    """
+    Returns:
+        float: Mean milliseconds per call
+    """
+    function(body, response)
+
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function(body, response)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds and calls >= 3:
+            return elapsed / calls * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-kb", type=float, nargs="+", default=[1, 10, 100, 1024, 10240])
+    parser.add_argument("--min-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    paths = [("previous", previous_path), ("fast stdlib", make_fast_path(JSONCodec("stdlib")))]
+
+    if orjson is not None:
+        paths.append(("fast orjson", make_fast_path(JSONCodec("orjson"))))
+    else:
+        print("orjson is not installed, only the stdlib codec is measured")
+
+    print(f"{'payload':>10}" + "".join(f" {name + ' ms':>16}" for name, _ in paths) + f" {'best speedup':>13}")
+    for size_kb in args.sizes_kb:
+        body, response = build_payload(int(size_kb * 1024))
+        timings = [measure(function, body, response, args.min_seconds) for _, function in paths]
+        print(
+            f"{len(body) / 1024:>8.0f}KB"
+            + "".join(f" {timing:>16.3f}" for timing in timings)
+            + f" {timings[0] / min(timings[1:]):>12.2f}x"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,552 @@
+"""
+Load test of backend-py with a saved report for comparing runs.
+
+Runs the real app with its middlewares, model manager, log shipping and
+registry heartbeats, either in-process through raw ASGI calls or as a server
+process on a local socket. The logger and the registry are replaced by a local
+stub that accepts and counts their calls. Each scenario drives one model:
+
+    echo         EchoModel through /api/process/chat
+    py-summary   PySummary through /api/process/summarize (unique texts, so cache misses)
+    bench-cpu    synthetic CPU-bound model running sha256 rounds in the executor pool
+    bench-sleep  synthetic model awaiting a fixed delay, like a call to a remote model
+
+with closed-loop load (a fixed number of clients sending back to back) and/or
+open-loop load (requests sent at a fixed rate whether or not earlier ones have
+finished; latency is measured from the scheduled send time, so queueing delay
+is not hidden). Reports throughput, p50/p95/p99 latency, errors and server
+memory, optionally saves them as JSON and compares them against a baseline.
+
+Usage:
+    python benchmarks/loadBenchmark.py [--transport inprocess socket] [--models echo py-summary bench-cpu bench-sleep]
+        [--load closed open] [--clients 16] [--rate 200] [--seconds 10] [--warmup-seconds 2]
+        [--output results.json] [--baseline baseline.json] [--threshold 10] [--fail-on-regression]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import hashlib
+import argparse
+import platform
+import resource
+import subprocess
+
+import aiohttp
+from aiohttp import web
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_PATH)
+from src.models.baseModel import BaseModel, ModelType
+
+class BenchCpuModel(BaseModel):
+    """
+    Synthetic model that burns CPU in process_sync, so it runs in the executor pool
+    """
+
+    MODEL_NAME = "bench-cpu"
+    MODEL_TYPE = ModelType.CHAT
+    ROUNDS = int(os.environ.get("BENCH_CPU_ROUNDS", 2000))
+
+    def __init__(self):
+        super().__init__()
+
+    def process_sync(self, input_data):
+        digest = input_data.get("userMessage", "").encode("utf-8")
+        for _ in range(self.ROUNDS):
+            digest = hashlib.sha256(digest).digest()
+        return {"actor": "model", "content": digest.hex()}
+
+class BenchSleepModel(BaseModel):
+    """
+    Synthetic model that waits without using CPU
+    """
+
+    MODEL_NAME = "bench-sleep"
+    MODEL_TYPE = ModelType.CHAT
+    SLEEP_MS = float(os.environ.get("BENCH_SLEEP_MS", 20))
+
+    def __init__(self):
+        super().__init__()
+
+    async def process(self, input_data):
+        await asyncio.sleep(self.SLEEP_MS / 1000)
+        return {"actor": "model", "content": input_data.get("userMessage", "")}
+
+SCENARIOS = {
+    "echo": "/api/process/chat",
+    "py-summary": "/api/process/summarize",
+    "bench-cpu": "/api/process/chat",
+    "bench-sleep": "/api/process/chat"
+}
+
+def build_body(model_name, sequence):
+    """
+    Build a request body, unique per request so responses are not served from cache
+    """
+    if SCENARIOS[model_name].endswith("/summarize"):
+        return json.dumps({"modelName": model_name, "originalText": f"Text number {sequence} to summarize."}).encode()
+    return json.dumps({"modelName": model_name, "userMessage": f"Message number {sequence}", "conversationHistory": []}).encode()
+
+def get_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+def configure_environment(stub_port, extra=None):
+    """
+    Point the service at the stub logger and registry
+    """
+    env = {
+        "LOGGER_URL": f"http://127.0.0.1:{stub_port}",
+        "REGISTRY_URL": f"http://127.0.0.1:{stub_port}",
+        "SERVICE_URL": "http://127.0.0.1:0",
+        "REGISTRY_HEARTBEAT_INTERVAL_MS": "1000",
+        "MODEL_PRELOAD": "all"
+    }
+    env.update(extra or {})
+    os.environ.update(env)
+    return env
+
+class StubServices:
+    """
+    Local stand-in for the logger and registry services that counts their calls
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.counts = {"logs": 0, "logRequests": 0, "registrations": 0, "heartbeats": 0}
+        self.runner = None
+
+    async def start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/api/logs/bulk", self._logs)
+        app.router.add_post("/register", self._count("registrations"))
+        app.router.add_post("/heartbeat", self._count("heartbeats"))
+        app.router.add_delete("/unregister", self._count(None))
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", self.port, reuse_address=True).start()
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def _logs(self, request):
+        body = await request.read()
+        self.counts["logRequests"] += 1
+        try:
+            logs = json.loads(body)
+            self.counts["logs"] += len(logs) if isinstance(logs, list) else len(logs.get("logs", []))
+        except ValueError:
+            pass
+        return web.json_response({"success": True}, status=201)
+
+    def _count(self, key):
+        async def handler(request):
+            await request.read()
+            if key is not None:
+                self.counts[key] += 1
+            return web.json_response({"success": True})
+        return handler
+
+class InProcessClient:
+    """
+    Sends requests straight into the ASGI app, without sockets or HTTP parsing
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def post(self, path, body):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"benchmark"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode())
+            ],
+            "client": ("127.0.0.1", 1234),
+            "server": ("127.0.0.1", 3011),
+            "state": {}
+        }
+        request_sent = False
+        response_done = asyncio.Event()
+        status = None
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_done.set()
+
+        await self.app(scope, receive, send)
+        return status
+
+class SocketClient:
+    """
+    Sends requests to a server over a local socket with keep-alive connections
+    """
+
+    def __init__(self, url, connections):
+        self.url = url
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=connections),
+            headers={"Content-Type": "application/json"}
+        )
+
+    async def post(self, path, body):
+        async with self.session.post(f"{self.url}{path}", data=body) as response:
+            await response.read()
+            return response.status
+
+    async def close(self):
+        await self.session.close()
+
+class Recorder:
+    """
+    Collects latencies and errors of one measurement
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.sequence = 0
+
+    def next_sequence(self):
+        self.sequence += 1
+        return self.sequence
+
+    async def send(self, client, model_name, scheduled_time=None):
+        start = time.perf_counter() if scheduled_time is None else scheduled_time
+        try:
+            status = await client.post(SCENARIOS[model_name], build_body(model_name, self.next_sequence()))
+            ok = status == 200
+        except Exception:
+            ok = False
+        if ok:
+            self.latencies.append((time.perf_counter() - start) * 1000)
+        else:
+            self.errors += 1
+
+async def closed_loop(client, model_name, clients, seconds):
+    """
+    Keep `clients` requests in flight, each client sending as soon as its previous request finished
+    """
+    recorder = Recorder()
+    deadline = time.perf_counter() + seconds
+
+    async def run_client():
+        while time.perf_counter() < deadline:
+            await recorder.send(client, model_name)
+
+    await asyncio.gather(*(run_client() for _ in range(clients)))
+    return recorder
+
+async def open_loop(client, model_name, rate, seconds, max_outstanding, poisson):
+    """
+    Send requests at `rate` per second regardless of how fast they complete
+
+    Latency counts from the scheduled send time. Requests that cannot be sent
+    because `max_outstanding` are still running count as errors.
+    """
+    recorder = Recorder()
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    start = time.perf_counter()
+    scheduled = start
+
+    while scheduled < start + seconds:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if len(tasks) >= max_outstanding:
+            recorder.errors += 1
+        else:
+            task = loop.create_task(recorder.send(client, model_name, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        scheduled += random.expovariate(rate) if poisson else 1 / rate
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    return recorder
+
+def percentile(ordered, value):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * value / 100))], 3)
+
+def summarize(recorder, seconds):
+    ordered = sorted(recorder.latencies)
+    return {
+        "requests": len(ordered),
+        "errors": recorder.errors,
+        "throughputRps": round(len(ordered) / seconds, 2),
+        "p50Ms": percentile(ordered, 50),
+        "p95Ms": percentile(ordered, 95),
+        "p99Ms": percentile(ordered, 99),
+        "maxMs": round(ordered[-1], 3) if ordered else None
+    }
+
+def read_memory(pid=None):
+    """
+    Get the current and peak resident memory of a process
+
+    Returns:
+        dict: rssBytes and peakRssBytes, None where not available
+    """
+    memory = {"rssBytes": None, "peakRssBytes": None}
+    try:
+        with open(f"/proc/{pid or 'self'}/status", "r") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    memory["rssBytes"] = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    memory["peakRssBytes"] = int(line.split()[1]) * 1024
+    except OSError:
+        if pid is None:
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            scale = 1 if sys.platform == "darwin" else 1024
+            memory["peakRssBytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return memory
+
+async def measure_scenarios(client, args, pid=None):
+    """
+    Run every requested model and load pattern against a client
+
+    Returns:
+        list: One result per scenario
+    """
+    results = []
+    for model_name in args.models:
+        # Warm up connections, pools and caches of the model
+        if args.warmup_seconds > 0:
+            await closed_loop(client, model_name, args.clients, args.warmup_seconds)
+
+        for load in args.load:
+            if load == "closed":
+                recorder = await closed_loop(client, model_name, args.clients, args.seconds)
+                parameters = {"clients": args.clients}
+            else:
+                recorder = await open_loop(client, model_name, args.rate, args.seconds, args.max_outstanding, args.poisson)
+                parameters = {"rate": args.rate, "poisson": args.poisson}
+
+            result = {"model": model_name, "load": load, **parameters, **summarize(recorder, args.seconds), **read_memory(pid)}
+            results.append(result)
+            print_result(args.current_transport, result)
+    return results
+
+async def run_in_process(args, stubs):
+    """
+    Run the scenarios against the app in this process
+    """
+    import server
+    for model_class in (BenchCpuModel, BenchSleepModel):
+        server.model_manager.add_model_class(model_class)
+
+    await stubs.start()
+    try:
+        async with server.app.router.lifespan_context(server.app):
+            while not server.model_manager.ready:
+                await asyncio.sleep(0.05)
+            return await measure_scenarios(InProcessClient(server.app), args)
+    finally:
+        await stubs.stop()
+
+async def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {process.returncode}")
+            try:
+                async with session.get(f"{url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError("Server did not become ready")
+
+async def run_over_socket(args, stubs, env):
+    """
+    Run the scenarios against a server process over a local socket
+    """
+    port = get_free_port()
+    await stubs.start()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL if not args.server_logs else None
+    )
+    client = None
+    try:
+        url = f"http://127.0.0.1:{port}"
+        await wait_until_ready(url, process)
+        client = SocketClient(url, max(args.clients, args.max_outstanding))
+        return await measure_scenarios(client, args, process.pid)
+    finally:
+        if client is not None:
+            await client.close()
+        process.terminate()
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        await stubs.stop()
+
+def serve(port):
+    """
+    Entry point of the server process of the socket transport
+    """
+    os.environ["BACKEND_PORT"] = str(port)
+    import server
+    for model_class in (BenchCpuModel, BenchSleepModel):
+        server.model_manager.add_model_class(model_class)
+    server.start_server()
+
+def print_result(transport, result):
+    load = f"{result['load']} {result['clients']}c" if result["load"] == "closed" else f"{result['load']} {result['rate']}/s"
+    rss = f"{result['rssBytes'] / 1024 / 1024:.0f}MB" if result["rssBytes"] else "-"
+    latencies = " ".join(
+        f"{result[key]:>8.2f}" if result[key] is not None else f"{'-':>8}" for key in ("p50Ms", "p95Ms", "p99Ms")
+    )
+    print(
+        f"{transport:>10} {result['model']:>12} {load:>14} {result['throughputRps']:>9.1f} "
+        f"{latencies} {result['errors']:>7} {rss:>7}"
+    )
+
+def compare(results, baseline, threshold):
+    """
+    Print the change of every scenario against a baseline run
+
+    Returns:
+        list: Scenarios that regressed by more than `threshold` percent
+    """
+    def key(result):
+        return (result["transport"], result["model"], result["load"])
+
+    previous = {key(result): result for result in baseline.get("results", [])}
+    regressions = []
+
+    print(f"\nCompared with baseline from {baseline.get('meta', {}).get('timestamp', 'unknown')}")
+    print(f"{'transport':>10} {'model':>12} {'load':>8} {'req/s':>9} {'p95':>9} {'p99':>9}")
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+
+        def change(metric):
+            if not before.get(metric) or result.get(metric) is None:
+                return None
+            return (result[metric] - before[metric]) / before[metric] * 100
+
+        throughput, p95, p99 = change("throughputRps"), change("p95Ms"), change("p99Ms")
+        formatted = " ".join(f"{value:>+8.1f}%" if value is not None else f"{'-':>9}" for value in (throughput, p95, p99))
+        regressed = (throughput is not None and throughput < -threshold) or (p95 is not None and p95 > threshold)
+        print(f"{result['transport']:>10} {result['model']:>12} {result['load']:>8} {formatted}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(key(result))
+    return regressions
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_PATH, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", nargs="+", choices=["inprocess", "socket"], default=["inprocess", "socket"])
+    parser.add_argument("--models", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--load", nargs="+", choices=["closed", "open"], default=["closed", "open"])
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients of the closed loop")
+    parser.add_argument("--rate", type=float, default=200, help="requests per second of the open loop")
+    parser.add_argument("--poisson", action="store_true", help="exponential instead of fixed gaps between open-loop requests")
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="open-loop requests in flight before further ones count as errors")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--warmup-seconds", type=float, default=2)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=10, help="percent change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--server-logs", action="store_true", help="show the output of the server process")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    stub_port = get_free_port()
+    env = configure_environment(stub_port)
+    stubs = StubServices(stub_port)
+
+    print(f"{os.cpu_count()} cores, {args.seconds}s per scenario")
+    print(f"{'transport':>10} {'model':>12} {'load':>14} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'rss':>7}")
+
+    results = []
+    for transport in args.transport:
+        args.current_transport = transport
+        if transport == "inprocess":
+            transport_results = asyncio.run(run_in_process(args, stubs))
+        else:
+            transport_results = asyncio.run(run_over_socket(args, stubs, env))
+        results.extend({"transport": transport, **result} for result in transport_results)
+
+    print(f"Stub services received: {stubs.counts}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": get_git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+            "seconds": args.seconds,
+            "warmupSeconds": args.warmup_seconds,
+            "stubCounts": stubs.counts
+        },
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark of the per-request overhead of LoggerMiddleware.
+
+Compares the previous BaseHTTPMiddleware based logger (reproduced below) with the
+current pure ASGI LoggerMiddleware. Both wrap the same echo route and are driven
+with raw ASGI calls, so the numbers only contain framework and middleware work.
+Log shipping is disabled for both.
+
+Usage:
+    python benchmarks/middlewareBenchmark.py [--requests 5000] [--payload-kb 1]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Any
+
+from fastapi import FastAPI, Body, Depends, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.middlewares.logger import LoggerMiddleware
+from src.middlewares.requestBody import get_json_body
+
+class LegacyLoggerMiddleware(BaseHTTPMiddleware):
+    """
+    The logger middleware as it was before the pure ASGI rewrite
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        if '/process/' not in request.url.path:
+            return await call_next(request)
+
+        start_time = time.time()
+        request_body = await request.body()
+
+        model_name = None
+        try:
+            request_json = json.loads(request_body)
+            model_name = request_json.get("modelName")
+        except:
+            pass
+
+        async def receive():
+            return {"type": "http.request", "body": request_body}
+
+        request._receive = receive
+        response = await call_next(request)
+        process_time = time.time() - start_time
+
+        try:
+            request_body_json = json.loads(request_body.decode("utf-8"))
+        except:
+            request_body_json = {}
+
+        log_data = {
+            "timestamp": int(start_time * 1000),
+            "endpoint": request.url.path,
+            "input": request_body_json,
+            "model": model_name,
+            "output": {"content": "backend-py cannot log response currently"},
+            "responseTimeMs": round(process_time * 1000, 2)
+        }
+        return response
+
+def build_legacy_app():
+    app = FastAPI()
+    app.add_middleware(LegacyLoggerMiddleware)
+
+    @app.post("/api/process/chat")
+    async def process_chat(request_data: Dict[str, Any] = Body(...)):
+        return {"actor": "model", "content": request_data.get("userMessage", "")[:32]}
+
+    return app
+
+def build_current_app():
+    app = FastAPI()
+    app.add_middleware(LoggerMiddleware)
+
+    @app.post("/api/process/chat")
+    async def process_chat(request_data: Dict[str, Any] = Depends(get_json_body)):
+        return {"actor": "model", "content": request_data.get("userMessage", "")[:32]}
+
+    return app
+
+async def call(app, body):
+    """
+    Send one POST request straight into the ASGI app
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/process/chat",
+        "raw_path": b"/api/process/chat",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode())
+        ],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 3011),
+        "state": {}
+    }
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    assert status == 200, status
+
+async def measure(app, body, requests):
+    """
+    Returns:
+        float: Mean microseconds per request
+    """
+    for _ in range(min(200, requests)):
+        await call(app, body)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, body)
+    return (time.perf_counter() - start) / requests * 1e6
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--payload-kb", type=float, nargs="+", default=[0.1, 1, 100])
+    args = parser.parse_args()
+
+    legacy_app = build_legacy_app()
+    current_app = build_current_app()
+
+    print(f"{'payload':>10} {'legacy us/req':>14} {'asgi us/req':>12} {'speedup':>8}")
+    for payload_kb in args.payload_kb:
+        body = json.dumps({
+            "modelName": "echo",
+            "userMessage": "x" * int(payload_kb * 1024)
+        }).encode()
+
+        legacy = await measure(legacy_app, body, args.requests)
+        current = await measure(current_app, body, args.requests)
+        print(f"{payload_kb:>8}KB {legacy:>14.1f} {current:>12.1f} {legacy / current:>7.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
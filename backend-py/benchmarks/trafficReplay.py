@@ -0,0 +1,395 @@
+"""
+Capture and replay of real backend-py traffic for regression benchmarking.
+
+A capture is a JSON lines file: a header line, then one record per request
+with its timestamp, endpoint, model, input, status and the responseTimeMs the
+service recorded. Captures come from:
+
+    TRAFFIC_CAPTURE_PATH  set on the service, which appends every /process/ and
+                          job request to that file as it is logged
+    capture               this script, pulling the log records of a time range
+                          from the logger service's /api/query, or converting a
+                          file of log records (a JSON export, a logger query
+                          response or a LOG_SPILL_PATH file)
+
+replay sends the recorded requests to a backend-py instance with the recorded
+gaps between them, divided by --speedup, without waiting for earlier requests
+(open loop; latency counts from the scheduled send time, so queueing delay is
+not hidden). Streaming requests are read to the end. Jobs are sent to the
+synchronous /api/process/ route of their type, so their recorded time also
+includes queueing in the job queue. Chat session turns are not captured, as
+they depend on history kept by the server. A recorded deadline is sent as the
+timeoutMs it left when the request was received.
+
+The report puts the replayed p50/p95/p99 latency of every endpoint and model
+next to the same percentiles of the recorded responseTimeMs, with errors and
+requests whose status differs from the recorded one. Recorded times are
+measured inside the service and replayed ones at the client, so compare a
+replay against a baseline replay when the difference matters.
+
+Usage:
+    python benchmarks/trafficReplay.py capture --logger-url http://localhost:3010
+        [--start 2026-10-01T12:00:00] [--end 2026-10-01T13:00:00 | --minutes 60] --output capture.jsonl
+    python benchmarks/trafficReplay.py capture --input logs.json --output capture.jsonl
+    python benchmarks/trafficReplay.py replay capture.jsonl --target http://localhost:3011
+        [--speedup 1] [--max-gap-seconds 5] [--limit 1000] [--models chat-model ...]
+        [--model-map old-model=new-model ...] [--output report.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import aiohttp
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_PATH)
+from src.jsonCodec import json_codec
+from src.requestContext import TIMEOUT_FIELD, DEADLINE_FIELD
+from src.middlewares.trafficCapture import read_capture, write_capture, to_capture_record
+
+def parse_time(value):
+    """
+    Parse a command line time into milliseconds since the epoch
+
+    Args:
+        value (str): ISO 8601 time, local time if no offset is given, or milliseconds
+
+    Returns:
+        int: Milliseconds since the epoch
+    """
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp() * 1000)
+
+async def fetch_logs(logger_url, start_timestamp, end_timestamp, page_size):
+    """
+    Page through the logs of a time range in the logger service
+
+    Args:
+        logger_url (str): Base URL of the logger service
+        start_timestamp (int): Start of the range in milliseconds
+        end_timestamp (int): End of the range in milliseconds
+        page_size (int): Records per query
+
+    Returns:
+        list: The log records
+    """
+    logs = []
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60)) as session:
+        page = 1
+        while True:
+            query = {"startTimestamp": start_timestamp, "endTimestamp": end_timestamp, "pageSize": page_size, "page": page}
+            async with session.post(f"{logger_url}/api/query", json=query) as response:
+                response.raise_for_status()
+                result = await response.json()
+
+            logs.extend(result["data"])
+            print(f"Fetched {len(logs)} of {result['total']} log records", end="\r")
+            if not result["data"] or len(logs) >= result["total"]:
+                break
+            page += 1
+
+    print()
+    return logs
+
+def capture(args):
+    if args.input:
+        records = read_capture(args.input)
+        source = f"file {args.input}"
+    else:
+        end_timestamp = parse_time(args.end) if args.end else int(time.time() * 1000)
+        start_timestamp = parse_time(args.start) if args.start else end_timestamp - int(args.minutes * 60 * 1000)
+        logs = asyncio.run(fetch_logs(args.logger_url, start_timestamp, end_timestamp, args.page_size))
+        records = [record for record in map(to_capture_record, logs) if record is not None]
+        records.sort(key=lambda record: record["timestamp"])
+        source = f"logger {args.logger_url} {start_timestamp}-{end_timestamp}"
+
+    write_capture(args.output, records, source)
+    print(f"Saved {len(records)} requests to {args.output}")
+    print_mix(records)
+
+def print_mix(records):
+    mix = {}
+    for record in records:
+        key = (replay_path(record["endpoint"]), record["model"])
+        mix[key] = mix.get(key, 0) + 1
+    for (path, model_name), count in sorted(mix.items(), key=lambda item: -item[1]):
+        print(f"{count:>8} {path} {model_name}")
+    if records:
+        span = (records[-1]["timestamp"] - records[0]["timestamp"]) / 1000
+        print(f"Spanning {round(span, 1)}s")
+
+def replay_path(endpoint):
+    """
+    Get the path a recorded endpoint is replayed on
+
+    Args:
+        endpoint (str): The recorded endpoint
+
+    Returns:
+        str: The path to send the request to
+    """
+    if endpoint.startswith("/api/jobs/"):
+        return "/api/process/" + endpoint[len("/api/jobs/"):]
+    return endpoint
+
+def rebase_deadline(request_data, timestamp):
+    """
+    Turn the absolute deadline of a recorded input into a timeout
+
+    The deadline only held for the original request, sent as is every replay
+    would be past it. The time it left at the recorded timestamp is sent as
+    timeoutMs instead, or the recorded timeoutMs if that is shorter.
+
+    Args:
+        request_data (dict): The recorded input
+        timestamp (int): When the request was received, in milliseconds
+
+    Returns:
+        dict: The input without a deadline
+    """
+    if not isinstance(request_data, dict) or request_data.get(DEADLINE_FIELD) is None:
+        return request_data
+
+    deadline = request_data[DEADLINE_FIELD]
+    request_data = {field: value for field, value in request_data.items() if field != DEADLINE_FIELD}
+    try:
+        timeout_ms = float(deadline) - timestamp
+        if request_data.get(TIMEOUT_FIELD) is not None:
+            timeout_ms = min(timeout_ms, float(request_data[TIMEOUT_FIELD]))
+    except (TypeError, ValueError):
+        # The service ignored an invalid deadline too
+        return request_data
+
+    request_data[TIMEOUT_FIELD] = max(0, round(timeout_ms))
+    return request_data
+
+def prepare(records, args):
+    """
+    Select the records to replay, map their models and compute their send offsets
+
+    Args:
+        records (list): Capture records ordered by timestamp
+        args: Command line arguments
+
+    Returns:
+        list: (offset in seconds, path, model, body, record) tuples
+    """
+    model_map = dict(mapping.split("=", 1) for mapping in args.model_map)
+    models = {model_name.lower() for model_name in args.models} if args.models else None
+
+    requests = []
+    offset = 0.0
+    previous = None
+    for record in records:
+        model_name = record["model"]
+        if models is not None and (model_name or "").lower() not in models:
+            continue
+
+        if previous is not None:
+            gap = (record["timestamp"] - previous) / 1000 / args.speedup
+            offset += min(gap, args.max_gap_seconds) if args.max_gap_seconds is not None else gap
+        previous = record["timestamp"]
+
+        request_data = rebase_deadline(record["input"], record["timestamp"])
+        if model_name in model_map:
+            model_name = model_map[model_name]
+            request_data = {**request_data, "modelName": model_name}
+
+        requests.append((offset, replay_path(record["endpoint"]), model_name, json_codec.dumps(request_data), record))
+        if args.limit and len(requests) >= args.limit:
+            break
+    return requests
+
+class Recorder:
+    """
+    Collects replayed latencies and the recorded ones of one endpoint and model
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.recorded = []
+        self.errors = 0
+        self.status_mismatches = 0
+
+async def send(session, target, request, scheduled_time, recorders):
+    _, path, model_name, body, record = request
+    recorder = recorders.setdefault((path, model_name), Recorder())
+    if isinstance(record["responseTimeMs"], (int, float)):
+        recorder.recorded.append(record["responseTimeMs"])
+
+    try:
+        async with session.post(f"{target}{path}", data=body) as response:
+            # Streams are read to the end, like the logger middleware records them
+            await response.read()
+            status = response.status
+    except Exception:
+        recorder.errors += 1
+        return
+
+    if status != record["status"]:
+        recorder.status_mismatches += 1
+    if status < 400:
+        recorder.latencies.append((time.perf_counter() - scheduled_time) * 1000)
+    else:
+        recorder.errors += 1
+
+async def replay(requests, target, connections):
+    """
+    Send the requests at their offsets regardless of how fast earlier ones complete
+
+    Args:
+        requests (list): Result of prepare
+        target (str): Base URL of the backend-py instance
+        connections (int): Most connections open at once
+
+    Returns:
+        tuple: (recorders by (path, model), seconds the replay took, seconds it fell behind at most)
+    """
+    recorders = {}
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    lag = 0.0
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=connections),
+        headers={"Content-Type": "application/json"}
+    ) as session:
+        start = time.perf_counter()
+        for request in requests:
+            scheduled_time = start + request[0]
+            delay = scheduled_time - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+
+            task = loop.create_task(send(session, target, request, scheduled_time, recorders))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return recorders, elapsed, lag
+
+def percentile(ordered, value):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * value / 100))], 3)
+
+def summarize(path, model_name, recorder):
+    replayed = sorted(recorder.latencies)
+    recorded = sorted(recorder.recorded)
+    result = {
+        "endpoint": path,
+        "model": model_name,
+        "requests": len(replayed) + recorder.errors,
+        "errors": recorder.errors,
+        "statusMismatches": recorder.status_mismatches
+    }
+    for value in (50, 95, 99):
+        result[f"p{value}Ms"] = percentile(replayed, value)
+        result[f"recordedP{value}Ms"] = percentile(recorded, value)
+    return result
+
+def print_result(result):
+    def pair(value):
+        replayed, recorded = result[f"p{value}Ms"], result[f"recordedP{value}Ms"]
+        return f"{'-' if replayed is None else round(replayed, 1):>8} {'-' if recorded is None else round(recorded, 1):>8}"
+
+    print(
+        f"{result['endpoint']:>28} {str(result['model']):>16} {result['requests']:>7} "
+        f"{pair(50)} {pair(95)} {pair(99)} {result['errors']:>7} {result['statusMismatches']:>9}"
+    )
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_PATH, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_replay(args):
+    records = read_capture(args.capture)
+    requests = prepare(records, args)
+    if not requests:
+        print(f"No requests to replay in {args.capture}")
+        return
+
+    print(f"Replaying {len(requests)} requests over {round(requests[-1][0], 1)}s against {args.target}")
+    recorders, elapsed, lag = asyncio.run(replay(requests, args.target, args.connections))
+    if lag > 0.1:
+        print(f"The client fell up to {round(lag, 2)}s behind the schedule, latencies include that delay")
+
+    results = [summarize(path, model_name, recorder) for (path, model_name), recorder in recorders.items()]
+    results.sort(key=lambda result: -result["requests"])
+
+    print(f"{'endpoint':>28} {'model':>16} {'count':>7} {'p50 ms':>8} {'(rec)':>8} {'p95 ms':>8} {'(rec)':>8} {'p99 ms':>8} {'(rec)':>8} {'errors':>7} {'mismatch':>9}")
+    for result in results:
+        print_result(result)
+    print(f"Finished in {round(elapsed, 2)}s")
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "commit": get_git_commit(),
+                "python": platform.python_version(),
+                "capture": args.capture,
+                "target": args.target,
+                "speedup": args.speedup,
+                "maxGapSeconds": args.max_gap_seconds,
+                "modelMap": args.model_map,
+                "seconds": round(elapsed, 3),
+                "maxLagSeconds": round(lag, 3)
+            },
+            "results": results
+        }
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"Saved results to {args.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    capture_parser = commands.add_parser("capture", help="write a capture from the logger service or a file of log records")
+    source = capture_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--logger-url", help="base URL of the logger service")
+    source.add_argument("--input", help="file of log records or an earlier capture")
+    capture_parser.add_argument("--start", help="start of the time range, ISO 8601 or milliseconds")
+    capture_parser.add_argument("--end", help="end of the time range, ISO 8601 or milliseconds, now by default")
+    capture_parser.add_argument("--minutes", type=float, default=60, help="length of the time range when --start is not given")
+    capture_parser.add_argument("--page-size", type=int, default=1000)
+    capture_parser.add_argument("--output", required=True)
+
+    replay_parser = commands.add_parser("replay", help="send a capture to a backend-py instance")
+    replay_parser.add_argument("capture")
+    replay_parser.add_argument("--target", default="http://localhost:3011", help="base URL of the backend-py instance")
+    replay_parser.add_argument("--speedup", type=float, default=1, help="divide the recorded gaps between requests by this")
+    replay_parser.add_argument("--max-gap-seconds", type=float, help="shorten longer idle gaps to this")
+    replay_parser.add_argument("--limit", type=int, help="replay at most this many requests")
+    replay_parser.add_argument("--models", nargs="+", help="only replay requests of these models")
+    replay_parser.add_argument("--model-map", nargs="+", default=[], metavar="OLD=NEW", help="send the requests of a model to another model")
+    replay_parser.add_argument("--connections", type=int, default=1000, help="most connections open at once")
+    replay_parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        capture(args)
+    else:
+        if args.speedup <= 0:
+            parser.error("--speedup must be positive")
+        run_replay(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark of request throughput against the number of server workers.
+
+Starts the real server with BACKEND_WORKERS set to each requested count, serving
+a CPU-bound test model that hashes in its process method on the event loop, and
+drives it over HTTP with a fixed number of concurrent clients. With one worker the
+node is limited to one core, so throughput should grow with the worker count up to
+the number of cores.
+
+Usage:
+    python benchmarks/workerScalingBenchmark.py [--workers 1 2 4] [--seconds 10] [--clients 32] [--iterations 2000]
+"""
+import os
+import sys
+import time
+import signal
+import hashlib
+import asyncio
+import argparse
+import multiprocessing
+
+import aiohttp
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_PATH)
+from src.models.baseModel import BaseModel, ModelType
+
+class SpinModel(BaseModel):
+    """
+    Test model that burns CPU on the event loop, like a pure Python model would
+    """
+
+    MODEL_NAME = "spin"
+    MODEL_TYPE = ModelType.CHAT
+    ITERATIONS = 2000
+
+    def __init__(self):
+        super().__init__()
+
+    async def process(self, input_data):
+        digest = input_data.get("userMessage", "").encode("utf-8")
+        for _ in range(self.ITERATIONS):
+            digest = hashlib.sha256(digest).digest()
+        return {"actor": "model", "content": digest.hex()}
+
+def run_server(port, workers, iterations):
+    """
+    Entry point of the server process
+    """
+    os.environ.update({
+        "BACKEND_PORT": str(port),
+        "BACKEND_WORKERS": str(workers),
+        "AVAILABLE_MODELS": "echo"
+    })
+    os.environ.pop("REGISTRY_URL", None)
+    os.environ.pop("LOGGER_URL", None)
+
+    # Keep access logs of the server out of the report
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    import server
+    SpinModel.ITERATIONS = iterations
+    server.model_manager.add_model_class(SpinModel)
+    server.start_server()
+
+async def wait_until_ready(session, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{url}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("Server did not become ready")
+
+async def drive(url, clients, seconds):
+    """
+    Send requests from `clients` concurrent clients for `seconds`
+
+    Returns:
+        tuple: Completed requests and sorted latencies in milliseconds
+    """
+    latencies = []
+    errors = 0
+    connector = aiohttp.TCPConnector(limit=clients)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await wait_until_ready(session, url)
+        deadline = time.monotonic() + seconds
+
+        async def client(client_id):
+            nonlocal errors
+            count = 0
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                async with session.post(
+                    f"{url}/api/process/chat",
+                    json={"modelName": "spin", "userMessage": f"{client_id}-{count}"}
+                ) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+                count += 1
+
+        await asyncio.gather(*(client(client_id) for client_id in range(clients)))
+
+    if errors:
+        print(f"  {errors} requests failed")
+    return len(latencies), sorted(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=2000, help="sha256 rounds per request")
+    parser.add_argument("--port", type=int, default=3911)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.clients} clients, {args.iterations} hash rounds per request")
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'scaling':>8}")
+
+    context = multiprocessing.get_context("fork")
+    baseline = None
+    for workers in args.workers:
+        process = context.Process(target=run_server, args=(args.port, workers, args.iterations))
+        process.start()
+        try:
+            completed, latencies = asyncio.run(drive(f"http://127.0.0.1:{args.port}", args.clients, args.seconds))
+        finally:
+            os.kill(process.pid, signal.SIGTERM)
+            process.join(30)
+
+        throughput = completed / args.seconds
+        baseline = baseline or throughput
+        p50 = latencies[len(latencies) // 2] if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+        print(f"{workers:>8} {throughput:>10.1f} {p50:>9.1f} {p95:>9.1f} {throughput / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 import uvicorn
 from dotenv import load_dotenv
@@ -18,12 +19,40 @@ load_dotenv()
 # Import src modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from src.models.modelManager import model_manager
+from src.models.jobQueue import JobQueue
+from src.models.chatSessions import ChatSessionManager
+from src.models.vectorIndex import vector_store
 from src.serviceRegistry import ServiceRegistry
+from src.preforkServer import PreforkServer
+from src.workerState import worker_state
 from src.middlewares.cors import setup_cors
 from src.middlewares.logger import setup_logger
-from src.routes import healthRoutes, modelRoutes
+from src.middlewares.logShipper import log_shipper
+from src.middlewares.trafficCapture import traffic_capture
+from src.middlewares.metrics import setup_metrics
+from src.metrics import runtime_monitor
+from src.routes import batchRoutes, embedRoutes, healthRoutes, jobRoutes, metricsRoutes, modelRoutes, profilerRoutes, sessionRoutes, statsRoutes
 
-service_registry = ServiceRegistry(model_manager)
+service_registry = ServiceRegistry(model_manager, get_load=worker_state.get_node_load)
+job_queue = JobQueue(model_manager)
+chat_sessions = ChatSessionManager(model_manager)
+
+async def warm_up_and_register():
+    """Preload models and register with the registry once they are warm"""
+    await model_manager.preload_models()
+    logging.info(f"Ready with models: {', '.join(model_manager.get_available_models())}")
+    
+    # With several workers only the primary registers, once the whole node is warm
+    if worker_state.is_primary:
+        await worker_state.wait_for_workers()
+        await service_registry.schedule_registration()
+
+def announce_models():
+    """Announce a changed model set to the registry"""
+    if worker_state.is_primary and model_manager.ready:
+        service_registry.schedule_registration()
+
+model_manager.add_model_set_listener(announce_models)
 
 @asynccontextmanager
 async def lifespan(app):
@@ -32,31 +61,69 @@ async def lifespan(app):
     # Startup
     logging.info("Starting up backend-py service...")
     logging.info(f"Available models: {', '.join(model_manager.get_available_models())}")
-    await service_registry.register()
+    await log_shipper.start()
+    await traffic_capture.start()
+    runtime_monitor.start()
+    model_manager.start()
+    worker_state.start(model_manager)
+    await job_queue.start(worker_state.worker_id, primary=worker_state.is_primary)
+    chat_sessions.start()
+    await vector_store.start()
+    
+    # Warm up in the background so /health can answer while models load
+    startup_task = asyncio.create_task(warm_up_and_register())
     
     # Yield control to FastAPI
     yield
     
     # Shutdown
     logging.info("Shutting down backend-py service...")
-    await service_registry.unregister()
+    if not startup_task.done():
+        startup_task.cancel()
+        try:
+            await startup_task
+        except asyncio.CancelledError:
+            pass
+    if worker_state.is_primary:
+        await service_registry.unregister()
+    await job_queue.stop()
+    await chat_sessions.stop()
+    await vector_store.stop()
+    await model_manager.shutdown()
+    await traffic_capture.stop()
+    await log_shipper.stop()
+    await runtime_monitor.stop()
+    await worker_state.stop()
 
 app = FastAPI(lifespan=lifespan)
 
 # Setup middleware
 setup_cors(app)
 setup_logger(app)
+setup_metrics(app)
 
 # Setup routes
-healthRoutes.setup_routes(app)
+healthRoutes.setup_routes(app, model_manager)
 modelRoutes.setup_routes(app, model_manager)
+batchRoutes.setup_routes(app, model_manager)
+embedRoutes.setup_routes(app, model_manager)
+jobRoutes.setup_routes(app, job_queue)
+sessionRoutes.setup_routes(app, chat_sessions)
+statsRoutes.setup_routes(app, model_manager)
+metricsRoutes.setup_routes(app)
+profilerRoutes.setup_routes(app, model_manager)
 
 def start_server():
     """Start the server"""
     
     port = int(os.environ.get("BACKEND_PORT", 3011))
+    workers = int(os.environ.get("BACKEND_WORKERS", 1))
+    
+    logging.info(f"Backend server starting at port {port} with {workers} worker(s)")
     
-    logging.info(f"Backend server starting at port {port}")
+    if workers > 1:
+        PreforkServer(app, model_manager, "0.0.0.0", port, workers).run()
+        return
     
     uvicorn.run(
         app, 
@@ -0,0 +1,81 @@
+import os
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class JSONCodec:
+    """
+    JSON encoder and decoder used on the request path.
+
+    Uses orjson when it is installed and falls back to the standard library
+    otherwise. JSON_CODEC selects the implementation: auto (default), orjson or
+    stdlib. Both produce compact UTF-8 bytes.
+    """
+
+    def __init__(self, requested=None):
+        """
+        Initialize the codec
+
+        Args:
+            requested (str): auto, orjson or stdlib, defaults to the JSON_CODEC environment variable
+        """
+        if requested is None:
+            requested = os.environ.get("JSON_CODEC", "auto")
+        requested = requested.strip().lower()
+
+        if requested == "orjson" and orjson is None:
+            logging.warning("JSON_CODEC is orjson but orjson is not installed, using stdlib")
+
+        self.name = "orjson" if orjson is not None and requested in ("auto", "orjson") else "stdlib"
+
+    def loads(self, data):
+        """
+        Parse JSON
+
+        Args:
+            data (bytes): The encoded document
+
+        Returns:
+            The parsed value
+
+        Raises:
+            ValueError: If the document is not valid JSON
+        """
+        if self.name == "orjson":
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def dumps(self, value):
+        """
+        Encode a value as JSON
+
+        Args:
+            value: The value to encode
+
+        Returns:
+            bytes: The compact UTF-8 encoding
+        """
+        if self.name == "orjson":
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps_line(self, value):
+        """
+        Encode a value as one NDJSON line
+
+        Args:
+            value: The value to encode
+
+        Returns:
+            bytes: The encoding followed by a newline
+        """
+        if self.name == "orjson":
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+        return self.dumps(value) + b"\n"
+
+# Create a singleton instance
+json_codec = JSONCodec()
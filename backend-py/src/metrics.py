@@ -0,0 +1,440 @@
+import gc
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+
+# Default latency buckets in seconds, from 0.1ms to 30s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf bucket, allocated once
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metric:
+    """
+    Base class of a metric family with optional labels.
+
+    Children are created once per label combination and can be kept by callers,
+    so recording a value on the hot path is a couple of integer updates without
+    any locking. Most recording happens on the event loop thread. Some happens
+    on other threads, such as garbage collector callbacks and the prefix cache
+    used by models in thread executor workers. Those updates are not atomic, so
+    an increment racing with another one on the same child can be lost.
+    """
+
+    metric_type = None
+
+    def __init__(self, name, documentation, label_names=()):
+        """
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            label_names (tuple): Names of the labels
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.children = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *label_values):
+        """
+        Get the child for a combination of label values, creating it on first use
+
+        Args:
+            *label_values: One value per label name
+
+        Returns:
+            The child to record values on
+        """
+        child = self.children.get(label_values)
+        if child is None:
+            if len(label_values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            child = self.children[label_values] = self._new_child()
+        return child
+
+    def _state(self, child):
+        return child.value
+
+    def _combine(self, state, other):
+        return state + other
+
+    def snapshot(self):
+        """
+        Get the current values, e.g. to combine them with other worker processes
+
+        Returns:
+            list: [label values, state] pairs that can be encoded as JSON
+        """
+        return [[list(label_values), self._state(child)] for label_values, child in list(self.children.items())]
+
+    def render(self, snapshots=()):
+        """
+        Render the metric family in the Prometheus text format
+
+        Args:
+            snapshots (list): Snapshots of the same metric from other processes to add in
+
+        Returns:
+            list: Lines of the exposition
+        """
+        states = {label_values: self._state(child) for label_values, child in list(self.children.items())}
+        for snapshot in snapshots:
+            for label_values, state in snapshot:
+                key = tuple(label_values)
+                states[key] = self._combine(states[key], state) if key in states else state
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+        for label_values, state in states.items():
+            lines.extend(self._render_state(label_values, state))
+        return lines
+
+    def _render_state(self, label_values, value):
+        return [f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"]
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, label_names=(), combine="sum"):
+        """
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            label_names (tuple): Names of the labels
+            combine (str): How values of several processes add up, sum or max
+        """
+        super().__init__(name, documentation, label_names)
+        self.combine = combine
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def _combine(self, state, other):
+        return max(state, other) if self.combine == "max" else state + other
+
+    def set(self, value):
+        self.labels().set(value)
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            label_names (tuple): Names of the labels
+            buckets (tuple): Sorted upper bounds of the buckets
+        """
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _state(self, child):
+        return [list(child.counts), child.sum, child.count]
+
+    def _combine(self, state, other):
+        return [[a + b for a, b in zip(state[0], other[0])], state[1] + other[1], state[2] + other[2]]
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_state(self, label_values, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.label_names, label_values, ("le", _format_value(upper_bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Holds all metric families and renders them for the /metrics endpoint
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        """
+        Add a metric family
+
+        Args:
+            metric (Metric): The metric
+
+        Returns:
+            Metric: The same metric, for chaining
+        """
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        Add a callable that refreshes gauges right before metrics are rendered
+
+        Args:
+            collector (callable): Function without arguments
+        """
+        self.collectors.append(collector)
+
+    def _collect(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logging.warning(f"Metrics collector failed: {str(e)}")
+
+    def snapshot(self):
+        """
+        Get the current values of every metric family
+
+        Returns:
+            dict: Metric name to metric snapshot, encodable as JSON
+        """
+        self._collect()
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def render(self, snapshots=()):
+        """
+        Render every metric family in the Prometheus text format
+
+        Args:
+            snapshots (list): Registry snapshots of other processes to add in
+
+        Returns:
+            str: The exposition
+        """
+        self._collect()
+
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render([snapshot.get(metric.name, []) for snapshot in snapshots]))
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "backend_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")
+))
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "backend_http_request_duration_seconds", "Time from request start to the end of the response", ("route", "method")
+))
+MIDDLEWARE_OVERHEAD = registry.register(Histogram(
+    "backend_middleware_overhead_seconds", "Time spent inside a middleware itself, excluding the wrapped app", ("middleware",)
+))
+JSON_DECODE_DURATION = registry.register(Histogram(
+    "backend_json_decode_seconds", "Time spent parsing JSON request bodies", ("route",)
+))
+JSON_ENCODE_DURATION = registry.register(Histogram(
+    "backend_json_encode_seconds", "Time spent encoding JSON response bodies", ("route",)
+))
+MODEL_REQUESTS = registry.register(Counter(
+    "backend_model_requests_total", "Model calls by model and outcome", ("model", "outcome")
+))
+MODEL_QUEUE_WAIT = registry.register(Histogram(
+    "backend_model_queue_wait_seconds", "Time calls waited for a free slot of the model", ("model",)
+))
+MODEL_PROCESS_DURATION = registry.register(Histogram(
+    "backend_model_process_seconds", "Time spent inside the model once admitted", ("model",)
+))
+MODEL_IN_FLIGHT = registry.register(Gauge(
+    "backend_model_in_flight", "Calls currently running in the model", ("model",)
+))
+MODEL_QUEUED = registry.register(Gauge(
+    "backend_model_queued", "Calls currently waiting for a slot of the model", ("model",)
+))
+REQUESTS_ABANDONED = registry.register(Counter(
+    "backend_requests_abandoned_total", "Model requests dropped or cancelled before finishing, by model and reason", ("model", "reason")
+))
+WORK_SAVED = registry.register(Counter(
+    "backend_work_saved_seconds_total", "Estimated model time not spent on abandoned requests, by model and reason", ("model", "reason")
+))
+MODEL_LIFECYCLE_EVENTS = registry.register(Counter(
+    "backend_model_lifecycle_events_total", "Models unloaded or replaced, by model and event", ("model", "event")
+))
+MODEL_ARTIFACT_MAPPED_BYTES = registry.register(Gauge(
+    "backend_model_artifact_mapped_bytes", "Size of the memory-mapped artifact files of the model", ("model",), combine="max"
+))
+MODEL_ARTIFACT_PSS_BYTES = registry.register(Gauge(
+    "backend_model_artifact_pss_bytes", "Proportional resident memory of the model's artifacts, shared pages split between processes", ("model",)
+))
+PREFIX_CACHE_LOOKUPS = registry.register(Counter(
+    "backend_prefix_cache_lookups_total", "Conversation prefix state lookups by model and result", ("model", "result")
+))
+PREFIX_CACHE_TURNS = registry.register(Counter(
+    "backend_prefix_cache_turns_total", "History turns covered by a cached prefix state or left to process, by model", ("model", "source")
+))
+PREFIX_CACHE_EVICTIONS = registry.register(Counter(
+    "backend_prefix_cache_evictions_total", "Prefix states evicted to stay within the cache bounds, by model", ("model",)
+))
+PREFIX_CACHE_BYTES = registry.register(Gauge(
+    "backend_prefix_cache_bytes", "Size of the cached prefix states of the model", ("model",)
+))
+CHAT_SESSIONS = registry.register(Gauge(
+    "backend_chat_sessions", "Chat sessions held in memory, by whether a client is connected", ("state",)
+))
+CHAT_SESSION_EVENTS = registry.register(Counter(
+    "backend_chat_session_events_total", "Chat sessions created, resumed and evicted, by event", ("event",)
+))
+CHAT_SESSION_TURN_DURATION = registry.register(Histogram(
+    "backend_chat_session_turn_seconds", "Time from receiving a session message to the end of the reply", ("model",)
+))
+CHAT_SESSION_BYTES = registry.register(Counter(
+    "backend_chat_session_bytes_total", "WebSocket payload bytes of chat sessions, by direction", ("direction",)
+))
+VECTOR_INDEX_VECTORS = registry.register(Gauge(
+    "backend_vector_index_vectors", "Vectors stored in the collection", ("collection",), combine="max"
+))
+VECTOR_SEARCH_DURATION = registry.register(Histogram(
+    "backend_vector_search_seconds", "Time to score and rank the vectors of a search, by exact or IVF mode", ("mode",)
+))
+EVENT_LOOP_LAG = registry.register(Histogram(
+    "backend_event_loop_lag_seconds", "Delay of the event loop in running a scheduled callback"
+))
+EVENT_LOOP_LAG_LAST = registry.register(Gauge(
+    "backend_event_loop_lag_last_seconds", "Most recently measured event loop lag", combine="max"
+))
+GC_PAUSE = registry.register(Histogram(
+    "backend_gc_pause_seconds", "Garbage collector pauses by generation", ("generation",)
+))
+GC_PAUSE_LAST = registry.register(Gauge(
+    "backend_gc_pause_last_seconds", "Most recent garbage collector pause", combine="max"
+))
+
+class RuntimeMonitor:
+    """
+    Measures event-loop lag and garbage collector pauses
+    """
+
+    def __init__(self, interval=0.5):
+        """
+        Args:
+            interval (float): Seconds between event-loop lag probes
+        """
+        self.interval = interval
+        self.task = None
+        # Collections run on whichever thread triggers them, so each thread
+        # keeps the start time of its own
+        self.gc_state = threading.local()
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self.gc_state.start = time.perf_counter()
+        elif getattr(self.gc_state, "start", None) is not None:
+            pause = time.perf_counter() - self.gc_state.start
+            self.gc_state.start = None
+            GC_PAUSE.labels(str(info.get("generation"))).observe(pause)
+            GC_PAUSE_LAST.set(pause)
+
+    async def _probe_event_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_LAST.set(lag)
+
+    def start(self):
+        """
+        Start probing the event loop and hook into the garbage collector
+        """
+        if self.task is None:
+            gc.callbacks.append(self._on_gc)
+            self.task = asyncio.create_task(self._probe_event_loop())
+
+    async def stop(self):
+        """
+        Stop probing and unhook from the garbage collector
+        """
+        if self.task is None:
+            return
+
+        gc.callbacks.remove(self._on_gc)
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+runtime_monitor = RuntimeMonitor()
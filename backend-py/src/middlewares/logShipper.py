@@ -0,0 +1,261 @@
+import os
+import asyncio
+import logging
+import aiohttp
+
+from src.jsonCodec import json_codec
+from src.middlewares.trafficCapture import traffic_capture
+
+class LogShipper:
+    """
+    Ships log records to the logger service in the background.
+
+    Records are put on a bounded in-memory queue and sent in bulk over one
+    long-lived, pooled HTTP session, either when LOG_BATCH_SIZE records are
+    waiting or LOG_FLUSH_INTERVAL_MS has passed. When the queue is full the
+    record is appended to LOG_SPILL_PATH if it is set, otherwise it is dropped.
+    Spilled records are sent again once the logger service accepts logs.
+    """
+
+    def __init__(self):
+        """
+        Initialize the shipper from environment variables
+        """
+        self.logger_url = None
+        self.batch_size = int(os.environ.get("LOG_BATCH_SIZE", 100))
+        self.flush_interval = int(os.environ.get("LOG_FLUSH_INTERVAL_MS", 1000)) / 1000
+        self.spill_path = os.environ.get("LOG_SPILL_PATH")
+        self.queue = asyncio.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", 1000)))
+        self.session = None
+        self.worker = None
+        self.sending = None
+        # Bytes of the file being resent that the logger service already accepted
+        self.resend_offset = 0
+
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+
+    @property
+    def enabled(self):
+        return self.worker is not None
+
+    async def start(self):
+        """
+        Open the HTTP session and start the background flush task
+        """
+        self.logger_url = os.environ.get("LOGGER_URL")
+        if not self.logger_url or self.enabled:
+            return
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=10)
+        )
+        self.worker = asyncio.create_task(self._run())
+        logging.info(f"Log shipper started for {self.logger_url}")
+
+    def enqueue(self, log_data):
+        """
+        Queue a log record without waiting for it to be sent
+
+        Args:
+            log_data (dict): The log record
+        """
+        traffic_capture.record(log_data)
+        if not self.enabled:
+            return
+
+        try:
+            self.queue.put_nowait(log_data)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            if self.spill_path:
+                self._spill([log_data])
+            else:
+                self.dropped += 1
+
+    async def _run(self):
+        """
+        Collect records into batches and send them one batch at a time
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self.sending = batch
+            sent = await self._send(batch)
+            self.sending = None
+
+            if sent:
+                await self._resend_spilled()
+            elif self.spill_path:
+                self._spill(batch)
+            else:
+                self.dropped += len(batch)
+
+    async def _send(self, batch):
+        """
+        Send a batch to the bulk endpoint of the logger service
+
+        Args:
+            batch (list): Log records
+
+        Returns:
+            bool: True if the logger service accepted the batch
+        """
+        try:
+            async with self.session.post(
+                f"{self.logger_url}/api/logs/bulk",
+                data=json_codec.dumps(batch),
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status != 201:
+                    self.failed += 1
+                    logging.warning(f"Failed to send logs to logger service: {await response.text()}")
+                    return False
+        except Exception as e:
+            self.failed += 1
+            logging.warning(f"Error sending logs to logger service: {str(e)}")
+            return False
+
+        self.sent += len(batch)
+        return True
+
+    def _spill(self, records):
+        """
+        Append records to the spill file
+
+        Args:
+            records (list): Log records
+        """
+        try:
+            with open(self.spill_path, "ab") as spill_file:
+                for record in records:
+                    spill_file.write(json_codec.dumps_line(record))
+            self.spilled += len(records)
+        except Exception as e:
+            self.dropped += len(records)
+            logging.warning(f"Failed to spill logs to {self.spill_path}: {str(e)}")
+
+    def _read_spilled(self, path, offset):
+        """
+        Read the next batch of records from a spill file
+
+        Args:
+            path (str): Path of the file
+            offset (int): Byte offset to read from
+
+        Returns:
+            tuple: (records, offset after them)
+        """
+        records = []
+        with open(path, "rb") as spill_file:
+            spill_file.seek(offset)
+            while len(records) < self.batch_size:
+                line = spill_file.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json_codec.loads(line))
+                except ValueError:
+                    logging.warning(f"Skipping a corrupt record in {path}")
+            return records, spill_file.tell()
+
+    async def _resend_spilled(self):
+        """
+        Send records from the spill file, a batch at a time
+
+        The file is renamed first so records spilled while sending are not
+        lost, and it is only deleted once every batch was accepted. A batch
+        that fails, or is interrupted, stays in the file and is sent again
+        after the next successful send, so records are delivered at least once.
+        """
+        if not self.spill_path:
+            return
+
+        sending_path = f"{self.spill_path}.sending"
+        # A file left by an earlier failed or interrupted resend is finished first
+        if not os.path.exists(sending_path):
+            if not os.path.exists(self.spill_path):
+                return
+            os.replace(self.spill_path, sending_path)
+            self.resend_offset = 0
+
+        while True:
+            batch, offset = await asyncio.to_thread(self._read_spilled, sending_path, self.resend_offset)
+            if not batch:
+                break
+            if not await self._send(batch):
+                return
+            self.spilled -= len(batch)
+            self.resend_offset = offset
+
+        await asyncio.to_thread(os.remove, sending_path)
+        self.resend_offset = 0
+
+    async def stop(self):
+        """
+        Stop the flush task, send whatever is still queued and close the session
+        """
+        if not self.enabled:
+            return
+
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        self.worker = None
+
+        # A batch interrupted in the middle of sending is sent again
+        remaining = self.sending or []
+        self.sending = None
+        while not self.queue.empty():
+            remaining.append(self.queue.get_nowait())
+        if remaining and not await self._send(remaining):
+            if self.spill_path:
+                self._spill(remaining)
+            else:
+                self.dropped += len(remaining)
+
+        await self.session.close()
+        self.session = None
+        logging.info("Log shipper stopped")
+
+    def get_stats(self):
+        """
+        Get shipping statistics
+
+        Returns:
+            dict: Queue depth and record counts
+        """
+        return {
+            "enabled": self.enabled,
+            "queueDepth": self.queue.qsize(),
+            "queueSize": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "failedRequests": self.failed
+        }
+
+# Create a singleton instance
+log_shipper = LogShipper()
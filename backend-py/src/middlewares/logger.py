@@ -1,96 +1,179 @@
 import logging
-import os
-import json
 import time
-from fastapi import Request
-import aiohttp
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import StreamingResponse, Response
-import copy
 
-class LoggerMiddleware(BaseHTTPMiddleware):
+from src.jsonCodec import json_codec
+from src.metrics import MIDDLEWARE_OVERHEAD, JSON_DECODE_DURATION
+from src.middlewares.logShipper import log_shipper
+from src.middlewares.metrics import get_route_label
+from src.middlewares.requestBody import set_json_body, get_json_response
+
+class LoggerMiddleware:
     """
     Middleware for logging requests and responses
+
+    Implemented as a plain ASGI middleware: the request body is read once, parsed
+    once and shared with the route handler, and response body chunks are copied
+    as they are sent, so streamed responses are logged as well.
     """
-    
-    async def send_to_logger_service(self, log_data, logger_url):
-        """Send request data to logger service"""
-        if logger_url:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        f"{logger_url}/api/logs",
-                        headers={"Content-Type": "application/json"},
-                        json=log_data
-                    ) as log_response:
-                        if log_response.status != 201:
-                            logging.warning(f"Failed to send log to logger service: {await log_response.text()}")
-            except Exception as e:
-                logging.warning(f"Error sending log to logger service: {str(e)}")
-                
-    async def log_request(self, log_data, logger_url, is_streaming=False):
-        await self.send_to_logger_service(log_data, logger_url)
-    
-    async def dispatch(self, request: Request, call_next):
-        # We only log process requests
-        if '/process/' not in request.url.path:
-            return await call_next(request)
-  
-        logger_url = os.environ.get("LOGGER_URL")
+
+    def __init__(self, app):
+        """
+        Args:
+            app: The ASGI application to wrap
+        """
+        self.app = app
+
+    def log_request(self, log_data, is_streaming=False):
+        """Queue request data for the logger service without waiting for it"""
+        log_shipper.enqueue(log_data)
+
+    async def __call__(self, scope, receive, send):
+        # We only log process requests. Batch endpoints log every input themselves
+        # and must not have their upload buffered here.
+        if scope["type"] != "http" or '/process/' not in scope["path"] or scope["path"].endswith("/batch"):
+            await self.app(scope, receive, send)
+            return
+
         start_time = time.time()
-        
+        overhead_start = time.perf_counter()
+
         # Capture request body
-        request_body = await request.body()
-        # Create a copy of the request with the body
-        request_copy = Request(request.scope, receive=request._receive)
-        
-        # Parse the request body to extract model name
+        request_chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client went away before sending the whole body
+                await self.app(scope, _replay_receive([message], receive), send)
+                return
+            request_chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        request_body = b"".join(request_chunks)
+
+        # Parse the request body once and share it with the route handler
+        request_body_json = {}
         model_name = None
+        decode_start = time.perf_counter()
         try:
-            request_json = json.loads(request_body)
-            model_name = request_json.get("modelName")
-        except:
+            request_body_json = json_codec.loads(request_body)
+            set_json_body(scope, request_body_json)
+            if isinstance(request_body_json, dict):
+                model_name = request_body_json.get("modelName")
+        except ValueError:
             logging.warning("Failed to parse request body as JSON")
-        
-        # Use the body we already read
-        async def receive():
-            return {"type": "http.request", "body": request_body}
-        
-        request._receive = receive
-        
-        # Process the request
-        response = await call_next(request)
-        
-        process_time = time.time() - start_time
-        
-        # Convert request body to string and JSON if possible
+        decode_time = time.perf_counter() - decode_start
+
+        # Capture response as it is sent
+        response_start = {}
+        response_chunks = []
+        # Time spent in this middleware itself, excluding the wrapped app and the client
+        overhead = [time.perf_counter() - overhead_start]
+
+        async def send_wrapper(message):
+            wrapper_start = time.perf_counter()
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    self.log_request(
+                        self.build_log_data(scope, start_time, request_body_json, model_name, response_start, response_chunks),
+                        is_streaming=len(response_chunks) > 1
+                    )
+            overhead[0] += time.perf_counter() - wrapper_start
+            await send(message)
+
         try:
-            request_body_str = request_body.decode("utf-8")
-            request_body_json = json.loads(request_body_str)
-        except:
-            request_body_str = str(request_body)
-            request_body_json = {}
-            
-        # TODO: Implement response extraction
-        response_body_obj = {"content": "backend-py cannot log response currently"}
-        
+            await self.app(scope, _replay_receive([{"type": "http.request", "body": request_body}], receive), send_wrapper)
+        finally:
+            JSON_DECODE_DURATION.labels(get_route_label(scope)).observe(decode_time)
+            MIDDLEWARE_OVERHEAD.labels("logger").observe(overhead[0])
+
+    def build_log_data(self, scope, start_time, request_body_json, model_name, response_start, response_chunks):
+        """
+        Build the log record sent to the logger service
+
+        Args:
+            scope (dict): The ASGI scope of the request
+            start_time (float): Time the request arrived
+            request_body_json: Parsed request body
+            model_name (str): Name of the requested model
+            response_start (dict): The http.response.start message
+            response_chunks (list): Response body chunks
+
+        Returns:
+            dict: The log record
+        """
+        process_time = time.time() - start_time
+
+        # Routes that encode their own JSON leave the original object behind
+        has_response, output = get_json_response(scope)
+        if not has_response:
+            output = parse_response_body(response_start, b"".join(response_chunks))
+
         log_data = {
             "timestamp": int(start_time * 1000),  # Multiply by 1000 as requested
-            "endpoint": request.url.path,
+            "endpoint": scope["path"],
             "input": request_body_json,
             "model": model_name,
-            "output": response_body_obj,
+            "output": output,
+            "status": response_start.get("status"),
             "responseTimeMs": round(process_time * 1000, 2)  # Convert to ms
         }
-        
-        await self.log_request(log_data, logger_url, is_streaming=False)
-        
-        return response
+
+        return log_data
+
+def _replay_receive(messages, receive):
+    """
+    Build a receive callable that first returns already read messages and then
+    falls back to the original receive, e.g. to report client disconnects
+
+    Args:
+        messages (list): Messages to return first
+        receive: The original ASGI receive callable
+
+    Returns:
+        callable: The new receive callable
+    """
+    pending = list(messages)
+
+    async def replay():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
+
+def parse_response_body(response_start, body):
+    """
+    Turn a response body into a loggable object
+
+    Args:
+        response_start (dict): The http.response.start message
+        body (bytes): The complete response body
+
+    Returns:
+        Parsed JSON for JSON responses, a list of objects for NDJSON streams and text otherwise
+    """
+    content_type = ""
+    for name, value in response_start.get("headers", []):
+        if name.lower() == b"content-type":
+            content_type = value.decode("latin-1")
+            break
+
+    try:
+        if "application/x-ndjson" in content_type:
+            return [json_codec.loads(line) for line in body.splitlines() if line.strip()]
+        if "application/json" in content_type:
+            return json_codec.loads(body)
+        return {"content": body.decode("utf-8")}
+    except ValueError:
+        return {"content": body.decode("utf-8", errors="replace")}
 
 def setup_logger(app):
     """
     Setup logger middleware for the application
-    
+
     Args:
         app: The FastAPI application
     """
@@ -99,7 +182,6 @@ def setup_logger(app):
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
-    
+
     # Add logger middleware
     app.add_middleware(LoggerMiddleware)
-
@@ -0,0 +1,60 @@
+import time
+
+from src.metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION
+
+def get_route_label(scope):
+    """
+    Get the route template of a request, used as a metric label
+
+    The template is only known once routing has happened. Unmatched paths share
+    one label so arbitrary URLs cannot blow up the number of series.
+
+    Args:
+        scope (dict): The ASGI scope of the request
+
+    Returns:
+        str: The route path, e.g. /api/models/types/{model_type}
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """
+    Middleware counting requests and measuring their latency per route
+    """
+
+    def __init__(self, app):
+        """
+        Args:
+            app: The ASGI application to wrap
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = get_route_label(scope)
+            HTTP_REQUESTS.labels(route, scope["method"], str(status[0])).inc()
+            HTTP_REQUEST_DURATION.labels(route, scope["method"]).observe(time.perf_counter() - start_time)
+
+def setup_metrics(app):
+    """
+    Setup metrics middleware for the application
+
+    Args:
+        app: The FastAPI application
+    """
+    app.add_middleware(MetricsMiddleware)
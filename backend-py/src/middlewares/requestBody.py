@@ -0,0 +1,63 @@
+from fastapi import Request, HTTPException
+
+from src.jsonCodec import json_codec
+
+def set_json_body(scope, body):
+    """
+    Store an already parsed JSON request body on the request scope
+
+    Args:
+        scope (dict): The ASGI scope of the request
+        body: The parsed body
+    """
+    scope.setdefault("state", {})["json_body"] = body
+
+def set_json_response(scope, content):
+    """
+    Store the object a JSON response was encoded from on the request scope,
+    so middlewares can use it without parsing the encoded body again
+
+    Args:
+        scope (dict): The ASGI scope of the request
+        content: The response content
+    """
+    scope.setdefault("state", {})["json_response"] = content
+
+def get_json_response(scope):
+    """
+    Get the object stored with set_json_response
+
+    Args:
+        scope (dict): The ASGI scope of the request
+
+    Returns:
+        Tuple of whether a response object was stored and the object
+    """
+    state = scope.get("state", {})
+    return "json_response" in state, state.get("json_response")
+
+async def get_json_body(request: Request):
+    """
+    FastAPI dependency returning the JSON object sent in the request body
+
+    The body is parsed only once per request: if a middleware has already parsed
+    it, that result is reused instead of parsing the same bytes again.
+
+    Args:
+        request (Request): The incoming request
+
+    Returns:
+        dict: The parsed request body
+    """
+    body = getattr(request.state, "json_body", None)
+
+    if body is None:
+        try:
+            body = json_codec.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Request body must be valid JSON")
+
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=422, detail="Request body must be a JSON object")
+
+    return body
@@ -0,0 +1,222 @@
+import os
+import random
+import asyncio
+import logging
+
+from src.jsonCodec import json_codec
+
+# First line of a capture file
+FORMAT = "backend-py-traffic"
+VERSION = 1
+
+def to_capture_record(log_data):
+    """
+    Turn a log record into a capture record
+
+    Log records come from the logger middleware, the batch and job routes and
+    chat sessions. Only requests that can be sent again on their own are kept:
+    chat session turns depend on history held by the server and are skipped.
+
+    Args:
+        log_data (dict): The log record
+
+    Returns:
+        dict: The capture record, None if the request cannot be replayed
+    """
+    if not isinstance(log_data, dict):
+        return None
+
+    endpoint = log_data.get("endpoint") or ""
+    request_data = log_data.get("input")
+    if not isinstance(request_data, dict) or endpoint.endswith("/ws"):
+        return None
+    if not (endpoint.startswith("/api/process/") or endpoint.startswith("/api/jobs/")):
+        return None
+
+    return {
+        "timestamp": log_data.get("timestamp"),
+        "endpoint": endpoint,
+        "model": log_data.get("model") or request_data.get("modelName"),
+        "input": request_data,
+        "status": log_data.get("status"),
+        "responseTimeMs": log_data.get("responseTimeMs")
+    }
+
+def make_header(source):
+    """
+    Build the header line of a capture file
+
+    Args:
+        source (str): Where the records come from
+
+    Returns:
+        dict: The header
+    """
+    return {"format": FORMAT, "version": VERSION, "source": source}
+
+def read_capture(path):
+    """
+    Read the records of a capture file
+
+    Also reads what the capture records are made from: a JSON array of log
+    records, a logger /api/query response, or JSON lines of log records such as
+    a LOG_SPILL_PATH file. Header lines are skipped wherever they are, so
+    files appended to by several workers can be read.
+
+    Args:
+        path (str): Path of the file
+
+    Returns:
+        list: Capture records ordered by timestamp
+    """
+    with open(path, "rb") as capture_file:
+        content = capture_file.read()
+
+    stripped = content.lstrip()
+    if stripped.startswith(b"[") or (stripped.startswith(b"{") and b"\n" not in stripped.strip()):
+        document = json_codec.loads(content)
+        entries = document.get("data", []) if isinstance(document, dict) else document
+    else:
+        entries = [json_codec.loads(line) for line in content.splitlines() if line.strip()]
+
+    records = []
+    for entry in entries:
+        if isinstance(entry, dict) and entry.get("format") == FORMAT:
+            if entry.get("version") != VERSION:
+                raise ValueError(f"Unsupported capture version {entry.get('version')} in {path}")
+            continue
+        record = to_capture_record(entry)
+        if record is not None and isinstance(record["timestamp"], (int, float)):
+            records.append(record)
+
+    records.sort(key=lambda record: record["timestamp"])
+    return records
+
+def write_capture(path, records, source):
+    """
+    Write capture records to a file, one JSON object per line after a header
+
+    Args:
+        path (str): Path of the file
+        records (list): Capture records
+        source (str): Where the records come from
+    """
+    with open(path, "wb") as capture_file:
+        capture_file.write(json_codec.dumps_line(make_header(source)))
+        for record in records:
+            capture_file.write(json_codec.dumps_line(record))
+
+class TrafficCapture:
+    """
+    Appends the replayable requests of the service to a capture file.
+
+    Enabled with TRAFFIC_CAPTURE_PATH. TRAFFIC_CAPTURE_SAMPLE_RATE keeps only a
+    share of the requests, and capturing stops once the file reaches
+    TRAFFIC_CAPTURE_MAX_BYTES. Records are buffered and appended in the
+    background, one write per flush, so workers can share the file.
+    """
+
+    def __init__(self):
+        """
+        Initialize the capture from environment variables
+        """
+        self.path = None
+        self.sample_rate = float(os.environ.get("TRAFFIC_CAPTURE_SAMPLE_RATE", 1))
+        self.max_bytes = int(os.environ.get("TRAFFIC_CAPTURE_MAX_BYTES", 1024 * 1024 * 1024))
+        self.flush_interval = int(os.environ.get("TRAFFIC_CAPTURE_FLUSH_INTERVAL_MS", 1000)) / 1000
+
+        self.buffer = []
+        self.task = None
+        self.captured = 0
+        self.full = False
+
+    @property
+    def enabled(self):
+        return self.task is not None
+
+    async def start(self):
+        """
+        Start appending captured requests to the file
+        """
+        self.path = os.environ.get("TRAFFIC_CAPTURE_PATH")
+        if not self.path or self.enabled:
+            return
+        self.task = asyncio.create_task(self._run())
+        logging.info(f"Capturing traffic to {self.path}")
+
+    def record(self, log_data):
+        """
+        Capture the request of a log record if it can be replayed
+
+        Args:
+            log_data (dict): The log record
+        """
+        if not self.enabled or self.full or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return
+        record = to_capture_record(log_data)
+        if record is not None:
+            self.buffer.append(record)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """
+        Append the buffered records to the file
+        """
+        if not self.buffer:
+            return
+        records, self.buffer = self.buffer, []
+        try:
+            await asyncio.to_thread(self._append, records)
+        except Exception as e:
+            logging.warning(f"Failed to write traffic capture to {self.path}: {str(e)}")
+
+    def _append(self, records):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size >= self.max_bytes:
+                self.full = True
+                logging.warning(f"Traffic capture {self.path} reached {self.max_bytes} bytes, no longer capturing")
+                return
+
+            lines = [json_codec.dumps_line(make_header("capture"))] if size == 0 else []
+            lines.extend(json_codec.dumps_line(record) for record in records)
+            os.write(fd, b"".join(lines))
+            self.captured += len(records)
+        finally:
+            os.close(fd)
+
+    async def stop(self):
+        """
+        Stop capturing and write what is still buffered
+        """
+        if not self.enabled:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        await self.flush()
+
+    def get_stats(self):
+        """
+        Get capture statistics
+
+        Returns:
+            dict: Whether capturing is on and how many requests were captured
+        """
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "captured": self.captured,
+            "full": self.full
+        }
+
+# Create a singleton instance
+traffic_capture = TrafficCapture()
@@ -1,6 +1,14 @@
-from abc import ABC, abstractmethod
+import os
+import sys
+import asyncio
+from abc import ABC
 from enum import Enum, auto
 
+from src.models.modelArtifacts import artifact_store
+from src.models.modelConfig import get_model_setting, parse_bool
+from src.models.prefixCache import prefix_cache
+from src.requestContext import get_request_context
+
 class ModelType(Enum):
     """
     Enum for model types
@@ -8,6 +16,7 @@ class ModelType(Enum):
     CHAT = "CHAT"
     SUMMARIZE = "SUMMARIZE"
     GENERATE_IMAGE = "GENERATE_IMAGE"
+    EMBED = "EMBED"
 
 class BaseModel(ABC):
     """
@@ -15,17 +24,79 @@ class BaseModel(ABC):
     Provides the interface that all model implementations must follow
     """
     
-    def __init__(self, model_type, model_name):
+    # Dynamic batching. A model opts in by setting BATCH_MAX_SIZE above 1.
+    # Each value can be overridden per model with <MODEL_NAME>_<SETTING> env variables.
+    BATCH_MAX_SIZE = 1
+    BATCH_MAX_WAIT_MS = 5
+    BATCH_MAX_QUEUE = 256
+    
+    # CPU-bound models do synchronous work in process_sync. The ModelManager runs them
+    # in its executor pool so they do not block the event loop.
+    CPU_BOUND = False
+    # Instance pool and admission control. Up to MAX_CONCURRENCY calls (0 means no
+    # limit) run at once, spread over POOL_MIN_SIZE to POOL_MAX_SIZE instances.
+    # Up to MAX_QUEUE further calls wait at most QUEUE_TIMEOUT_MS for a slot,
+    # the rest are rejected with 429/503.
+    POOL_MIN_SIZE = 1
+    POOL_MAX_SIZE = 1
+    MAX_CONCURRENCY = 0
+    MAX_QUEUE = 100
+    QUEUE_TIMEOUT_MS = 30000
+
+    # Async jobs. JOB_WORKERS jobs of the model run at once, at most JOB_MAX_QUEUE
+    # more wait in its priority queue.
+    JOB_WORKERS = 1
+    JOB_MAX_QUEUE = 1000
+
+    # Response caching for deterministic models. Bump MODEL_VERSION whenever the
+    # output for the same input changes so old cache entries are not served.
+    MODEL_VERSION = "1"
+    CACHE_ENABLED = False
+    CACHE_TTL_SECONDS = 0
+    
+    # Conversation prefix caching for chat models that encode the history, see
+    # get_prefix_state. Bump MODEL_VERSION when the format of the state changes.
+    PREFIX_CACHE_ENABLED = True
+    
+    # Eviction. With MODEL_MEMORY_BUDGET_MB or MODEL_IDLE_TIMEOUT_SECONDS set, the
+    # ModelManager unloads least recently used or idle models unless EVICTABLE is
+    # False. MEMORY_MB is the footprint of one instance counted against the budget,
+    # by default it is measured when the first instance is created.
+    EVICTABLE = True
+    MEMORY_MB = None
+    
+    # Directory of the files loaded with the load_artifact_* methods. Relative paths,
+    # and the default of None, are resolved against the directory of the model's module.
+    ARTIFACT_DIR = None
+    
+    # Model metadata. Declaring these as plain literals on the class lets the
+    # ModelManager discover the model without importing or instantiating it.
+    MODEL_NAME = None
+    MODEL_TYPE = None
+    
+    # Inputs run through the model at startup so the first real request finds it warm
+    WARMUP_INPUTS = []
+    
+    def __init__(self, model_type=None, model_name=None):
         """
         Initialize a new model instance
         
         Args:
-            model_type (ModelType or str): Type of the model
-            model_name (str): Name of the model (identifier)
+            model_type (ModelType or str): Type of the model. Defaults to MODEL_TYPE
+            model_name (str): Name of the model (identifier). Defaults to MODEL_NAME
         """
         if self.__class__ == BaseModel:
             raise TypeError("BaseModel is an abstract class and cannot be instantiated directly.")
         
+        model_type = model_type if model_type is not None else self.MODEL_TYPE
+        model_name = model_name if model_name is not None else self.MODEL_NAME
+        if model_type is None or model_name is None:
+            raise TypeError(f"{type(self).__name__} must define MODEL_NAME and MODEL_TYPE or pass them to BaseModel.__init__.")
+        
+        if (type(self).process is BaseModel.process and
+            type(self).process_sync is BaseModel.process_sync):
+            raise TypeError(f"{type(self).__name__} must implement process or process_sync.")
+        
         # Convert string to ModelType if necessary
         if isinstance(model_type, str):
             model_type = model_type.upper()
@@ -57,16 +128,221 @@ class BaseModel(ABC):
         """
         return self.model_name
     
-    @abstractmethod
+    @property
+    def request_context(self):
+        """
+        The context of the request currently being processed
+        
+        Holds the deadline of the request. Long running models can call
+        self.request_context.check() between steps to stop once the deadline
+        passed or the client went away. The context belongs to the running call,
+        not to the instance, so concurrent calls each see their own.
+        
+        Returns:
+            RequestContext: The context, None outside of a request or in the executor pool
+        """
+        return get_request_context()
+    
+    def get_warmup_inputs(self):
+        """
+        Returns the inputs used to warm the model up after it is loaded
+        
+        Override this when warm-up inputs have to be built at runtime.
+        
+        Returns:
+            list: Inputs for the model
+        """
+        return list(self.WARMUP_INPUTS)
+    
+    def get_artifact_path(self, name):
+        """
+        Resolve the path of an artifact file of the model
+        
+        Args:
+            name (str): File name, relative to ARTIFACT_DIR unless absolute
+            
+        Returns:
+            str: The path of the file
+        """
+        module_dir = os.path.dirname(os.path.abspath(sys.modules[type(self).__module__].__file__))
+        artifact_dir = get_model_setting(type(self), self.model_name, "ARTIFACT_DIR", str) or module_dir
+        return os.path.join(module_dir, artifact_dir, name)
+    
+    def load_artifact_array(self, name):
+        """
+        Memory-map a NumPy .npy file read-only
+        
+        The data is not copied: instances and worker processes loading the same
+        file share its pages. Call this from __init__ so the multi-worker server
+        maps the file once before forking.
+        
+        Args:
+            name (str): File name, relative to ARTIFACT_DIR unless absolute
+            
+        Returns:
+            numpy.ndarray: Read-only array backed by the file
+        """
+        return artifact_store.load(self.get_artifact_path(name), "npy", self)
+    
+    def load_artifact_tensors(self, name):
+        """
+        Memory-map a safetensors file read-only
+        
+        Args:
+            name (str): File name, relative to ARTIFACT_DIR unless absolute
+            
+        Returns:
+            dict: Tensor name to read-only array backed by the file
+        """
+        return artifact_store.load(self.get_artifact_path(name), "safetensors", self)
+    
+    def load_artifact_buffer(self, name):
+        """
+        Memory-map any file read-only, e.g. a flat buffer in a custom format
+        
+        Args:
+            name (str): File name, relative to ARTIFACT_DIR unless absolute
+            
+        Returns:
+            memoryview: Read-only view of the file
+        """
+        return artifact_store.load(self.get_artifact_path(name), "buffer", self)
+    
+    def get_prefix_state(self, history):
+        """
+        Get the state cached for the longest known prefix of a conversation
+        
+        Lets a chat model process only the turns added since its last call
+        instead of the whole conversationHistory:
+        
+            turns, state = self.get_prefix_state(history)
+            for turn in history[turns:]:
+                state = self.encode_turn(state, turn)
+            ...
+            self.save_prefix_state(history + [reply], state_after_reply)
+        
+        The returned state is shared with other calls and must not be modified.
+        
+        Args:
+            history (list): Turns of the conversation, oldest first
+            
+        Returns:
+            tuple: (number of turns the state covers, state), (0, None) if nothing is cached
+        """
+        if not history or not get_model_setting(type(self), self.model_name, "PREFIX_CACHE_ENABLED", parse_bool):
+            return 0, None
+        model_version = get_model_setting(type(self), self.model_name, "MODEL_VERSION", str)
+        return prefix_cache.lookup(self.model_name, model_version, history)
+    
+    def save_prefix_state(self, history, state, size=None):
+        """
+        Cache the state reached after processing a conversation
+        
+        Args:
+            history (list): Turns the state covers, oldest first
+            state: The state, e.g. a NumPy array of encoded tokens or a KV cache
+            size (int): Size of the state in bytes, estimated when not given
+        """
+        if not get_model_setting(type(self), self.model_name, "PREFIX_CACHE_ENABLED", parse_bool):
+            return
+        model_version = get_model_setting(type(self), self.model_name, "MODEL_VERSION", str)
+        prefix_cache.store(self.model_name, model_version, history, state, size)
+    
+    def unload(self):
+        """
+        Release resources held by the instance before it is dropped
+        
+        Called after the instance finished its last call, when the model is
+        evicted or replaced by a reloaded version. Override this to free
+        resources that garbage collection does not, e.g. device memory.
+        """
+        pass
+    
+    @classmethod
+    def is_cpu_bound(cls):
+        """
+        Returns whether the model does synchronous CPU work
+        
+        Returns:
+            bool: True if the model sets CPU_BOUND or implements process_sync
+        """
+        return cls.CPU_BOUND or cls.process_sync is not BaseModel.process_sync
+    
     async def process(self, input_data):
         """
         Processes the input and produces an output
         
+        Subclasses implement either this method or process_sync.
+        
         Args:
             input_data (dict): Input for the model
             
         Returns:
             dict: Output from the model
         """
-        raise NotImplementedError("process method must be implemented by subclasses")
-
+        return self.process_sync(input_data)
+    
+    async def stream(self, input_data):
+        """
+        Produces the output in chunks as they become available
+        
+        Override this in generative models to lower the time to first token.
+        The default implementation yields the whole output of process as one chunk.
+        
+        Args:
+            input_data (dict): Input for the model
+            
+        Yields:
+            dict: Output chunks from the model
+        """
+        yield await self.process(input_data)
+    
+    def process_sync(self, input_data):
+        """
+        Synchronous version of process for CPU-bound models
+        
+        The ModelManager calls this from a worker of its executor pool, never on the event loop.
+        
+        Args:
+            input_data (dict): Input for the model
+            
+        Returns:
+            dict: Output from the model
+        """
+        raise NotImplementedError("process_sync method must be implemented by CPU-bound models")
+    
+    async def process_batch(self, inputs):
+        """
+        Processes a batch of inputs in one go
+        
+        Override this when the model is cheaper per item in batches.
+        The default implementation processes the inputs concurrently one by one.
+        
+        Args:
+            inputs (list): List of inputs for the model
+            
+        Returns:
+            list: One output (or Exception) per input, in the same order
+        """
+        return await asyncio.gather(
+            *(self.process(input_data) for input_data in inputs),
+            return_exceptions=True
+        )
+    
+    def process_batch_sync(self, inputs):
+        """
+        Synchronous version of process_batch for CPU-bound models
+        
+        Args:
+            inputs (list): List of inputs for the model
+            
+        Returns:
+            list: One output (or Exception) per input, in the same order
+        """
+        results = []
+        for input_data in inputs:
+            try:
+                results.append(self.process_sync(input_data))
+            except Exception as e:
+                results.append(e)
+        return results
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+
+from src.models.errors import ModelOverloadedError
+
+class BatchScheduler:
+    """
+    Collects concurrent requests for a single model into micro-batches.
+
+    Requests are queued until either `max_batch_size` items are waiting or
+    `max_wait_ms` has passed since the first item of the batch arrived. The batch
+    is then handed to `run_batch` (usually the model's `process_batch`) and every
+    result is routed back to the caller that submitted it.
+    """
+
+    def __init__(self, model, run_batch, max_batch_size, max_wait_ms, max_queue):
+        """
+        Initialize the scheduler
+
+        Args:
+            model (BaseModel): The model instance to run batches on
+            run_batch (callable): Coroutine function taking a list of inputs and returning a list of outputs
+            max_batch_size (int): Maximum number of inputs per batch
+            max_wait_ms (float): Maximum time to wait for a batch to fill up
+            max_queue (int): Maximum number of requests waiting to be batched
+        """
+        self.model = model
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self.max_queue = max_queue
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.worker = None
+        # Whether a batch is being collected or processed
+        self.busy = False
+
+        # batch_size_counts[n] is the number of batches that held n inputs
+        self.batch_size_counts = [0] * (self.max_batch_size + 1)
+        self.total_batches = 0
+        self.total_items = 0
+        self.rejected = 0
+        self.failed_batches = 0
+
+    def start(self):
+        """
+        Start the background batching task if it is not running yet
+        """
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._run())
+
+    async def submit(self, input_data):
+        """
+        Queue an input and wait for its result
+
+        Args:
+            input_data (dict): Input for the model
+
+        Returns:
+            dict: Output from the model for this input
+        """
+        self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((input_data, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise ModelOverloadedError(
+                f"Batch queue for model {self.model.get_model_name()} is full"
+            )
+
+        return await future
+
+    async def _run(self):
+        """
+        Form batches from the queue and dispatch them one after another
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.queue.get()]
+            self.busy = True
+            try:
+                deadline = loop.time() + self.max_wait
+
+                while len(batch) < self.max_batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                        continue
+                    except asyncio.QueueEmpty:
+                        pass
+
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                await self._dispatch(batch)
+            except asyncio.CancelledError:
+                # Closed while collecting or running the batch, its callers would
+                # otherwise wait for results that never come
+                self._fail(batch, ModelOverloadedError("Model is shutting down"))
+                raise
+            finally:
+                self.busy = False
+
+    async def _dispatch(self, batch):
+        """
+        Run a batch through the model and resolve the callers' futures
+
+        Args:
+            batch (list): List of (input_data, future) tuples
+        """
+        # Callers that gave up while waiting do not need a result
+        batch = [(input_data, future) for input_data, future in batch if not future.done()]
+        if not batch:
+            return
+
+        self.total_batches += 1
+        self.total_items += len(batch)
+        self.batch_size_counts[len(batch)] += 1
+
+        try:
+            results = await self.run_batch([input_data for input_data, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"process_batch returned {len(results)} results for {len(batch)} inputs"
+                )
+        except Exception as e:
+            self.failed_batches += 1
+            logging.error(f"Batch of {len(batch)} failed for model {self.model.get_model_name()}: {str(e)}")
+            self._fail(batch, e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch, error):
+        """
+        Fail the callers of a batch that are still waiting
+        """
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def is_idle(self):
+        """
+        Whether no request is waiting to be batched or being processed
+
+        Returns:
+            bool: True if the scheduler has nothing to do
+        """
+        return self.queue.empty() and not self.busy
+
+    async def close(self):
+        """
+        Stop the background task and fail any requests still waiting
+        """
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+        while not self.queue.empty():
+            self._fail([self.queue.get_nowait()], ModelOverloadedError("Model is shutting down"))
+
+    def get_stats(self):
+        """
+        Get batching statistics
+
+        Returns:
+            dict: Queue depth, totals and a batch-size histogram
+        """
+        return {
+            "maxBatchSize": self.max_batch_size,
+            "maxWaitMs": self.max_wait * 1000,
+            "maxQueue": self.max_queue,
+            "queueDepth": self.queue.qsize(),
+            "batches": self.total_batches,
+            "items": self.total_items,
+            "averageBatchSize": round(self.total_items / self.total_batches, 2) if self.total_batches else 0,
+            "rejected": self.rejected,
+            "failedBatches": self.failed_batches,
+            "batchSizeHistogram": {
+                str(size): count
+                for size, count in enumerate(self.batch_size_counts)
+                if count
+            }
+        }
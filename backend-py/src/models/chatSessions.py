@@ -0,0 +1,483 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+
+from src.metrics import registry, CHAT_SESSIONS, CHAT_SESSION_EVENTS, CHAT_SESSION_TURN_DURATION
+from src.models.baseModel import ModelType
+from src.models.errors import DeadlineExceededError
+from src.middlewares.logShipper import log_shipper
+from src.requestContext import RequestContext, run_in_context, set_request_context, record_abandoned
+
+# Rough per-turn overhead of the dict and list entry, added to the text size
+TURN_OVERHEAD_BYTES = 200
+
+ENDPOINT = "/api/process/chat/ws"
+
+class ChatSession:
+    """
+    Server-side state of one chat conversation
+    """
+
+    def __init__(self, session_id, model_name, history):
+        """
+        Args:
+            session_id (str): Id of the session
+            model_name (str): Name of the chat model
+            history (list): Turns of the conversation so far
+        """
+        self.id = session_id
+        self.model_name = model_name
+        self.history = history
+        self.bytes = sum(turn_size(turn) for turn in history)
+        self.created_at = int(time.time() * 1000)
+        self.last_active = time.monotonic()
+        self.websocket = None
+        self.busy = False
+
+def turn_size(turn):
+    """
+    Estimate the memory held by a turn
+
+    Args:
+        turn (dict): The turn
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    content = turn.get("content") if isinstance(turn, dict) else turn
+    return TURN_OVERHEAD_BYTES + (len(content) if isinstance(content, str) else 0)
+
+class ChatSessionManager:
+    """
+    Keeps chat conversations on the server for WebSocket clients.
+
+    A session holds the model name and the history, so clients only send the
+    new user message of each turn. Sessions outlive their connection: a client
+    that reconnects resumes the session by its id. Sessions idle for
+    CHAT_SESSION_IDLE_TIMEOUT_SECONDS are dropped, and the least recently
+    active ones are dropped when the histories grow past CHAT_SESSION_MAX_BYTES
+    or there are more than CHAT_SESSION_MAX_SESSIONS sessions. Sessions are
+    kept per worker process.
+    """
+
+    def __init__(self, model_manager):
+        """
+        Initialize the ChatSessionManager
+
+        Args:
+            model_manager: The ModelManager instance
+        """
+        self.model_manager = model_manager
+        self.idle_timeout = float(os.environ.get("CHAT_SESSION_IDLE_TIMEOUT_SECONDS", 1800))
+        self.max_bytes = int(os.environ.get("CHAT_SESSION_MAX_BYTES", 64 * 1024 * 1024))
+        self.max_sessions = int(os.environ.get("CHAT_SESSION_MAX_SESSIONS", 10000))
+        self.sweep_interval = float(os.environ.get("CHAT_SESSION_SWEEP_INTERVAL_MS", 10000)) / 1000
+
+        # Least recently active first
+        self.sessions = OrderedDict()
+        self.current_bytes = 0
+        self.sweep_task = None
+
+        self.counters = {
+            "created": 0,
+            "resumed": 0,
+            "evictedIdle": 0,
+            "evictedMemory": 0,
+            "turns": 0,
+            "failedTurns": 0
+        }
+        registry.add_collector(self.collect_metrics)
+
+    def start(self):
+        """
+        Start dropping idle sessions
+        """
+        if self.sweep_task is None and self.idle_timeout > 0:
+            self.sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        """
+        Stop dropping idle sessions
+        """
+        if self.sweep_task is not None:
+            self.sweep_task.cancel()
+            try:
+                await self.sweep_task
+            except asyncio.CancelledError:
+                pass
+            self.sweep_task = None
+
+    def open_session(self, model_name=None, session_id=None, history=None):
+        """
+        Resume a session or create a new one
+
+        A session id that is not known, e.g. because the session was evicted or
+        lives in another worker, creates a new session with that id from the
+        given history.
+
+        Args:
+            model_name (str): Name of the chat model, required for new sessions
+            session_id (str): Id of the session to resume
+            history (list): Turns of the conversation so far, for new sessions
+
+        Returns:
+            ChatSession: The session
+
+        Raises:
+            ValueError: If the model or the history is not valid
+        """
+        session = self.sessions.get(session_id) if session_id else None
+        if session is not None:
+            if model_name and model_name.lower() != session.model_name:
+                session.model_name = self._resolve_model_name(model_name)
+            self._touch(session)
+            self.counters["resumed"] += 1
+            CHAT_SESSION_EVENTS.labels("resumed").inc()
+            return session
+
+        if not model_name:
+            raise ValueError("Model name must be specified to start a session")
+        if history is not None and (not isinstance(history, list) or not all(isinstance(turn, dict) for turn in history)):
+            raise ValueError("conversationHistory must be a list of turns")
+
+        session = ChatSession(session_id or uuid.uuid4().hex, self._resolve_model_name(model_name), list(history or []))
+        self.sessions[session.id] = session
+        self.current_bytes += session.bytes
+        self.counters["created"] += 1
+        CHAT_SESSION_EVENTS.labels("created").inc()
+        self._enforce_limits(session)
+        return session
+
+    def _resolve_model_name(self, model_name):
+        result = self.model_manager.get_model_by_name(model_name)
+        if not result["success"]:
+            raise ValueError(result["error"])
+        if result["model"].get_model_type() != ModelType.CHAT:
+            raise ValueError(f"Model {model_name} is not a chat model")
+        return result["model"].get_model_name().lower()
+
+    def get_session(self, session_id):
+        """
+        Get a session by id
+
+        Args:
+            session_id (str): Id of the session
+
+        Returns:
+            ChatSession: The session, None if it does not exist
+        """
+        return self.sessions.get(session_id)
+
+    def attach(self, session, websocket):
+        """
+        Mark a session as used by a connection, taking it over from an older one
+
+        Args:
+            session (ChatSession): The session
+            websocket (WebSocket): The connection
+        """
+        previous = session.websocket
+        session.websocket = websocket
+        if previous is not None and previous is not websocket:
+            asyncio.create_task(self._close(previous, 4001, "Session resumed by another connection"))
+
+    def detach(self, session, websocket):
+        """
+        Mark a session as no longer used by a connection
+
+        Args:
+            session (ChatSession): The session
+            websocket (WebSocket): The connection
+        """
+        if session.websocket is websocket:
+            session.websocket = None
+        self._touch(session)
+
+    def reset(self, session):
+        """
+        Clear the history of a session
+
+        Args:
+            session (ChatSession): The session
+        """
+        if session.id in self.sessions:
+            self.current_bytes -= session.bytes
+        session.history = []
+        session.bytes = 0
+        self._touch(session)
+
+    def _touch(self, session):
+        session.last_active = time.monotonic()
+        if session.id in self.sessions:
+            self.sessions.move_to_end(session.id)
+
+    def _add_turn(self, session, turn):
+        size = turn_size(turn)
+        session.history.append(turn)
+        session.bytes += size
+        self.current_bytes += size
+
+    def _remove_last_turn(self, session):
+        size = turn_size(session.history.pop())
+        session.bytes -= size
+        self.current_bytes -= size
+
+    def _start_turn(self, session, message):
+        """
+        Add the user message to the history and build the model input
+
+        The history list is passed as it is, so building the input does not
+        depend on the length of the conversation. Models must not modify it.
+        """
+        if session.busy:
+            raise ValueError("The session is already processing a message")
+        user_message = message.get("userMessage")
+        if not isinstance(user_message, str):
+            raise ValueError("userMessage must be a string")
+        if session.id not in self.sessions:
+            raise ValueError("The session was evicted, start a new one")
+
+        session.busy = True
+        self._touch(session)
+        self._add_turn(session, {"actor": "user", "content": user_message})
+
+        input_data = {key: value for key, value in message.items() if key != "type"}
+        input_data["modelName"] = session.model_name
+        input_data["conversationHistory"] = session.history
+        return input_data
+
+    def _finish_turn(self, session, message, start_time, reply=None, error=None, status=200):
+        """
+        Record a turn and keep the reply in the history, or drop the user message on failure
+        """
+        session.busy = False
+        self._touch(session)
+        if reply is not None:
+            self._add_turn(session, reply)
+            self.counters["turns"] += 1
+        else:
+            if session.history and session.history[-1].get("actor") == "user":
+                self._remove_last_turn(session)
+            self.counters["failedTurns"] += 1
+
+        elapsed = time.time() - start_time
+        CHAT_SESSION_TURN_DURATION.labels(session.model_name).observe(elapsed)
+        # Log the turn like an HTTP request, without the history the server already holds
+        log_shipper.enqueue({
+            "timestamp": int(start_time * 1000),
+            "endpoint": ENDPOINT,
+            "input": {
+                "modelName": session.model_name,
+                "userMessage": message.get("userMessage"),
+                "sessionId": session.id,
+                "turn": len(session.history)
+            },
+            "model": session.model_name,
+            "output": reply if error is None else {"error": error},
+            "status": status,
+            "responseTimeMs": round(elapsed * 1000, 2)
+        })
+        self._enforce_limits(session)
+
+    async def reply(self, session, message):
+        """
+        Run one turn of a session through its model
+
+        Args:
+            session (ChatSession): The session
+            message (dict): Message with userMessage and optionally timeoutMs or deadline
+
+        Returns:
+            dict: The model reply, also added to the history
+        """
+        input_data = self._start_turn(session, message)
+        start_time = time.time()
+        try:
+            model = self._get_model(session)
+            context = RequestContext.from_request({}, input_data, ENDPOINT)
+            reply = await run_in_context(
+                None,
+                context,
+                lambda: self.model_manager.process(model, input_data),
+                self.model_manager.get_average_service_time(session.model_name)
+            )
+        except asyncio.CancelledError:
+            record_abandoned(session.model_name, "disconnected", 0.0)
+            self._finish_turn(session, message, start_time, error="Client disconnected", status=499)
+            raise
+        except Exception as e:
+            self._finish_turn(session, message, start_time, error=str(e), status=getattr(e, "status_code", 500))
+            raise
+
+        self._finish_turn(session, message, start_time, reply=reply)
+        return reply
+
+    async def stream_reply(self, session, message):
+        """
+        Stream one turn of a session from its model
+
+        Args:
+            session (ChatSession): The session
+            message (dict): Message with userMessage and optionally timeoutMs or deadline
+
+        Yields:
+            dict: Output chunks, the joined reply is added to the history
+        """
+        input_data = self._start_turn(session, message)
+        start_time = time.time()
+        contents = []
+        actor = "model"
+        try:
+            model = self._get_model(session)
+            context = RequestContext.from_request({}, input_data, ENDPOINT)
+            if context.expired():
+                record_abandoned(session.model_name, "expired", self.model_manager.get_average_service_time(session.model_name))
+                raise DeadlineExceededError("Request deadline passed before it started")
+            set_request_context(context)
+
+            model_stream = self.model_manager.stream(model, input_data)
+            try:
+                while True:
+                    remaining = context.remaining()
+                    try:
+                        # Only the model is timed, not the consumer of the chunks
+                        chunk = await asyncio.wait_for(
+                            model_stream.__anext__(),
+                            max(0.0, remaining) if remaining is not None else None
+                        )
+                    except StopAsyncIteration:
+                        break
+                    except TimeoutError:
+                        context.cancelled = True
+                        record_abandoned(session.model_name, "deadline", 0.0)
+                        raise DeadlineExceededError("Request deadline exceeded")
+
+                    if isinstance(chunk, dict):
+                        actor = chunk.get("actor", actor)
+                        contents.append(str(chunk.get("content", "")))
+                    yield chunk
+            finally:
+                await model_stream.aclose()
+        except (asyncio.CancelledError, GeneratorExit):
+            record_abandoned(session.model_name, "disconnected", 0.0)
+            self._finish_turn(session, message, start_time, error="Client disconnected", status=499)
+            raise
+        except Exception as e:
+            self._finish_turn(session, message, start_time, error=str(e), status=getattr(e, "status_code", 500))
+            raise
+
+        self._finish_turn(session, message, start_time, reply={"actor": actor, "content": "".join(contents)})
+
+    def _get_model(self, session):
+        result = self.model_manager.get_model_by_name(session.model_name)
+        if not result["success"]:
+            raise ValueError(result["error"])
+        return result["model"]
+
+    def _enforce_limits(self, keep):
+        """
+        Drop the least recently active sessions while over the memory or session cap
+
+        Sessions without a connection go first. The session being served is never dropped.
+        """
+        if self.current_bytes <= self.max_bytes and len(self.sessions) <= self.max_sessions:
+            return
+
+        candidates = [session for session in self.sessions.values() if session.websocket is None]
+        candidates += [session for session in self.sessions.values() if session.websocket is not None]
+        for session in candidates:
+            if self.current_bytes <= self.max_bytes and len(self.sessions) <= self.max_sessions:
+                break
+            if session is keep or session.busy:
+                continue
+            self.evict(session, "memory")
+
+        if self.current_bytes > self.max_bytes:
+            logging.warning(f"Chat sessions use {self.current_bytes} bytes, over the cap of {self.max_bytes}")
+
+    def evict(self, session, reason):
+        """
+        Drop a session, closing its connection if it has one
+
+        Args:
+            session (ChatSession): The session
+            reason (str): idle or memory
+        """
+        if self.sessions.pop(session.id, None) is None:
+            return
+        self.current_bytes -= session.bytes
+
+        counter = "evictedIdle" if reason == "idle" else "evictedMemory"
+        self.counters[counter] += 1
+        CHAT_SESSION_EVENTS.labels(f"evicted_{reason}").inc()
+
+        if session.websocket is not None:
+            asyncio.create_task(self._close(session.websocket, 4000, f"Session evicted ({reason})"))
+            session.websocket = None
+
+    @staticmethod
+    async def _close(websocket, code, reason):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            # Already closed by the client
+            pass
+
+    def evict_idle_sessions(self):
+        """
+        Drop sessions that have not been active for the idle timeout
+
+        Returns:
+            int: Number of sessions dropped
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = []
+        for session in self.sessions.values():
+            if session.last_active > cutoff:
+                # Ordered by activity, the rest are more recent
+                break
+            if not session.busy:
+                idle.append(session)
+
+        for session in idle:
+            self.evict(session, "idle")
+        return len(idle)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                evicted = self.evict_idle_sessions()
+                if evicted:
+                    logging.info(f"Dropped {evicted} idle chat sessions")
+            except Exception:
+                logging.exception("Error dropping idle chat sessions")
+
+    def collect_metrics(self):
+        """
+        Refresh the session gauges before metrics are scraped
+        """
+        connected = sum(1 for session in self.sessions.values() if session.websocket is not None)
+        CHAT_SESSIONS.labels("connected").set(connected)
+        CHAT_SESSIONS.labels("disconnected").set(len(self.sessions) - connected)
+
+    def get_stats(self):
+        """
+        Get session statistics
+
+        Returns:
+            dict: Session counts, memory use and counters
+        """
+        connected = sum(1 for session in self.sessions.values() if session.websocket is not None)
+        return {
+            "sessions": len(self.sessions),
+            "connected": connected,
+            "bytes": self.current_bytes,
+            "maxBytes": self.max_bytes,
+            "maxSessions": self.max_sessions,
+            "idleTimeoutSeconds": self.idle_timeout,
+            "counters": self.counters
+        }
@@ -0,0 +1,32 @@
+class ModelOverloadedError(Exception):
+    """
+    Raised when a model cannot accept more work right now.
+    Routes turn this into a 429 or 503 response with a Retry-After header.
+    """
+
+    def __init__(self, message, retry_after=1, status_code=503):
+        """
+        Args:
+            message (str): Human readable reason
+            retry_after (int): Seconds the client should wait before retrying
+            status_code (int): HTTP status to respond with, 429 or 503
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+class DeadlineExceededError(Exception):
+    """
+    Raised when the deadline of a request passed before its work was done.
+    Routes turn this into a 504 response.
+    """
+
+    status_code = 504
+
+class ClientDisconnectedError(Exception):
+    """
+    Raised when the client of a request went away before its work was done
+    """
+
+    # Nginx's non-standard "client closed request", only seen in logs
+    status_code = 499
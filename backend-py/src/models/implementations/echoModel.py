@@ -1,15 +1,24 @@
+import asyncio
 from src.models.baseModel import BaseModel, ModelType
 
 class EchoModel(BaseModel):
     """
     EchoModel - A simple model that echoes back the user's message
+
+    It also serves as the reference use of the prefix cache: the conversation
+    is "encoded" into its words, and only the turns added since the last
+    cached prefix are encoded on each call.
     """
     
+    MODEL_NAME = "echo"
+    MODEL_TYPE = ModelType.CHAT
+    WARMUP_INPUTS = [{"userMessage": "Hello", "conversationHistory": []}]
+    
     def __init__(self):
         """
         Initialize a new EchoModel instance
         """
-        super().__init__(ModelType.CHAT, "echo")
+        super().__init__()
     
     async def process(self, input_data):
         """
@@ -21,8 +30,80 @@ class EchoModel(BaseModel):
         Returns:
             dict: Response object with actor and content
         """
-        user_message = input_data.get("userMessage", "")
-        return {
+        history, state = self.encode_history(input_data)
+        reply = {
             "actor": "model",
-            "content": f'You said: "{user_message}" - Hello from the Python Echo Model!'
+            "content": self.build_reply(input_data)
         }
+        self.save_prefix_state(history + [reply], self.encode_turns(state, [reply]))
+        return reply
+    
+    async def stream(self, input_data):
+        """
+        Streams the same response as process one word at a time
+        
+        Args:
+            input_data (dict): Input containing userMessage and conversationHistory
+            
+        Yields:
+            dict: Response chunks with actor and the next piece of content
+        """
+        history, state = self.encode_history(input_data)
+        content = self.build_reply(input_data)
+        words = content.split(" ")
+        for index, word in enumerate(words):
+            # Give other requests a chance to run between chunks
+            await asyncio.sleep(0)
+            yield {
+                "actor": "model",
+                "content": word if index == len(words) - 1 else f"{word} "
+            }
+        reply = {"actor": "model", "content": content}
+        self.save_prefix_state(history + [reply], self.encode_turns(state, [reply]))
+    
+    def encode_history(self, input_data):
+        """
+        Encodes the conversation history, starting from its longest cached prefix
+        
+        Args:
+            input_data (dict): Input containing conversationHistory
+            
+        Returns:
+            tuple: (history, state covering all of it)
+        """
+        history = input_data.get("conversationHistory")
+        if not isinstance(history, list):
+            history = []
+        turns, state = self.get_prefix_state(history)
+        return history, self.encode_turns(state, history[turns:])
+    
+    @staticmethod
+    def encode_turns(state, turns):
+        """
+        Extends an encoded conversation with more turns
+        
+        Args:
+            state (tuple): Words of the turns encoded so far, None for none
+            turns (list): Turns to add
+            
+        Returns:
+            tuple: Words of the whole conversation
+        """
+        words = list(state or ())
+        for turn in turns:
+            if isinstance(turn, dict):
+                words.extend(str(turn.get("content", "")).lower().split())
+        return tuple(words)
+    
+    def build_reply(self, input_data):
+        """
+        Builds the reply text for the user message
+        
+        Args:
+            input_data (dict): Input containing userMessage
+            
+        Returns:
+            str: The reply text
+        """
+        user_message = input_data.get("userMessage", "")
+        return f'You said: "{user_message}" - Hello from the Python Echo Model!'
@@ -0,0 +1,119 @@
+import re
+import zlib
+
+import numpy
+
+from src.models.baseModel import BaseModel, ModelType
+from src.models.modelConfig import get_model_setting
+
+class HashEmbedding(BaseModel):
+    """
+    HashEmbedding - Embeds texts by hashing their words and character trigrams
+    into a fixed number of dimensions, without a trained vocabulary
+    """
+
+    MODEL_NAME = "hash-embed"
+    MODEL_TYPE = ModelType.EMBED
+    WARMUP_INPUTS = [{"texts": ["Warm-up text to embed."]}]
+
+    # Length of the vectors, HASH_EMBED_DIMENSIONS overrides it
+    DIMENSIONS = 256
+
+    # Requests arriving together are embedded in one pass
+    BATCH_MAX_SIZE = 32
+
+    # Output only depends on the input
+    CACHE_ENABLED = True
+
+    def __init__(self):
+        """
+        Initialize a new HashEmbedding instance
+        """
+        super().__init__()
+        self.dimensions = get_model_setting(type(self), self.model_name, "DIMENSIONS", int)
+
+    def process_sync(self, input_data):
+        """
+        Embeds the texts of the input
+
+        Args:
+            input_data (dict): Input containing texts, or a single text
+
+        Returns:
+            dict: Response object with embeddings, one per text, and dimensions
+        """
+        return self.process_batch_sync([input_data])[0]
+
+    def process_batch_sync(self, inputs):
+        """
+        Embeds the texts of all inputs in one pass
+
+        Args:
+            inputs (list): Inputs containing texts, or a single text
+
+        Returns:
+            list: One output per input, in the same order
+        """
+        texts = [get_texts(input_data) for input_data in inputs]
+        embeddings = self.embed([text for input_texts in texts for text in input_texts]).tolist()
+
+        results = []
+        start = 0
+        for input_texts in texts:
+            results.append({
+                "embeddings": embeddings[start:start + len(input_texts)],
+                "dimensions": self.dimensions
+            })
+            start += len(input_texts)
+        return results
+
+    def embed(self, texts):
+        """
+        Builds the unit-length vectors of texts
+
+        Every feature adds its weight to the dimension its hash selects, with
+        the sign taken from another bit of the hash so collisions cancel out
+        on average.
+
+        Args:
+            texts (list): The texts
+
+        Returns:
+            numpy.ndarray: float32 matrix of shape (texts, dimensions)
+        """
+        rows = []
+        hashes = []
+        weights = []
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                features = [(word, 1.0)]
+                padded = f"#{word}#"
+                features.extend((padded[index:index + 3], 0.5) for index in range(len(padded) - 2))
+                for feature, weight in features:
+                    rows.append(row)
+                    hashes.append(zlib.crc32(feature.encode("utf-8")))
+                    weights.append(weight)
+
+        hashes = numpy.array(hashes, dtype=numpy.uint32)
+        signs = numpy.where(hashes >> 31, -1.0, 1.0).astype(numpy.float32)
+        matrix = numpy.zeros((len(texts), self.dimensions), dtype=numpy.float32)
+        numpy.add.at(matrix, (numpy.array(rows, dtype=numpy.intp), hashes % self.dimensions), signs * numpy.array(weights, dtype=numpy.float32))
+
+        norms = numpy.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+def get_texts(input_data):
+    """
+    Get the texts of an embedding input
+
+    Args:
+        input_data (dict): Input containing texts, or a single text
+
+    Returns:
+        list: The texts
+    """
+    texts = input_data.get("texts")
+    if texts is None:
+        texts = [input_data.get("text", "")]
+    return [str(text) for text in texts]
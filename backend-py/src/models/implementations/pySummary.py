@@ -5,8 +5,15 @@ class PySummary(BaseModel):
     A model that sends the same summary for any input.
     """
 
+    MODEL_NAME = 'py-summary'
+    MODEL_TYPE = ModelType.SUMMARIZE
+    WARMUP_INPUTS = [{'originalText': 'Warm-up text to summarize.'}]
+
+    # Output only depends on the input, so repeated texts are served from cache
+    CACHE_ENABLED = True
+
     def __init__(self):
-        super().__init__(ModelType.SUMMARIZE, 'py-summary')
+        super().__init__()
 
     async def process(self, input_data: dict) -> dict:
         """
@@ -0,0 +1,477 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import itertools
+
+from src.models.errors import ModelOverloadedError
+from src.models.jobStore import JobStore
+from src.models.modelConfig import get_model_setting
+from src.middlewares.logShipper import log_shipper
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+def get_process_start_time(pid):
+    """
+    Get when a process started, to tell it apart from a later one reusing its pid
+
+    Args:
+        pid (int): Id of the process
+
+    Returns:
+        int: Start time in clock ticks since boot, None if the process does not exist or /proc is missing
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as stat_file:
+            # The command name may contain spaces, the fields after it do not
+            return int(stat_file.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+def is_owner_running(owner):
+    """
+    Check whether the worker process that owns a job is still running
+
+    Args:
+        owner (dict): worker, pid and startTime of the owning process, None if unknown
+
+    Returns:
+        bool: True if the process is running
+    """
+    if not owner or not isinstance(owner.get("pid"), int):
+        return False
+    pid = owner["pid"]
+    if pid == os.getpid():
+        # Left over from an earlier run of this process
+        return False
+    if os.path.isdir("/proc/self"):
+        start_time = get_process_start_time(pid)
+        return start_time is not None and start_time == owner.get("startTime")
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class JobQueue:
+    """
+    Runs model requests as async jobs so long calls do not hold HTTP connections.
+
+    Every model has its own priority queue, bounded by JOB_MAX_QUEUE, and
+    JOB_WORKERS worker tasks, both per-model settings. Higher priorities run
+    first, equal priorities in submission order. When JOB_STORE_PATH is set, jobs
+    are kept in SQLite: jobs that were queued or running when the service stopped
+    are queued again on start, and finished jobs can still be fetched. Finished
+    jobs are kept for JOB_RESULT_TTL_SECONDS. With several workers per node the
+    store is what lets any worker answer for jobs run by another one, and
+    cancelling such a job leaves a request in the store that the worker
+    running it picks up within JOB_CANCEL_POLL_MS. Every job records the
+    worker owning it; on start a worker only takes over the unfinished jobs
+    of owners that are no longer running, those of the worker it replaces or,
+    for the primary, of any worker.
+    """
+
+    def __init__(self, model_manager):
+        """
+        Initialize the JobQueue
+
+        Args:
+            model_manager: The ModelManager instance
+        """
+        self.model_manager = model_manager
+        self.store_path = os.environ.get("JOB_STORE_PATH")
+        self.result_ttl = float(os.environ.get("JOB_RESULT_TTL_SECONDS", 3600))
+        self.cancel_poll_interval = int(os.environ.get("JOB_CANCEL_POLL_MS", 500)) / 1000
+
+        self.store = None
+        self.owner = None
+        self.jobs = {}
+        self.queues = {}
+        self.queued_counts = {}
+        self.workers = {}
+        self.running = {}
+        self.waiters = {}
+        self.sequence = itertools.count()
+        self.cleanup_task = None
+        self.cancel_poll_task = None
+
+        self.counters = {
+            "submitted": 0,
+            "rejected": 0,
+            SUCCEEDED: 0,
+            FAILED: 0,
+            CANCELLED: 0
+        }
+
+    async def start(self, worker_id=None, primary=True):
+        """
+        Open the store and queue the jobs left unfinished by workers that stopped
+
+        Args:
+            worker_id (int): Index of this worker in a multi-worker node, None otherwise
+            primary (bool): Whether this worker takes over the jobs of any stopped worker
+        """
+        self.owner = {"worker": worker_id, "pid": os.getpid(), "startTime": get_process_start_time(os.getpid())}
+        if self.store_path:
+            try:
+                self.store = await asyncio.to_thread(JobStore, self.store_path)
+                unfinished = await asyncio.to_thread(self.store.load_unfinished)
+                for job in unfinished:
+                    previous_owner = job.get("owner")
+                    if is_owner_running(previous_owner):
+                        continue
+                    if not primary and (previous_owner or {}).get("worker") != worker_id:
+                        continue
+                    job.update({"status": QUEUED, "startedAt": None, "owner": self.owner})
+                    if not await asyncio.to_thread(self.store.claim, job, previous_owner):
+                        # Another worker took it over first
+                        continue
+                    self.jobs[job["id"]] = job
+                    try:
+                        self._enqueue(job, self._resolve_model(job["type"], job["model"]))
+                        logging.info(f"Restored job {job['id']} for model {job['model']}")
+                    except ValueError as e:
+                        await self._finish(job, FAILED, error=str(e))
+            except Exception as e:
+                logging.error(f"Failed to open job store at {self.store_path}: {str(e)}")
+                self.store = None
+
+        self.cleanup_task = asyncio.create_task(self._cleanup_loop())
+        if self.store is not None:
+            self.cancel_poll_task = asyncio.create_task(self._cancel_poll_loop())
+
+    async def stop(self):
+        """
+        Stop the workers. Jobs still running are queued again on the next start.
+        """
+        tasks = [task for workers in self.workers.values() for task in workers]
+        if self.cleanup_task is not None:
+            tasks.append(self.cleanup_task)
+        if self.cancel_poll_task is not None:
+            tasks.append(self.cancel_poll_task)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.workers.clear()
+        self.cleanup_task = None
+        self.cancel_poll_task = None
+        if self.store is not None:
+            await asyncio.to_thread(self.store.close)
+            self.store = None
+
+    def _resolve_model(self, model_type, model_name):
+        """
+        Get the model a job runs on
+
+        Returns:
+            BaseModel: The model instance
+
+        Raises:
+            ValueError: If the model does not exist or is of another type
+        """
+        if not isinstance(model_name, str) or not model_name:
+            raise ValueError("Missing model name")
+
+        model_result = self.model_manager.get_model_by_name(model_name)
+        if not model_result["success"]:
+            raise ValueError(model_result["error"])
+
+        model = model_result["model"]
+        if model.get_model_type().value != model_type:
+            raise ValueError(f"Model {model.get_model_name()} is not a {model_type.lower()} model")
+
+        return model
+
+    def _get_queue(self, model):
+        """
+        Get the queue of a model, starting its workers on first use
+        """
+        model_name = model.get_model_name().lower()
+        if model_name not in self.queues:
+            worker_count = max(1, get_model_setting(type(model), model_name, "JOB_WORKERS"))
+
+            self.queues[model_name] = asyncio.PriorityQueue()
+            self.workers[model_name] = [
+                asyncio.create_task(self._worker(model_name, self.queues[model_name]))
+                for _ in range(worker_count)
+            ]
+            logging.info(f"Started {worker_count} job workers for model {model_name}")
+
+        return self.queues[model_name]
+
+    def _enqueue(self, job, model):
+        self._get_queue(model).put_nowait((-job["priority"], next(self.sequence), job["id"]))
+        self.queued_counts[job["model"]] = self.queued_counts.get(job["model"], 0) + 1
+
+    def _dequeued(self, job):
+        self.queued_counts[job["model"]] -= 1
+
+    async def submit(self, model_type, input_data, priority=0):
+        """
+        Queue a job
+
+        Args:
+            model_type (ModelType): Type of model to run the job on
+            input_data (dict): Input for the model, naming it with modelName
+            priority (int): Higher priorities run first
+
+        Returns:
+            dict: The queued job
+
+        Raises:
+            ValueError: If the input does not name a model of the given type
+            ModelOverloadedError: If the model's job queue is full
+        """
+        model = self._resolve_model(model_type.value, input_data.get("modelName"))
+        model_name = model.get_model_name().lower()
+
+        max_queue = get_model_setting(type(model), model_name, "JOB_MAX_QUEUE")
+        if self.queued_counts.get(model_name, 0) >= max_queue:
+            self.counters["rejected"] += 1
+            raise ModelOverloadedError(f"Too many jobs queued for model {model_name}", status_code=429)
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "type": model_type.value,
+            "model": model_name,
+            "priority": priority,
+            "status": QUEUED,
+            "input": input_data,
+            "result": None,
+            "error": None,
+            "createdAt": int(time.time() * 1000),
+            "startedAt": None,
+            "finishedAt": None,
+            "owner": self.owner
+        }
+
+        self.jobs[job["id"]] = job
+        self._enqueue(job, model)
+        await self._save(job)
+        self.counters["submitted"] += 1
+        return job
+
+    async def get(self, job_id):
+        """
+        Get a job by id
+
+        Args:
+            job_id (str): Id of the job
+
+        Returns:
+            dict: The job, None if it does not exist
+        """
+        job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = await asyncio.to_thread(self.store.get, job_id)
+        return job
+
+    async def wait(self, job_id, timeout):
+        """
+        Wait until a job has finished
+
+        Args:
+            job_id (str): Id of the job
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            dict: The job, finished or not, None if it does not exist
+        """
+        job = await self.get(job_id)
+        if job is None or job["status"] in FINISHED_STATUSES or timeout <= 0:
+            return job
+
+        try:
+            async with asyncio.timeout(timeout):
+                while job["status"] not in FINISHED_STATUSES:
+                    if job_id in self.jobs:
+                        await self.waiters.setdefault(job_id, asyncio.Event()).wait()
+                    else:
+                        # Run by another worker of the node, only the store sees its progress
+                        await asyncio.sleep(0.5)
+                        job = await self.get(job_id) or job
+        except TimeoutError:
+            pass
+
+        return self.jobs.get(job_id, job)
+
+    async def cancel(self, job_id):
+        """
+        Cancel a queued or running job
+
+        A job run by another worker of the node is cancelled through a
+        request in the store, and waited for briefly.
+
+        Args:
+            job_id (str): Id of the job
+
+        Returns:
+            dict: The job, None if it does not exist. It may not have finished
+                yet when the worker running it did not cancel it in time.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = await self.get(job_id)
+            if job is not None and job["status"] not in FINISHED_STATUSES:
+                await asyncio.to_thread(self.store.request_cancel, job_id)
+                return await self.wait(job_id, 5)
+            return job
+
+        if job["status"] == QUEUED:
+            # The queue entry is skipped when a worker picks it up
+            self._dequeued(job)
+            await self._finish(job, CANCELLED)
+        elif job["status"] == RUNNING and job_id in self.running:
+            self.running[job_id].cancel()
+            return await self.wait(job_id, 5)
+
+        return job
+
+    async def _worker(self, model_name, queue):
+        """
+        Run the jobs of one model one at a time
+        """
+        while True:
+            _, _, job_id = await queue.get()
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                continue
+
+            self._dequeued(job)
+            job["status"] = RUNNING
+            job["startedAt"] = int(time.time() * 1000)
+            await self._save(job)
+            self._notify(job_id)
+
+            task = asyncio.create_task(self._process(job))
+            self.running[job_id] = task
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                # Shutting down, the job is queued again on the next start
+                task.cancel()
+                raise
+            finally:
+                self.running.pop(job_id, None)
+
+            if task.cancelled():
+                await self._finish(job, CANCELLED)
+            elif task.exception() is not None:
+                error = task.exception()
+                if not isinstance(error, ValueError):
+                    logging.error(f"Job {job_id} failed: {str(error)}")
+                await self._finish(job, FAILED, error=str(error))
+            else:
+                await self._finish(job, SUCCEEDED, result=task.result())
+
+    async def _process(self, job):
+        """
+        Run a job through its model, waiting while the model is overloaded
+        """
+        model = self._resolve_model(job["type"], job["model"])
+        while True:
+            try:
+                return await self.model_manager.process(model, job["input"])
+            except ModelOverloadedError as e:
+                await asyncio.sleep(e.retry_after)
+
+    async def _finish(self, job, status, result=None, error=None):
+        job.update({
+            "status": status,
+            "result": result,
+            "error": error,
+            "finishedAt": int(time.time() * 1000)
+        })
+        self.counters[status] += 1
+        await self._save(job)
+        self._notify(job["id"])
+
+        if status != CANCELLED:
+            log_shipper.enqueue({
+                "timestamp": job["createdAt"],
+                "endpoint": f"/api/jobs/{job['type'].lower()}",
+                "input": job["input"],
+                "model": job["model"],
+                "output": result if status == SUCCEEDED else {"error": error},
+                "status": 200 if status == SUCCEEDED else 500,
+                "responseTimeMs": job["finishedAt"] - job["createdAt"]
+            })
+
+    def _notify(self, job_id):
+        waiter = self.waiters.pop(job_id, None)
+        if waiter is not None:
+            waiter.set()
+
+    async def _save(self, job):
+        if self.store is not None:
+            await asyncio.to_thread(self.store.save, dict(job))
+
+    async def _cancel_poll_loop(self):
+        """
+        Cancel the jobs of this worker that other workers were asked to cancel
+        """
+        while True:
+            await asyncio.sleep(self.cancel_poll_interval)
+            unfinished = {job_id for job_id, job in self.jobs.items() if job["status"] not in FINISHED_STATUSES}
+            if not unfinished:
+                continue
+            try:
+                for job_id in await asyncio.to_thread(self.store.take_cancel_requests, unfinished):
+                    logging.info(f"Cancelling job {job_id} on request of another worker")
+                    await self.cancel(job_id)
+            except Exception as e:
+                logging.warning(f"Failed to check job cancel requests: {str(e)}")
+
+    async def _cleanup_loop(self):
+        """
+        Drop finished jobs once their results have been kept long enough
+        """
+        while True:
+            await asyncio.sleep(min(60, max(1, self.result_ttl)))
+            cutoff = (time.time() - self.result_ttl) * 1000
+
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job["finishedAt"] is not None and job["finishedAt"] < cutoff
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+            if self.store is not None:
+                await asyncio.to_thread(self.store.delete_finished_before, cutoff)
+
+    def get_stats(self):
+        """
+        Get job statistics
+
+        Returns:
+            dict: Per-model queue depths and worker counts and job counters
+        """
+        running_by_model = {}
+        for job_id in self.running:
+            model_name = self.jobs[job_id]["model"]
+            running_by_model[model_name] = running_by_model.get(model_name, 0) + 1
+
+        return {
+            "storeEnabled": self.store is not None,
+            "models": {
+                model_name: {
+                    "queued": self.queued_counts.get(model_name, 0),
+                    "running": running_by_model.get(model_name, 0),
+                    "workers": len(self.workers.get(model_name, []))
+                }
+                for model_name in self.queues
+            },
+            "counters": self.counters
+        }
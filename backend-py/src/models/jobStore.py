@@ -0,0 +1,161 @@
+import sqlite3
+import logging
+import threading
+
+from src.jsonCodec import json_codec
+
+def encode_owner(owner):
+    return json_codec.dumps(owner).decode("utf-8") if owner is not None else None
+
+class JobStore:
+    """
+    SQLite store of async jobs so queued and finished jobs survive restarts.
+
+    Every method blocks, the JobQueue calls them through asyncio.to_thread.
+    """
+
+    def __init__(self, path):
+        """
+        Open the store, creating the table if needed
+
+        Args:
+            path (str): Path of the SQLite file
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT, finished_at REAL, job TEXT, owner TEXT)"
+        )
+        # Stores written before jobs had an owner
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(jobs)")]
+        if "owner" not in columns:
+            self.db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        # Cancel requests for jobs run by another worker of the node
+        self.db.execute("CREATE TABLE IF NOT EXISTS cancel_requests (id TEXT PRIMARY KEY)")
+        self.db.commit()
+        logging.info(f"Job store at {path}")
+
+    def save(self, job):
+        """
+        Insert or update a job
+
+        Args:
+            job (dict): The job record
+        """
+        with self.lock:
+            try:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO jobs (id, status, finished_at, job, owner) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        job["id"], job["status"], job.get("finishedAt"),
+                        json_codec.dumps(job).decode("utf-8"), encode_owner(job.get("owner"))
+                    )
+                )
+                self.db.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Failed to store job {job['id']}: {str(e)}")
+
+    def get(self, job_id):
+        """
+        Load one job
+
+        Args:
+            job_id (str): Id of the job
+
+        Returns:
+            dict: The job record, None if it is not stored
+        """
+        with self.lock:
+            row = self.db.execute("SELECT job FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json_codec.loads(row[0]) if row else None
+
+    def load_unfinished(self):
+        """
+        Load the jobs that were queued or running when the service stopped
+
+        Returns:
+            list: Job records
+        """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT job FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+        return [json_codec.loads(row[0]) for row in rows]
+
+    def claim(self, job, owner):
+        """
+        Take over an unfinished job from its previous owner
+
+        Only succeeds if the job still has the owner it was loaded with, so two
+        workers restoring the jobs of the same dead worker do not both run one.
+
+        Args:
+            job (dict): The job record as loaded, with the new status and owner
+            owner: The owner the job was loaded with
+
+        Returns:
+            bool: Whether this worker now owns the job
+        """
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET status = ?, job = ?, owner = ? WHERE id = ? AND owner IS ?",
+                (
+                    job["status"], json_codec.dumps(job).decode("utf-8"), encode_owner(job.get("owner")),
+                    job["id"], encode_owner(owner)
+                )
+            )
+            self.db.commit()
+        return cursor.rowcount == 1
+
+    def request_cancel(self, job_id):
+        """
+        Ask the worker running a job to cancel it
+
+        Args:
+            job_id (str): Id of the job
+        """
+        with self.lock:
+            self.db.execute("INSERT OR IGNORE INTO cancel_requests (id) VALUES (?)", (job_id,))
+            self.db.commit()
+
+    def take_cancel_requests(self, job_ids):
+        """
+        Remove and return the cancel requests for some jobs
+
+        Args:
+            job_ids (set): Ids of the jobs of the calling worker
+
+        Returns:
+            list: Ids of the jobs to cancel
+        """
+        with self.lock:
+            # The table only holds requests not yet picked up, so read all of it
+            # rather than binding one variable per job of the worker
+            requested = [row[0] for row in self.db.execute("SELECT id FROM cancel_requests").fetchall()]
+            taken = [job_id for job_id in requested if job_id in job_ids]
+            if taken:
+                self.db.executemany("DELETE FROM cancel_requests WHERE id = ?", [(job_id,) for job_id in taken])
+                self.db.commit()
+        return taken
+
+    def delete_finished_before(self, timestamp):
+        """
+        Delete finished jobs older than a point in time
+
+        Args:
+            timestamp (float): Epoch milliseconds
+        """
+        with self.lock:
+            self.db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (timestamp,))
+            self.db.execute("DELETE FROM cancel_requests WHERE id NOT IN (SELECT id FROM jobs WHERE finished_at IS NULL)")
+            self.db.commit()
+
+    def close(self):
+        """
+        Close the store
+        """
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,247 @@
+import os
+import sys
+import mmap
+import json
+import time
+import struct
+import logging
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Tensor dtypes of the safetensors format and their NumPy equivalents
+SAFETENSORS_DTYPES = {
+    "F64": "<f8",
+    "F32": "<f4",
+    "F16": "<f2",
+    "I64": "<i8",
+    "I32": "<i4",
+    "I16": "<i2",
+    "I8": "i1",
+    "U64": "<u8",
+    "U32": "<u4",
+    "U16": "<u2",
+    "U8": "u1",
+    "BOOL": "?"
+}
+
+def _require_numpy(path):
+    if numpy is None:
+        raise ImportError(f"NumPy is required to load {path} as arrays, install numpy or use load_artifact_buffer")
+
+def _read_npy(path):
+    _require_numpy(path)
+    return numpy.load(path, mmap_mode="r", allow_pickle=False)
+
+def _read_buffer(path):
+    with open(path, "rb") as artifact_file:
+        # Mapping an empty file fails, and there is nothing to share anyway
+        if os.fstat(artifact_file.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(artifact_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+def _read_safetensors(path):
+    """
+    Map a safetensors file: an 8 byte little-endian header size, a JSON header
+    describing each tensor and one flat buffer with the data of all tensors
+    """
+    _require_numpy(path)
+    buffer = _read_buffer(path)
+    if len(buffer) < 8:
+        raise ValueError(f"Not a safetensors file: {path}")
+
+    (header_size,) = struct.unpack("<Q", buffer[:8])
+    if 8 + header_size > len(buffer):
+        raise ValueError(f"Truncated safetensors header: {path}")
+    header = json.loads(bytes(buffer[8:8 + header_size]))
+    data_start = 8 + header_size
+
+    tensors = {}
+    for name, spec in header.items():
+        if name == "__metadata__":
+            continue
+        if spec["dtype"] not in SAFETENSORS_DTYPES:
+            raise ValueError(f"Unsupported dtype {spec['dtype']} of tensor {name} in {path}")
+
+        begin, end = spec["data_offsets"]
+        dtype = numpy.dtype(SAFETENSORS_DTYPES[spec["dtype"]])
+        shape = tuple(spec["shape"])
+        count = end - begin
+        if count % dtype.itemsize or data_start + end > len(buffer):
+            raise ValueError(f"Invalid data offsets of tensor {name} in {path}")
+
+        # A view on the mapping, read-only because the mapping is
+        tensors[name] = numpy.frombuffer(
+            buffer, dtype=dtype, count=count // dtype.itemsize, offset=data_start + begin
+        ).reshape(shape)
+    return tensors
+
+LOADERS = {
+    "npy": _read_npy,
+    "safetensors": _read_safetensors,
+    "buffer": _read_buffer
+}
+
+class ArtifactStore:
+    """
+    Memory-maps model artifacts read-only and shares them.
+
+    Each file is mapped once per process however many model instances use it,
+    and the data stays in the page cache instead of being copied onto the heap,
+    so worker processes share the same physical pages. Files mapped before the
+    multi-worker server forks are even shared at the same addresses. Entries are
+    kept while any model instance that loaded them is alive.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def load(self, path, kind, owner):
+        """
+        Map an artifact, reusing the mapping when the file is unchanged
+
+        Args:
+            path (str): Path of the file
+            kind (str): npy, safetensors or buffer
+            owner (BaseModel): The model instance using the artifact
+
+        Returns:
+            The read-only array, dict of arrays or memoryview
+        """
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        key = (path, kind)
+
+        entry = self.entries.get(key)
+        if entry is None or entry["version"] != (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            start_time = time.perf_counter()
+            value = LOADERS[kind](path)
+            entry = self.entries[key] = {
+                "path": path,
+                "kind": kind,
+                "value": value,
+                "version": (stat.st_ino, stat.st_size, stat.st_mtime_ns),
+                "size": stat.st_size,
+                "loadMs": round((time.perf_counter() - start_time) * 1000, 2),
+                "owners": weakref.WeakSet()
+            }
+            logging.info(f"Mapped {kind} artifact {path} ({stat.st_size} bytes) in {entry['loadMs']}ms")
+
+        entry["owners"].add(owner)
+        return entry["value"]
+
+    def release(self, owner):
+        """
+        Forget the artifacts of a model instance, unmapping the ones no other instance uses
+
+        Args:
+            owner (BaseModel): The model instance
+        """
+        for key, entry in list(self.entries.items()):
+            entry["owners"].discard(owner)
+            if len(entry["owners"]) == 0:
+                # Unmapped once the last array viewing it is gone
+                del self.entries[key]
+
+    def get_resident_memory(self):
+        """
+        Get how much of each mapped file is resident in memory
+
+        Reads /proc/self/smaps, so it only works on Linux.
+
+        Returns:
+            dict: Path to {"rssBytes", "pssBytes"}, or None if not available
+        """
+        paths = {entry["path"] for entry in self.entries.values()}
+        if not sys.platform.startswith("linux"):
+            return None
+
+        resident = {}
+        current = None
+        try:
+            with open("/proc/self/smaps", "r") as smaps:
+                for line in smaps:
+                    fields = line.split()
+                    if not fields:
+                        continue
+                    if not fields[0].endswith(":"):
+                        # Header of a mapping: address, perms, offset, dev, inode and the path if any
+                        current = None
+                        if len(fields) >= 6:
+                            mapped_path = " ".join(fields[5:])
+                            if mapped_path in paths:
+                                current = resident.setdefault(mapped_path, {"rssBytes": 0, "pssBytes": 0})
+                    elif current is not None and fields[0] in ("Rss:", "Pss:"):
+                        current["rssBytes" if fields[0] == "Rss:" else "pssBytes"] += int(fields[1]) * 1024
+        except OSError:
+            return None
+        return resident
+
+    def get_mapped_bytes(self, model_name):
+        """
+        Get the size of the files mapped by the instances of a model, without reading smaps
+
+        Args:
+            model_name (str): Name of the model, lowercased
+
+        Returns:
+            int: Bytes
+        """
+        return sum(
+            entry["size"] for entry in list(self.entries.values())
+            if any(owner.get_model_name().lower() == model_name for owner in list(entry["owners"]))
+        )
+
+    def get_stats(self):
+        """
+        Get mapped and resident sizes of the artifacts by model
+
+        Pss splits pages shared with other processes, such as the other
+        workers, between them, so it adds up to the real memory use of a node.
+
+        Returns:
+            dict: Per-model file counts and sizes in bytes
+        """
+        # Drop the artifacts of instances that were garbage collected without being released
+        for key, entry in list(self.entries.items()):
+            if len(entry["owners"]) == 0:
+                del self.entries[key]
+
+        resident = self.get_resident_memory()
+        models = {}
+        for entry in self.entries.values():
+            usage = resident.get(entry["path"], {"rssBytes": 0, "pssBytes": 0}) if resident is not None else None
+            for owner in {instance.get_model_name().lower() for instance in entry["owners"]}:
+                stats = models.setdefault(owner, {
+                    "files": 0,
+                    "mappedBytes": 0,
+                    "rssBytes": 0 if resident is not None else None,
+                    "pssBytes": 0 if resident is not None else None,
+                    "loadMs": 0
+                })
+                stats["files"] += 1
+                stats["mappedBytes"] += entry["size"]
+                stats["loadMs"] = round(stats["loadMs"] + entry["loadMs"], 2)
+                if usage is not None:
+                    stats["rssBytes"] += usage["rssBytes"]
+                    stats["pssBytes"] += usage["pssBytes"]
+        return models
+
+def read_process_rss():
+    """
+    Get the resident memory of this process
+
+    Returns:
+        int: Bytes, or None if not available
+    """
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Create a singleton instance
+artifact_store = ArtifactStore()
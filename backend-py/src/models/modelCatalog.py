@@ -0,0 +1,136 @@
+import hashlib
+
+from src.jsonCodec import json_codec
+
+class ModelCatalog:
+    """
+    Index of the available models.
+
+    Looks models up by name and lists them by type without scanning, and keeps
+    the encoded /api/models listings so polling clients get the same bytes
+    until the model set changes. The version is a hash of the names and types,
+    so it changes with every change of the model set and is the same in every
+    worker and after restarts, which makes it usable as an ETag.
+    """
+
+    def __init__(self, models=None):
+        """
+        Args:
+            models (list): Initial {"name", "type"} entries
+        """
+        self.models = {}
+        self.by_type = {}
+        self.version = None
+        self.listings = {}
+        self.replace(models or [])
+
+    def _changed(self):
+        """
+        Rebuild the type index and the version, and drop the encoded listings
+        """
+        self.by_type = {}
+        for model in self.models.values():
+            self.by_type.setdefault(model["type"], []).append(model["name"])
+
+        digest = hashlib.sha256()
+        for name, model_type in sorted((model["name"], str(model["type"])) for model in self.models.values()):
+            digest.update(f"{name}\0{model_type}\n".encode("utf-8"))
+        self.version = digest.hexdigest()[:16]
+        self.listings = {}
+
+    def replace(self, models):
+        """
+        Replace all entries
+
+        Args:
+            models (list): {"name", "type"} entries
+        """
+        self.models = {model["name"]: model for model in models}
+        self._changed()
+
+    def add(self, model):
+        """
+        Add an entry or replace the entry of the same name
+
+        Args:
+            model (dict): {"name", "type"} entry
+        """
+        self.models.pop(model["name"], None)
+        self.models[model["name"]] = model
+        self._changed()
+
+    def remove(self, model_name):
+        """
+        Remove an entry if it exists
+
+        Args:
+            model_name (str): Name of the model
+        """
+        if self.models.pop(model_name, None) is not None:
+            self._changed()
+
+    def get(self, model_name):
+        """
+        Get the entry of a model
+
+        Args:
+            model_name (str): Normalized name of the model
+
+        Returns:
+            dict: The {"name", "type"} entry, None if the model is not available
+        """
+        return self.models.get(model_name)
+
+    def __contains__(self, model_name):
+        return model_name in self.models
+
+    def __len__(self):
+        return len(self.models)
+
+    def get_models(self):
+        """
+        Get all entries
+
+        Returns:
+            list: {"name", "type"} entries
+        """
+        return list(self.models.values())
+
+    def get_names(self):
+        """
+        Get the names of all models
+
+        Returns:
+            list: Model names
+        """
+        return list(self.models)
+
+    def get_names_by_type(self, model_type):
+        """
+        Get the names of the models of a type
+
+        Args:
+            model_type (str): Type of the models
+
+        Returns:
+            list: Model names
+        """
+        return list(self.by_type.get(model_type, []))
+
+    def get_listing(self, model_type=None):
+        """
+        Get the encoded listing of the models, optionally of one type
+
+        Args:
+            model_type (str): Type of the models, None for all models
+
+        Returns:
+            tuple: (JSON body as bytes, ETag)
+        """
+        # Only types that exist are kept, so arbitrary path values cannot grow the cache
+        key = model_type if model_type is None or model_type in self.by_type else ""
+        listing = self.listings.get(key)
+        if listing is None:
+            names = self.get_names() if model_type is None else self.get_names_by_type(model_type)
+            listing = self.listings[key] = (json_codec.dumps({"availableModels": names}), f'"{self.version}"')
+        return listing
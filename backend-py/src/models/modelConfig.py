@@ -0,0 +1,50 @@
+import os
+import re
+import logging
+
+def parse_bool(value):
+    """
+    Parse a boolean environment value such as "true", "1" or "no"
+
+    Args:
+        value (str): The raw value
+
+    Returns:
+        bool: The parsed value
+    """
+    normalized = value.strip().lower()
+    if normalized in ("1", "true", "yes", "on"):
+        return True
+    if normalized in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"Not a boolean: {value}")
+
+def get_model_setting(model_class, model_name, key, cast=int):
+    """
+    Read a per-model setting.
+
+    The default comes from the class attribute `key` on the model class and can be
+    overridden with an environment variable named `<MODEL_NAME>_<KEY>`, e.g.
+    `ECHO_BATCH_MAX_SIZE=8` or `PY_SUMMARY_BATCH_MAX_WAIT_MS=10`.
+
+    Args:
+        model_class (type): The model class holding the default
+        model_name (str): Name of the model
+        key (str): Setting name, also the class attribute name
+        cast (callable): Converter applied to the environment value
+
+    Returns:
+        The setting value
+    """
+    default = getattr(model_class, key, None)
+    env_key = f"{re.sub(r'[^A-Z0-9]', '_', model_name.upper())}_{key}"
+    value = os.environ.get(env_key)
+
+    if value is None:
+        return default
+
+    try:
+        return cast(value)
+    except ValueError:
+        logging.warning(f"Invalid value for {env_key}: {value}. Using default {default}")
+        return default
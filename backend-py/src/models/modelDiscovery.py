@@ -0,0 +1,100 @@
+import os
+import ast
+import logging
+
+from src.models.baseModel import ModelType
+
+def get_module_source_path(package_path, module_name, is_pkg):
+    """
+    Get the source file of a module in the implementations package
+
+    Args:
+        package_path (str): Directory of the implementations package
+        module_name (str): Name of the module
+        is_pkg (bool): Whether the module is a package directory
+
+    Returns:
+        str: Path of the source file, or None if there is none
+    """
+    if is_pkg:
+        path = os.path.join(package_path, module_name, "__init__.py")
+    else:
+        path = os.path.join(package_path, f"{module_name}.py")
+
+    return path if os.path.isfile(path) else None
+
+def _literal_model_type(node):
+    """
+    Read a MODEL_TYPE value written as ModelType.X or as a string
+
+    Returns:
+        str: The model type value, or None if it is not a literal
+    """
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "ModelType":
+        value = node.attr
+    elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+        value = node.value.upper()
+    else:
+        return None
+
+    return value if value in [t.value for t in ModelType] else None
+
+def scan_module_metadata(source_path):
+    """
+    Read model metadata from a module's source without importing it
+
+    A class is treated as a model when it declares MODEL_NAME and MODEL_TYPE as
+    literals in its class body, e.g. MODEL_NAME = "echo" and
+    MODEL_TYPE = ModelType.CHAT.
+
+    Args:
+        source_path (str): Path of the module source file
+
+    Returns:
+        list: Dicts with class, name and type of every model class found
+    """
+    with open(source_path, "r", encoding="utf-8") as source_file:
+        tree = ast.parse(source_file.read(), filename=source_path)
+
+    models = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+
+        model_name = None
+        model_type = None
+        for statement in node.body:
+            if not isinstance(statement, ast.Assign) or len(statement.targets) != 1:
+                continue
+            target = statement.targets[0]
+            if not isinstance(target, ast.Name):
+                continue
+
+            if target.id == "MODEL_NAME" and isinstance(statement.value, ast.Constant) and isinstance(statement.value.value, str):
+                model_name = statement.value.value.lower()
+            elif target.id == "MODEL_TYPE":
+                model_type = _literal_model_type(statement.value)
+                if model_type is None:
+                    logging.warning(f"Unsupported MODEL_TYPE in {node.name} of {source_path}")
+
+        if model_name and model_type:
+            models.append({
+                "class": node.name,
+                "name": model_name,
+                "type": model_type
+            })
+
+    return models
+
+def get_source_version(source_path):
+    """
+    Get a value that changes whenever a source file is modified
+
+    Args:
+        source_path (str): Path of the source file
+
+    Returns:
+        tuple: Modification time in nanoseconds and size of the file
+    """
+    stat = os.stat(source_path)
+    return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,214 @@
+import os
+import sys
+import asyncio
+import logging
+import importlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from src.models.prefixCache import prefix_cache
+
+# Warm model instances of the current worker, keyed by (module, class name),
+# and the source version each module was loaded at. Thread-local so that every
+# thread worker keeps its own instance; in a process worker there is a single
+# thread so this is effectively per process.
+_worker_state = threading.local()
+
+# Process workers import model modules themselves and must reload them when the
+# server reloads a module; thread workers share the server's modules.
+_in_process_worker = False
+
+def _init_worker(root_path):
+    """
+    Initializer for process workers
+
+    Args:
+        root_path (str): Path of the backend-py root so `src` can be imported
+    """
+    global _in_process_worker
+    _in_process_worker = True
+    if root_path not in sys.path:
+        sys.path.append(root_path)
+
+def _get_worker_model(module_name, class_name, version=None):
+    """
+    Get the warm model instance of the current worker, creating it on first use
+
+    When the module version differs from the one the instances were created
+    at, the module was hot reloaded: instances of its classes are dropped and,
+    in a process worker, the module is reloaded too.
+
+    Args:
+        module_name (str): Module that defines the model class
+        class_name (str): Name of the model class
+        version: Source version of the module, None if it is not tracked
+
+    Returns:
+        BaseModel: The model instance
+    """
+    models = getattr(_worker_state, "models", None)
+    if models is None:
+        models = _worker_state.models = {}
+        _worker_state.versions = {}
+
+    versions = _worker_state.versions
+    if module_name in versions and versions[module_name] != version:
+        for key in [key for key in models if key[0] == module_name]:
+            model = models.pop(key)
+            # A process worker has its own prefix cache, the server cannot clear it
+            prefix_cache.remove_model(model.model_name)
+            try:
+                model.unload()
+            except Exception as e:
+                logging.error(f"Worker {os.getpid()} failed to unload model {key[1]}: {str(e)}")
+        if _in_process_worker and module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+            logging.info(f"Worker {os.getpid()} reloaded module {module_name}")
+    versions[module_name] = version
+
+    key = (module_name, class_name)
+    if key not in models:
+        module = importlib.import_module(module_name)
+        models[key] = getattr(module, class_name)()
+        logging.info(f"Worker {os.getpid()} loaded model {class_name}")
+
+    return models[key]
+
+def _run_in_worker(module_name, class_name, version, method_name, payload):
+    """
+    Call a synchronous model method inside a worker
+
+    Args:
+        module_name (str): Module that defines the model class
+        class_name (str): Name of the model class
+        version: Source version of the module, None if it is not tracked
+        method_name (str): Model method to call, e.g. process_sync
+        payload: Argument for the method
+
+    Returns:
+        The method's return value
+    """
+    model = _get_worker_model(module_name, class_name, version)
+    return getattr(model, method_name)(payload)
+
+class ModelExecutor:
+    """
+    Runs synchronous, CPU-bound model methods in a managed worker pool.
+
+    The pool type is chosen with MODEL_EXECUTOR ("process" or "thread") and its
+    size with MODEL_EXECUTOR_WORKERS. Each worker keeps its own warm model
+    instances, so models are imported and loaded once per worker instead of once
+    per call.
+
+    Every server worker has its own pool. With BACKEND_WORKERS server workers
+    the default size is the number of cores divided by BACKEND_WORKERS, so a
+    node runs about one executor worker per core in total. Executor processes
+    load their own model instances and do not share the memory of the models
+    loaded before forking. A MODEL_EXECUTOR_WORKERS value applies to each
+    server worker.
+
+    Each executor process also has its own prefix cache, so models running
+    there only reuse states cached by the same process, and those states are
+    missing from the cache statistics and metrics of the server. They are
+    dropped when the model's module is reloaded, not when the server unloads
+    the model. Chat models relying on the prefix cache are best run in the
+    server process or with MODEL_EXECUTOR=thread.
+    """
+
+    def __init__(self):
+        """
+        Initialize the executor from environment variables. Workers start on first use.
+        """
+        self.kind = os.environ.get("MODEL_EXECUTOR", "process").lower()
+        if self.kind not in ("process", "thread"):
+            logging.warning(f"Unknown MODEL_EXECUTOR {self.kind}, falling back to process")
+            self.kind = "process"
+
+        server_workers = max(1, int(os.environ.get("BACKEND_WORKERS", 1)))
+        default_workers = max(1, (os.cpu_count() or 1) // server_workers)
+        self.max_workers = int(os.environ.get("MODEL_EXECUTOR_WORKERS", default_workers))
+        self.executor = None
+        self.submitted = 0
+        self.completed = 0
+
+    def get_executor(self):
+        """
+        Get the underlying executor, creating it on first use
+
+        Returns:
+            Executor: The process or thread pool
+        """
+        if self.executor is None:
+            if self.kind == "thread":
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="model-worker"
+                )
+            else:
+                root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(root_path,)
+                )
+            logging.info(f"Started {self.kind} executor with {self.max_workers} workers")
+
+        return self.executor
+
+    async def run(self, model, method_name, payload, version=None):
+        """
+        Run a synchronous model method in the pool
+
+        Args:
+            model (BaseModel): The model whose class should handle the call
+            method_name (str): Model method to call, e.g. process_sync
+            payload: Argument for the method
+            version: Source version of the model's module, workers recreate
+                their instances when it changes after a hot reload
+
+        Returns:
+            The method's return value
+        """
+        model_class = type(model)
+        loop = asyncio.get_running_loop()
+
+        self.submitted += 1
+        try:
+            return await loop.run_in_executor(
+                self.get_executor(),
+                _run_in_worker,
+                model_class.__module__,
+                model_class.__qualname__,
+                version,
+                method_name,
+                payload
+            )
+        finally:
+            self.completed += 1
+
+    async def shutdown(self):
+        """
+        Shut the pool down, cancelling calls that have not started yet
+        """
+        if self.executor is None:
+            return
+
+        executor = self.executor
+        self.executor = None
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+        logging.info(f"Stopped {self.kind} executor")
+
+    def get_stats(self):
+        """
+        Get executor statistics
+
+        Returns:
+            dict: Pool type, size and call counts
+        """
+        return {
+            "kind": self.kind,
+            "maxWorkers": self.max_workers,
+            "started": self.executor is not None,
+            "inFlight": self.submitted - self.completed,
+            "completed": self.completed
+        }
@@ -1,16 +1,51 @@
 import os
 import importlib
+import importlib.util
 import inspect
 import pkgutil
 import sys
+import time
+import asyncio
 import logging
 from typing import Dict, List, Optional, Any, Tuple
 
+from src.metrics import (
+    registry, MODEL_REQUESTS, MODEL_IN_FLIGHT, MODEL_QUEUED, MODEL_ARTIFACT_MAPPED_BYTES, MODEL_ARTIFACT_PSS_BYTES,
+    MODEL_LIFECYCLE_EVENTS, PREFIX_CACHE_BYTES
+)
 from src.models.baseModel import BaseModel
+from src.models.modelArtifacts import artifact_store, read_process_rss
+from src.models.errors import ModelOverloadedError
+from src.models.batchScheduler import BatchScheduler
+from src.models.modelDiscovery import get_module_source_path, get_source_version, scan_module_metadata
+from src.models.modelCatalog import ModelCatalog
+from src.models.modelConfig import get_model_setting, parse_bool
+from src.models.modelExecutor import ModelExecutor
+from src.models.modelPool import ModelPool
+from src.models.prefixCache import prefix_cache
+from src.models.responseCache import ResponseCache
+from src.profiler import profiler
+from src.requestContext import get_request_context
+
+def get_deadline_timeout():
+    """
+    Get the time left until the deadline of the current request
+    
+    Returns:
+        float: Seconds, None outside of a request or without a deadline
+    """
+    context = get_request_context()
+    return context.remaining() if context is not None else None
 
 class ModelManager:
     """
     Discovers and manages model implementations.
+    
+    Instances are created on first use or at startup and can be unloaded again:
+    models idle for MODEL_IDLE_TIMEOUT_SECONDS and, over MODEL_MEMORY_BUDGET_MB,
+    the least recently used models are evicted. With MODEL_HOT_RELOAD set, changed
+    and new implementation modules are picked up without a restart. An instance
+    is only dropped once the calls already running in it have finished.
     """
     
     def __init__(self):
@@ -19,8 +54,35 @@ class ModelManager:
         """
         self.model_instances: Dict[str, BaseModel] = {}
         self.model_classes: Dict[str, type] = {}
-        self.available_models: List[Dict[str, str]] = []
+        self.model_specs: Dict[str, Dict[str, str]] = {}
+        self.startup_timings: Dict[str, Dict[str, float]] = {}
+        self.preload_timings: Dict[str, Dict[str, Any]] = {}
+        self.ready = False
+        self.catalog = ModelCatalog()
         self.discovered_models: List[Dict[str, str]] = []
+        self.batch_schedulers: Dict[str, Optional[BatchScheduler]] = {}
+        self.model_pools: Dict[str, ModelPool] = {}
+        self.stream_stats: Dict[str, Dict[str, float]] = {}
+        self.executor = ModelExecutor()
+        self.response_cache = ResponseCache()
+        registry.add_collector(self.collect_metrics)
+        
+        # Eviction and hot reload
+        self.module_versions: Dict[str, Tuple[int, int]] = {}
+        self.last_used: Dict[str, float] = {}
+        self.instance_memory: Dict[str, int] = {}
+        self.model_set_listeners: List[Any] = []
+        self.memory_budget = int(float(os.environ.get("MODEL_MEMORY_BUDGET_MB", 0)) * 1024 * 1024)
+        self.idle_timeout = float(os.environ.get("MODEL_IDLE_TIMEOUT_SECONDS", 0))
+        self.eviction_interval = int(os.environ.get("MODEL_EVICTION_INTERVAL_MS", 5000)) / 1000
+        self.hot_reload = parse_bool(os.environ.get("MODEL_HOT_RELOAD", "false"))
+        self.reload_interval = int(os.environ.get("MODEL_RELOAD_INTERVAL_MS", 2000)) / 1000
+        self.drain_timeout = float(os.environ.get("MODEL_DRAIN_TIMEOUT_SECONDS", 30))
+        self.lifecycle_lock = asyncio.Lock()
+        self.lifecycle_tasks: List[asyncio.Task] = []
+        self.budget_check = None
+        self.evictions = 0
+        self.reloads = 0
         
         # Discover and load all model implementations
         self.discover_models()
@@ -28,11 +90,19 @@ class ModelManager:
         # Apply environment variable filtering after discovering models
         self.filter_models_by_environment()
         
-        logging.info(f"ModelManager initialized with available models: {', '.join([model['name'] for model in self.available_models])}")
+        # Import only the models that are going to be served
+        self.load_model_classes()
+        
+        logging.info(f"ModelManager initialized with available models: {', '.join(self.get_available_models())}")
     
     def discover_models(self):
         """
         Discover all models in the implementations directory
+        
+        Model metadata is read from the MODEL_NAME and MODEL_TYPE class attributes in
+        the module source, so modules are neither imported nor instantiated here.
+        Modules without such metadata fall back to importing them and creating a
+        temporary instance.
         """
         discovered_models = []
         
@@ -47,39 +117,128 @@ class ModelManager:
                 if module_name == '__pycache__':
                     continue
                 
+                start_time = time.perf_counter()
                 try:
-                    # Import the module
-                    module = importlib.import_module(f"src.models.implementations.{module_name}")
-                    
-                    # Look for classes in the module that inherit from BaseModel
-                    for name, obj in inspect.getmembers(module):
-                        if (inspect.isclass(obj) and 
-                            issubclass(obj, BaseModel) and 
-                            obj != BaseModel):
-                            
-                            try:
-                                # Create a temporary instance to get model info
-                                temp_instance = obj()
-                                model_name = temp_instance.get_model_name().lower()
-                                model_type = temp_instance.get_model_type().value
-                                
-                                # Store the model class
-                                self.model_classes[model_name] = obj
-                                discovered_models.append({
-                                    "type": model_type,
-                                    "name": model_name,
-                                })
-                                
-                                logging.info(f"Discovered model: {model_name} from {module_name}")
-                            except Exception as e:
-                                logging.warning(f"Failed to initialize model class {name}: {str(e)}")
+                    source_path = get_module_source_path(implementations_path, module_name, is_pkg)
+                    discovered_models.extend(self.discover_module(module_name, source_path))
                 except Exception as e:
                     logging.error(f"Error loading model from {module_name}: {str(e)}")
+                
+                self.startup_timings[module_name] = {
+                    "discoverMs": round((time.perf_counter() - start_time) * 1000, 2)
+                }
         except Exception as e:
             logging.error(f"Error discovering models: {str(e)}")
         
         self.discovered_models = discovered_models
     
+    def discover_module(self, module_name, source_path):
+        """
+        Discover the models of one module in the implementations directory
+        
+        Args:
+            module_name (str): Name of the module in the implementations package
+            source_path (str): Source file of the module, None if there is none
+            
+        Returns:
+            list: Discovered models with their name and type
+        """
+        if source_path:
+            self.module_versions[module_name] = get_source_version(source_path)
+        
+        models = scan_module_metadata(source_path) if source_path else []
+        if not models:
+            return self.discover_models_by_instantiating(module_name)
+        
+        discovered_models = []
+        for model in models:
+            self.model_specs[model["name"]] = {
+                "module": module_name,
+                "class": model["class"]
+            }
+            discovered_models.append({
+                "type": model["type"],
+                "name": model["name"],
+            })
+            logging.info(f"Discovered model: {model['name']} from {module_name}")
+        return discovered_models
+    
+    def discover_models_by_instantiating(self, module_name):
+        """
+        Discover models of a module that does not declare metadata by importing it
+        and creating a temporary instance of every model class
+        
+        Args:
+            module_name (str): Name of the module in the implementations package
+            
+        Returns:
+            list: Discovered models with their name and type
+        """
+        discovered_models = []
+        
+        logging.warning(f"Module {module_name} does not declare MODEL_NAME and MODEL_TYPE, importing it to discover models")
+        
+        # Import the module
+        module = importlib.import_module(f"src.models.implementations.{module_name}")
+        
+        # Look for classes in the module that inherit from BaseModel
+        for name, obj in inspect.getmembers(module):
+            if (inspect.isclass(obj) and 
+                issubclass(obj, BaseModel) and 
+                obj != BaseModel):
+                
+                try:
+                    # Create a temporary instance to get model info
+                    temp_instance = obj()
+                    model_name = temp_instance.get_model_name().lower()
+                    model_type = temp_instance.get_model_type().value
+                    
+                    # Store the model class
+                    self.model_classes[model_name] = obj
+                    self.model_specs[model_name] = {"module": module_name, "class": name}
+                    discovered_models.append({
+                        "type": model_type,
+                        "name": model_name,
+                    })
+                    
+                    logging.info(f"Discovered model: {model_name} from {module_name}")
+                except Exception as e:
+                    logging.warning(f"Failed to initialize model class {name}: {str(e)}")
+        
+        return discovered_models
+    
+    def load_model_classes(self):
+        """
+        Import the modules of the available models
+        
+        Only modules of available models are imported. Models whose class cannot
+        be loaded are removed from the available models.
+        """
+        for model in self.catalog.get_models():
+            model_name = model["name"]
+            if model_name in self.model_classes:
+                continue
+            
+            spec = self.model_specs[model_name]
+            start_time = time.perf_counter()
+            try:
+                module = importlib.import_module(f"src.models.implementations.{spec['module']}")
+                model_class = getattr(module, spec["class"])
+                
+                if not (inspect.isclass(model_class) and issubclass(model_class, BaseModel)):
+                    raise TypeError(f"{spec['class']} does not extend BaseModel")
+                
+                self.model_classes[model_name] = model_class
+            except Exception as e:
+                logging.error(f"Error loading model {model_name} from {spec['module']}: {str(e)}")
+                self.catalog.remove(model_name)
+            
+            timings = self.startup_timings.setdefault(spec["module"], {})
+            timings["importMs"] = round(timings.get("importMs", 0) + (time.perf_counter() - start_time) * 1000, 2)
+        
+        for module_name, timings in self.startup_timings.items():
+            logging.info(f"Startup time for {module_name}: discover {timings.get('discoverMs', 0)}ms, import {timings.get('importMs', 0)}ms")
+    
     def filter_models_by_environment(self):
         """
         Filter available models based on AVAILABLE_MODELS environment variable
@@ -88,25 +247,40 @@ class ModelManager:
         
         if not whitelist:
             # No environment restriction, use all discovered models
-            self.available_models = self.discovered_models.copy()
+            self.catalog.replace(self.discovered_models)
             logging.info("No AVAILABLE_MODELS environment variable set, using all discovered models")
             return
         
         allowed_models = [model.strip().lower() for model in whitelist.split(",") if model.strip()]
         
         # Filter discovered models to only include those in the allowed list
-        self.available_models = [
+        self.catalog.replace([
             model for model in self.discovered_models
-            if model["name"] in allowed_models
-        ]
+            if self.is_model_allowed(model["name"])
+        ])
         
-        if not self.available_models:
+        if not len(self.catalog):
             logging.warning("No models matched between discovered models and AVAILABLE_MODELS environment variable")
             logging.warning(f"Discovered: {', '.join([model['name'] for model in self.discovered_models])}")
             logging.warning(f"Allowed: {', '.join(allowed_models)}")
         else:
             logging.info("Filtered models based on AVAILABLE_MODELS environment variable")
-            logging.info(f"Available models: {', '.join([model['name'] for model in self.available_models])}")
+            logging.info(f"Available models: {', '.join(self.get_available_models())}")
+    
+    def is_model_allowed(self, model_name):
+        """
+        Check a model name against the AVAILABLE_MODELS environment variable
+        
+        Args:
+            model_name (str): Name of the model
+            
+        Returns:
+            bool: True if the model may be served
+        """
+        whitelist = os.environ.get("AVAILABLE_MODELS")
+        if not whitelist:
+            return True
+        return model_name in [model.strip().lower() for model in whitelist.split(",") if model.strip()]
     
     def get_model_by_name(self, model_name):
         """
@@ -127,17 +301,20 @@ class ModelManager:
         
         normalized_name = model_name.lower()
         
-        if normalized_name not in [model["name"] for model in self.available_models]:
+        if normalized_name not in self.catalog:
             return {
                 "success": False,
-                "error": f"Invalid model: {model_name}. Available models: {', '.join([model['name'] for model in self.available_models])}",
+                "error": f"Invalid model: {model_name}. Available models: {', '.join(self.get_available_models())}",
                 "model": None
             }
         
+        self.last_used[normalized_name] = time.monotonic()
+        
         if normalized_name not in self.model_instances:
             try:
                 self.model_instances[normalized_name] = self.create_model_instance(normalized_name)
                 logging.info(f"Created new instance of model: {normalized_name}")
+                self.schedule_budget_check()
             except Exception as e:
                 logging.error(f"Error creating model instance for {normalized_name}: {str(e)}")
                 return {
@@ -152,6 +329,115 @@ class ModelManager:
             "model": self.model_instances[normalized_name]
         }
     
+    def get_preload_model_names(self):
+        """
+        Get the models to load at startup based on MODEL_PRELOAD
+        
+        MODEL_PRELOAD is "all" (default), "none" or a comma-separated list of model names.
+        
+        Returns:
+            list: Names of the models to preload
+        """
+        preload = os.environ.get("MODEL_PRELOAD", "all").strip().lower()
+        available_names = self.get_available_models()
+        
+        if preload == "all":
+            return available_names
+        if preload in ("", "none"):
+            return []
+        
+        requested = [name.strip() for name in preload.split(",") if name.strip()]
+        return [name for name in requested if name in available_names]
+    
+    async def preload_models(self):
+        """
+        Create and warm up the preloaded models in parallel, then mark the manager ready
+        
+        Models that fail to load or warm up are removed from the available models so
+        they are not advertised.
+        """
+        model_names = self.get_preload_model_names()
+        
+        if model_names:
+            logging.info(f"Preloading models: {', '.join(model_names)}")
+            start_time = time.perf_counter()
+            await asyncio.gather(*(self.preload_model(model_name) for model_name in model_names))
+            logging.info(f"Preloaded {len(model_names)} models in {round((time.perf_counter() - start_time) * 1000, 2)}ms")
+        
+        self.ready = True
+    
+    async def preload_model(self, model_name):
+        """
+        Create an instance of a model and run its warm-up inputs through it
+        
+        Args:
+            model_name (str): Name of the model
+        """
+        timings = self.preload_timings.setdefault(model_name, {})
+        
+        try:
+            start_time = time.perf_counter()
+            if model_name not in self.model_instances:
+                model = await asyncio.to_thread(self.create_model_instance, model_name)
+                self.model_instances.setdefault(model_name, model)
+            model = self.model_instances[model_name]
+            await self.get_model_pool(model).fill()
+            timings["loadMs"] = round((time.perf_counter() - start_time) * 1000, 2)
+            
+            start_time = time.perf_counter()
+            warmup_inputs = model.get_warmup_inputs()
+            for input_data in warmup_inputs:
+                # Skip the response cache so the model itself (and its workers) get warm
+                await self._process_uncached(model, input_data)
+            timings["warmupMs"] = round((time.perf_counter() - start_time) * 1000, 2)
+            timings["warmupInputs"] = len(warmup_inputs)
+            
+            logging.info(f"Preloaded model {model_name}: load {timings['loadMs']}ms, warm-up {timings['warmupMs']}ms")
+        except Exception as e:
+            timings["error"] = str(e)
+            logging.error(f"Failed to preload model {model_name}, it will not be available: {str(e)}")
+            self.model_instances.pop(model_name, None)
+            self.catalog.remove(model_name)
+    
+    def load_model_instances(self):
+        """
+        Create the instances of the preloaded models without warming them up
+        
+        Used by the multi-worker server before forking, so the workers share the
+        loaded models copy-on-write instead of each loading their own.
+        """
+        for model_name in self.get_preload_model_names():
+            if model_name in self.model_instances:
+                continue
+            
+            start_time = time.perf_counter()
+            try:
+                self.model_instances[model_name] = self.create_model_instance(model_name)
+                logging.info(f"Loaded model {model_name} in {round((time.perf_counter() - start_time) * 1000, 2)}ms")
+            except Exception as e:
+                logging.error(f"Failed to load model {model_name}, it will not be available: {str(e)}")
+                self.catalog.remove(model_name)
+    
+    def after_fork(self):
+        """
+        Reset state that must not be shared with the parent process after forking a worker
+        """
+        self.response_cache.after_fork()
+    
+    def add_model_class(self, model_class):
+        """
+        Make a model class available without discovering it from the implementations package
+        
+        Args:
+            model_class (type): BaseModel subclass declaring MODEL_NAME and MODEL_TYPE
+        """
+        model_name = model_class.MODEL_NAME.lower()
+        model_type = getattr(model_class.MODEL_TYPE, "value", model_class.MODEL_TYPE)
+        
+        self.model_classes[model_name] = model_class
+        self.model_specs[model_name] = {"module": model_class.__module__, "class": model_class.__name__}
+        self.catalog.add({"name": model_name, "type": model_type})
+    
     def get_available_models(self):
         """
         Get the list of available models
@@ -159,7 +445,7 @@ class ModelManager:
         Returns:
             list: Array of available model names
         """
-        return [model["name"] for model in self.available_models]
+        return self.catalog.get_names()
     
     def get_available_models_by_type(self, model_type):
         """
@@ -171,10 +457,7 @@ class ModelManager:
         Returns:
             list: Array of available model names of the specified type
         """
-        return [
-            model["name"] for model in self.available_models 
-            if model["type"] == model_type
-        ]
+        return self.catalog.get_names_by_type(model_type)
     
     def create_model_instance(self, model_name):
         """
@@ -191,7 +474,716 @@ class ModelManager:
         if not model_class:
             raise ValueError(f"Model class not found for: {model_name}")
         
-        return model_class()
+        rss_before = read_process_rss()
+        model = model_class()
+        rss_after = read_process_rss()
+        
+        # Approximate, other allocations may happen at the same time
+        if model_name not in self.instance_memory and rss_before is not None and rss_after is not None:
+            self.instance_memory[model_name] = max(0, rss_after - rss_before)
+        
+        return model
+    
+    def get_current_instance(self, model):
+        """
+        Get the instance that currently serves a model
+        
+        Callers may still hold an instance that was evicted or replaced by a
+        reloaded version since they looked it up. Their calls go to the current
+        instance, which is created again if the model was evicted.
+        
+        Args:
+            model (BaseModel): An instance of the model
+            
+        Returns:
+            BaseModel: The current instance
+        """
+        model_name = model.get_model_name().lower()
+        current = self.model_instances.get(model_name)
+        
+        if current is model:
+            return model
+        if current is not None:
+            return current
+        
+        result = self.get_model_by_name(model_name)
+        if not result["success"]:
+            raise ValueError(result["error"])
+        return result["model"]
+
+    def get_batch_scheduler(self, model):
+        """
+        Get the batch scheduler for a model, creating it on first use
+        
+        Args:
+            model (BaseModel): The model instance
+            
+        Returns:
+            BatchScheduler: The scheduler, or None if the model does not use batching
+        """
+        model_name = model.get_model_name().lower()
+        
+        if model_name not in self.batch_schedulers:
+            model = self.get_current_instance(model)
+            model_class = type(model)
+            max_batch_size = get_model_setting(model_class, model_name, "BATCH_MAX_SIZE")
+            
+            if max_batch_size > 1:
+                self.batch_schedulers[model_name] = BatchScheduler(
+                    model,
+                    lambda inputs: self._run_limited(model, "process_batch_sync", "process_batch", inputs),
+                    max_batch_size=max_batch_size,
+                    max_wait_ms=get_model_setting(model_class, model_name, "BATCH_MAX_WAIT_MS", float),
+                    max_queue=get_model_setting(model_class, model_name, "BATCH_MAX_QUEUE")
+                )
+                logging.info(f"Batching enabled for model {model_name} with max batch size {max_batch_size}")
+            else:
+                self.batch_schedulers[model_name] = None
+        
+        return self.batch_schedulers[model_name]
+    
+    def get_model_pool(self, model):
+        """
+        Get the instance pool of a model, creating it on first use
+        
+        CPU-bound models are limited to the executor size unless MAX_CONCURRENCY says otherwise.
+        
+        Args:
+            model (BaseModel): An instance of the model, becomes the first instance of the pool
+            
+        Returns:
+            ModelPool: The pool
+        """
+        model_name = model.get_model_name().lower()
+        
+        if model_name not in self.model_pools:
+            model = self.get_current_instance(model)
+            model_class = type(model)
+            max_concurrency = get_model_setting(model_class, model_name, "MAX_CONCURRENCY")
+            
+            if max_concurrency <= 0 and model_class.is_cpu_bound():
+                max_concurrency = self.executor.max_workers
+            
+            self.model_pools[model_name] = ModelPool(
+                model_name,
+                model_class,
+                model,
+                min_size=get_model_setting(model_class, model_name, "POOL_MIN_SIZE"),
+                max_size=get_model_setting(model_class, model_name, "POOL_MAX_SIZE"),
+                max_concurrency=max_concurrency,
+                max_queue=get_model_setting(model_class, model_name, "MAX_QUEUE"),
+                queue_timeout_ms=get_model_setting(model_class, model_name, "QUEUE_TIMEOUT_MS", float)
+            )
+        
+        return self.model_pools[model_name]
+    
+    async def _run_limited(self, model, sync_method_name, async_method_name, payload):
+        """
+        Call into a model through its instance pool
+        
+        CPU-bound models are called through the executor using the synchronous method,
+        all other models are awaited directly on the event loop.
+        
+        Args:
+            model (BaseModel): An instance of the model
+            sync_method_name (str): Method to run in the executor for CPU-bound models
+            async_method_name (str): Coroutine method to await for other models
+            payload: Argument for the method
+            
+        Returns:
+            The model's output
+        """
+        async with self.get_model_pool(model).acquire(get_deadline_timeout()) as instance:
+            return await self._call_model(instance, sync_method_name, async_method_name, payload)
+    
+    async def _call_model(self, model, sync_method_name, async_method_name, payload):
+        """
+        Call into a model instance without any limit, see _run_limited
+        """
+        if type(model).is_cpu_bound():
+            # Executor workers recreate their instances when the module was reloaded
+            version = self.module_versions.get(type(model).__module__.rpartition(".")[2])
+            return await self.executor.run(model, sync_method_name, payload, version)
+        return await getattr(model, async_method_name)(payload)
+    
+    async def process(self, model, input_data):
+        """
+        Run an input through a model
+        
+        Models that opt in to caching are served from the response cache when possible.
+        
+        Args:
+            model (BaseModel): The model instance
+            input_data (dict): Input for the model
+            
+        Returns:
+            dict: Output from the model
+        """
+        model = self.get_current_instance(model)
+        model_class = type(model)
+        model_name = model.get_model_name().lower()
+        self.last_used[model_name] = time.monotonic()
+        
+        try:
+            if not get_model_setting(model_class, model_name, "CACHE_ENABLED", parse_bool):
+                result = await self._process_uncached(model, input_data)
+            else:
+                result = await self.response_cache.get_or_compute(
+                    model_name,
+                    get_model_setting(model_class, model_name, "MODEL_VERSION", str),
+                    get_model_setting(model_class, model_name, "CACHE_TTL_SECONDS", float),
+                    input_data,
+                    lambda: self._process_uncached(model, input_data)
+                )
+        except ModelOverloadedError:
+            MODEL_REQUESTS.labels(model_name, "rejected").inc()
+            raise
+        except Exception:
+            MODEL_REQUESTS.labels(model_name, "error").inc()
+            raise
+        finally:
+            if profiler.active:
+                profiler.record_request(model_name)
+        
+        MODEL_REQUESTS.labels(model_name, "ok").inc()
+        return result
+    
+    async def _process_uncached(self, model, input_data):
+        """
+        Run an input through a model, going through its batch scheduler if it has one
+        
+        Args:
+            model (BaseModel): The model instance
+            input_data (dict): Input for the model
+            
+        Returns:
+            dict: Output from the model
+        """
+        scheduler = self.get_batch_scheduler(model)
+        
+        if scheduler is None:
+            return await self._run_limited(model, "process_sync", "process", input_data)
+        
+        return await scheduler.submit(input_data)
+    
+    async def stream(self, model, input_data):
+        """
+        Stream output chunks from a model
+        
+        Models without their own stream implementation go through process,
+        so batching and the executor pool still apply to them.
+        
+        Args:
+            model (BaseModel): The model instance
+            input_data (dict): Input for the model
+            
+        Yields:
+            dict: Output chunks from the model
+        """
+        model = self.get_current_instance(model)
+        self.last_used[model.get_model_name().lower()] = time.monotonic()
+        
+        if type(model).stream is BaseModel.stream:
+            yield await self.process(model, input_data)
+            return
+        
+        try:
+            async with self.get_model_pool(model).acquire(get_deadline_timeout()) as instance:
+                async for chunk in instance.stream(input_data):
+                    yield chunk
+        finally:
+            if profiler.active:
+                profiler.record_request(model.get_model_name())
+    
+    def record_stream(self, model_name, time_to_first_chunk_ms, chunks, disconnected):
+        """
+        Record the outcome of a streamed response
+        
+        Args:
+            model_name (str): Name of the model
+            time_to_first_chunk_ms (float): Time until the first chunk, None if there was none
+            chunks (int): Number of chunks sent
+            disconnected (bool): Whether the client went away before the end
+        """
+        stats = self.stream_stats.setdefault(model_name.lower(), {
+            "streams": 0,
+            "chunks": 0,
+            "disconnected": 0,
+            "firstChunks": 0,
+            "totalTimeToFirstChunkMs": 0.0,
+            "maxTimeToFirstChunkMs": 0.0
+        })
+        
+        stats["streams"] += 1
+        stats["chunks"] += chunks
+        stats["disconnected"] += int(disconnected)
+        
+        if time_to_first_chunk_ms is not None:
+            stats["firstChunks"] += 1
+            stats["totalTimeToFirstChunkMs"] += time_to_first_chunk_ms
+            stats["maxTimeToFirstChunkMs"] = max(stats["maxTimeToFirstChunkMs"], time_to_first_chunk_ms)
+    
+    def add_model_set_listener(self, listener):
+        """
+        Register a callable to run whenever models are added, removed or change type
+        
+        Args:
+            listener (callable): Function without arguments
+        """
+        self.model_set_listeners.append(listener)
+    
+    def start(self):
+        """
+        Start the background eviction and hot reload tasks that are enabled
+        """
+        if self.lifecycle_tasks:
+            return
+        
+        if self.memory_budget > 0 or self.idle_timeout > 0:
+            self.lifecycle_tasks.append(asyncio.create_task(self._eviction_loop()))
+        if self.hot_reload:
+            self.lifecycle_tasks.append(asyncio.create_task(self._reload_loop()))
+    
+    def is_busy(self, model_name):
+        """
+        Whether a model has calls running or waiting
+        
+        Args:
+            model_name (str): Name of the model
+            
+        Returns:
+            bool: True if the model cannot be unloaded right now without draining
+        """
+        pool = self.model_pools.get(model_name)
+        scheduler = self.batch_schedulers.get(model_name)
+        return (pool is not None and not pool.is_idle()) or (scheduler is not None and not scheduler.is_idle())
+    
+    def get_model_footprint(self, model_name):
+        """
+        Get the memory counted against MODEL_MEMORY_BUDGET_MB for a loaded model
+        
+        Args:
+            model_name (str): Name of the model
+            
+        Returns:
+            int: Bytes, from MEMORY_MB if the model sets it, otherwise the memory
+            measured when its first instance was created plus its mapped artifacts
+        """
+        model = self.model_instances.get(model_name)
+        if model is None:
+            return 0
+        
+        pool = self.model_pools.get(model_name)
+        instances = len(pool.instances) if pool is not None else 1
+        memory_mb = get_model_setting(type(model), model_name, "MEMORY_MB", float)
+        
+        if memory_mb is not None:
+            return int(memory_mb * 1024 * 1024 * instances)
+        
+        return self.instance_memory.get(model_name, 0) * instances + artifact_store.get_mapped_bytes(model_name)
+    
+    def get_evictable_models(self):
+        """
+        Get the loaded models that may be evicted right now, least recently used first
+        
+        Returns:
+            list: Model names
+        """
+        candidates = [
+            model_name for model_name, model in self.model_instances.items()
+            if get_model_setting(type(model), model_name, "EVICTABLE", parse_bool) and not self.is_busy(model_name)
+        ]
+        return sorted(candidates, key=lambda model_name: self.last_used.get(model_name, 0))
+    
+    async def evict_idle_models(self):
+        """
+        Unload the models that were not used for MODEL_IDLE_TIMEOUT_SECONDS
+        """
+        if self.idle_timeout <= 0:
+            return
+        
+        now = time.monotonic()
+        for model_name in self.get_evictable_models():
+            if now - self.last_used.get(model_name, 0) >= self.idle_timeout:
+                logging.info(f"Evicting model {model_name}, idle for {round(now - self.last_used.get(model_name, 0))}s")
+                await self.unload_model(model_name, "idle")
+                self.evictions += 1
+    
+    async def enforce_memory_budget(self):
+        """
+        Unload least recently used models until the loaded models fit MODEL_MEMORY_BUDGET_MB
+        
+        The most recently used model is never evicted, so a single model larger
+        than the budget stays loaded.
+        """
+        if self.memory_budget <= 0:
+            return
+        
+        footprints = {model_name: self.get_model_footprint(model_name) for model_name in self.model_instances}
+        total = sum(footprints.values())
+        if total <= self.memory_budget:
+            return
+        
+        most_recent = max(footprints, key=lambda model_name: self.last_used.get(model_name, 0))
+        for model_name in self.get_evictable_models():
+            if total <= self.memory_budget:
+                break
+            if model_name == most_recent:
+                continue
+            
+            logging.info(f"Evicting model {model_name} ({footprints[model_name]} bytes), {total} bytes loaded with a budget of {self.memory_budget}")
+            total -= footprints[model_name]
+            await self.unload_model(model_name, "memory")
+            self.evictions += 1
+        
+        if total > self.memory_budget:
+            logging.warning(f"Loaded models use {total} bytes, over the budget of {self.memory_budget}, but none can be evicted now")
+    
+    def schedule_budget_check(self):
+        """
+        Check the memory budget soon, e.g. after an instance was created
+        """
+        if self.memory_budget <= 0 or (self.budget_check is not None and not self.budget_check.done()):
+            return
+        
+        try:
+            self.budget_check = asyncio.get_running_loop().create_task(self._locked(self.enforce_memory_budget))
+        except RuntimeError:
+            # No event loop yet, the eviction loop checks it once started
+            pass
+    
+    async def _locked(self, operation):
+        async with self.lifecycle_lock:
+            await operation()
+    
+    async def _eviction_loop(self):
+        while True:
+            await asyncio.sleep(self.eviction_interval)
+            try:
+                async with self.lifecycle_lock:
+                    await self.evict_idle_models()
+                    await self.enforce_memory_budget()
+            except Exception as e:
+                logging.error(f"Error evicting models: {str(e)}")
+    
+    async def unload_model(self, model_name, reason, replacement=None):
+        """
+        Unload the instances of a model once their running calls are done
+        
+        New calls go to the replacement right away, or create a new instance
+        when the model is used again.
+        
+        Args:
+            model_name (str): Name of the model
+            reason (str): Why the model is unloaded, for logs and metrics
+            replacement (BaseModel): Instance that takes over, e.g. of a reloaded class
+        """
+        model = self.model_instances.pop(model_name, None)
+        if replacement is not None:
+            self.model_instances[model_name] = replacement
+        
+        pool = self.model_pools.pop(model_name, None)
+        scheduler = self.batch_schedulers.pop(model_name, None)
+        
+        deadline = time.monotonic() + self.drain_timeout
+        while (pool is not None and not pool.is_idle()) or (scheduler is not None and not scheduler.is_idle()):
+            if time.monotonic() >= deadline:
+                logging.warning(f"Model {model_name} still busy after {self.drain_timeout}s, unloading it anyway")
+                break
+            await asyncio.sleep(0.05)
+        
+        if scheduler is not None:
+            await scheduler.close()
+        
+        instances = [entry[0] for entry in pool.instances] if pool is not None else []
+        if model is not None and model not in instances:
+            instances.append(model)
+        
+        for instance in instances:
+            try:
+                await asyncio.to_thread(instance.unload)
+            except Exception as e:
+                logging.error(f"Error unloading instance of model {model_name}: {str(e)}")
+            artifact_store.release(instance)
+        
+        # States of the old instances may not fit the new ones, even without a version bump
+        prefix_cache.remove_model(model_name)
+        
+        if replacement is None:
+            self.instance_memory.pop(model_name, None)
+        
+        if model is not None or pool is not None:
+            MODEL_LIFECYCLE_EVENTS.labels(model_name, reason).inc()
+            logging.info(f"Unloaded {len(instances)} instances of model {model_name} ({reason})")
+    
+    async def reload_models(self):
+        """
+        Pick up new, changed and removed modules of the implementations package
+        
+        Running instances of changed models are replaced by new instances of the
+        reloaded classes. Model set listeners are notified when models were added
+        or removed.
+        """
+        from src.models import implementations
+        implementations_path = os.path.dirname(implementations.__file__)
+        
+        sources = {}
+        for _, module_name, is_pkg in pkgutil.iter_modules([implementations_path]):
+            source_path = get_module_source_path(implementations_path, module_name, is_pkg)
+            if source_path:
+                sources[module_name] = source_path
+        
+        changed = [
+            module_name for module_name, source_path in sources.items()
+            if self.module_versions.get(module_name) != get_source_version(source_path)
+        ]
+        removed = [module_name for module_name in self.module_versions if module_name not in sources]
+        if not changed and not removed:
+            return
+        
+        catalog_version = self.catalog.version
+        
+        for module_name in removed:
+            logging.info(f"Module {module_name} was removed, unloading its models")
+            del self.module_versions[module_name]
+            await self._replace_module_models(module_name, [])
+            sys.modules.pop(f"src.models.implementations.{module_name}", None)
+        
+        for module_name in changed:
+            await self._reload_module(module_name, sources[module_name])
+        
+        if self.catalog.version != catalog_version:
+            logging.info(f"Model set changed, now serving: {', '.join(self.get_available_models())}")
+            for listener in self.model_set_listeners:
+                try:
+                    listener()
+                except Exception as e:
+                    logging.error(f"Model set listener failed: {str(e)}")
+    
+    async def _reload_module(self, module_name, source_path):
+        """
+        Re-import a new or changed module and swap in its models
+        """
+        logging.info(f"Reloading models from module {module_name}")
+        full_name = f"src.models.implementations.{module_name}"
+        old_classes = {
+            model_name: self.model_classes.get(model_name)
+            for model_name, spec in self.model_specs.items() if spec["module"] == module_name
+        }
+        
+        try:
+            # A stale bytecode cache with the same source size and mtime second would win
+            try:
+                os.remove(importlib.util.cache_from_source(source_path))
+            except OSError:
+                pass
+            if full_name in sys.modules:
+                importlib.reload(sys.modules[full_name])
+            
+            for model_name in old_classes:
+                self.model_specs.pop(model_name, None)
+                self.model_classes.pop(model_name, None)
+            models = self.discover_module(module_name, source_path)
+        except Exception as e:
+            # Keep serving the previous version until the module is fixed
+            self.module_versions[module_name] = get_source_version(source_path)
+            for model_name, model_class in old_classes.items():
+                self.model_specs.setdefault(model_name, {"module": module_name, "class": getattr(model_class, "__name__", "")})
+                if model_class is not None:
+                    self.model_classes.setdefault(model_name, model_class)
+            logging.error(f"Error reloading module {module_name}, keeping the previous version: {str(e)}")
+            return
+        
+        await self._replace_module_models(module_name, models, old_classes)
+    
+    async def _replace_module_models(self, module_name, models, old_classes=None):
+        """
+        Make the available models of a module match its newly discovered models
+        
+        Args:
+            module_name (str): Name of the module in the implementations package
+            models (list): Discovered models of the module, empty if it was removed
+            old_classes (dict): Model name to the class before reloading
+        """
+        new_names = {model["name"] for model in models}
+        old_names = set(old_classes or {}) | {
+            model_name for model_name, spec in self.model_specs.items() if spec["module"] == module_name
+        }
+        
+        self.discovered_models = [
+            model for model in self.discovered_models if model["name"] not in old_names | new_names
+        ] + models
+        
+        for model_name in old_names - new_names:
+            self.model_specs.pop(model_name, None)
+            self.model_classes.pop(model_name, None)
+            self.catalog.remove(model_name)
+            await self.unload_model(model_name, "removed")
+        
+        for model in models:
+            if self.is_model_allowed(model["name"]):
+                self.catalog.add(model.copy())
+        self.load_model_classes()
+        
+        for model_name in new_names & set(self.model_instances):
+            if model_name not in self.model_classes:
+                # The new class could not be loaded and the model is no longer available
+                await self.unload_model(model_name, "removed")
+                continue
+            
+            try:
+                replacement = await asyncio.to_thread(self.create_model_instance, model_name)
+                for input_data in replacement.get_warmup_inputs():
+                    await self._call_model(replacement, "process_sync", "process", input_data)
+            except Exception as e:
+                logging.error(f"Failed to create reloaded model {model_name}, keeping the previous version: {str(e)}")
+                if (old_classes or {}).get(model_name) is not None:
+                    self.model_classes[model_name] = old_classes[model_name]
+                continue
+            
+            self.instance_memory.pop(model_name, None)
+            self.reloads += 1
+            await self.unload_model(model_name, "reloaded", replacement=replacement)
+        
+        # Cached outputs of the old code may differ from what the new code returns,
+        # also for models that had no instance loaded
+        for model_name in old_names | new_names:
+            await self.response_cache.remove_model(model_name)
+    
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                async with self.lifecycle_lock:
+                    await self.reload_models()
+            except Exception as e:
+                logging.error(f"Error reloading models: {str(e)}")
+    
+    def get_average_service_time(self, model_name):
+        """
+        Get the typical time a call of a model takes once admitted
+        
+        Args:
+            model_name (str): Name of the model
+            
+        Returns:
+            float: Seconds, 0 if the model has not been called yet
+        """
+        pool = self.model_pools.get(model_name.lower())
+        return pool.average_service_time if pool is not None else 0.0
+    
+    def get_load(self):
+        """
+        Get the current load of the node, as reported to the registry
+        
+        Returns:
+            dict: Totals and per-model in-flight, queued and latency figures
+        """
+        models = {
+            model_name: pool.get_load()
+            for model_name, pool in self.model_pools.items()
+        }
+        
+        return {
+            "inFlight": sum(load["inFlight"] for load in models.values()),
+            "queued": sum(load["queued"] for load in models.values()),
+            "models": models
+        }
+    
+    def collect_metrics(self):
+        """
+        Refresh the in-flight, queued, artifact memory and prefix cache gauges before metrics are scraped
+        """
+        for model_name, pool in self.model_pools.items():
+            MODEL_IN_FLIGHT.labels(model_name).set(pool.in_flight)
+            MODEL_QUEUED.labels(model_name).set(pool.waiting)
+        
+        if artifact_store.entries:
+            for model_name, stats in artifact_store.get_stats().items():
+                MODEL_ARTIFACT_MAPPED_BYTES.labels(model_name).set(stats["mappedBytes"])
+                if stats["pssBytes"] is not None:
+                    MODEL_ARTIFACT_PSS_BYTES.labels(model_name).set(stats["pssBytes"])
+        
+        prefix_sizes = prefix_cache.get_bytes_by_model()
+        for model_name in list(prefix_cache.counters):
+            PREFIX_CACHE_BYTES.labels(model_name).set(prefix_sizes.get(model_name, 0))
+    
+    def get_stats(self):
+        """
+        Get runtime statistics for the managed models
+        
+        Returns:
+            dict: Statistics grouped by feature
+        """
+        return {
+            "batching": {
+                model_name: scheduler.get_stats()
+                for model_name, scheduler in self.batch_schedulers.items()
+                if scheduler is not None
+            },
+            "executor": self.executor.get_stats(),
+            "pools": {
+                model_name: pool.get_stats()
+                for model_name, pool in self.model_pools.items()
+            },
+            "catalog": {
+                "version": self.catalog.version,
+                "models": len(self.catalog)
+            },
+            "cache": self.response_cache.get_stats(),
+            "prefixCache": prefix_cache.get_stats(),
+            "artifacts": artifact_store.get_stats(),
+            "lifecycle": {
+                "memoryBudgetBytes": self.memory_budget,
+                "idleTimeoutSeconds": self.idle_timeout,
+                "hotReload": self.hot_reload,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+                "loaded": {
+                    model_name: {
+                        "footprintBytes": self.get_model_footprint(model_name),
+                        "idleSeconds": round(time.monotonic() - self.last_used[model_name], 1) if model_name in self.last_used else None
+                    }
+                    for model_name in self.model_instances
+                }
+            },
+            "startup": {
+                "ready": self.ready,
+                "modules": self.startup_timings,
+                "preload": self.preload_timings
+            },
+            "streaming": {
+                model_name: {
+                    "streams": stats["streams"],
+                    "chunks": stats["chunks"],
+                    "disconnected": stats["disconnected"],
+                    "averageTimeToFirstChunkMs": round(stats["totalTimeToFirstChunkMs"] / stats["firstChunks"], 2) if stats["firstChunks"] else None,
+                    "maxTimeToFirstChunkMs": round(stats["maxTimeToFirstChunkMs"], 2)
+                }
+                for model_name, stats in self.stream_stats.items()
+            }
+        }
+    
+    async def shutdown(self):
+        """
+        Stop background work owned by the manager
+        """
+        for task in self.lifecycle_tasks:
+            task.cancel()
+        for task in self.lifecycle_tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.lifecycle_tasks = []
+        
+        for scheduler in self.batch_schedulers.values():
+            if scheduler is not None:
+                await scheduler.close()
+        self.batch_schedulers.clear()
+        
+        await self.executor.shutdown()
+        self.response_cache.close()
 
 # Create a singleton instance
 model_manager = ModelManager()
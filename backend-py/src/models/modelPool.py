@@ -0,0 +1,254 @@
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+from src.metrics import MODEL_QUEUE_WAIT, MODEL_PROCESS_DURATION
+from src.models.errors import ModelOverloadedError, DeadlineExceededError
+
+class ModelPool:
+    """
+    Pool of instances of one model with admission control.
+
+    Up to `max_concurrency` calls run at the same time. Further calls wait in a
+    queue of at most `max_queue` entries for at most `queue_timeout_ms`. A call
+    that finds the queue full is rejected with 429, one that waits too long with
+    503, both with a Retry-After estimate. Calls go to the least busy instance
+    and a new instance is created, up to `max_size`, when all of them are busy.
+    """
+
+    def __init__(self, model_name, factory, instance, min_size, max_size, max_concurrency, max_queue, queue_timeout_ms):
+        """
+        Initialize the pool
+
+        Args:
+            model_name (str): Name of the model
+            factory (callable): Creates a new instance of the model
+            instance (BaseModel): First instance of the pool
+            min_size (int): Number of instances to keep ready
+            max_size (int): Maximum number of instances
+            max_concurrency (int): Maximum number of concurrent calls, 0 for no limit
+            max_queue (int): Maximum number of calls waiting for a slot
+            queue_timeout_ms (float): Maximum time a call waits for a slot
+        """
+        self.model_name = model_name
+        self.factory = factory
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000 if queue_timeout_ms > 0 else None
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+
+        # Each entry is [instance, number of calls currently using it]
+        self.instances = [[instance, 0]]
+        self.creating = False
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.average_service_time = 0.0
+        # Service times of the most recent calls, for latency percentiles
+        self.recent_service_times = deque(maxlen=512)
+        self.queue_wait_metric = MODEL_QUEUE_WAIT.labels(model_name)
+        self.process_time_metric = MODEL_PROCESS_DURATION.labels(model_name)
+
+    async def fill(self):
+        """
+        Create instances until the pool holds `min_size` of them
+        """
+        while len(self.instances) < self.min_size:
+            instance = await asyncio.to_thread(self.factory)
+            self.instances.append([instance, 0])
+
+    def retry_after(self):
+        """
+        Estimate how long it takes for the current queue to drain
+
+        Returns:
+            int: Seconds, at least 1
+        """
+        slots = self.max_concurrency or 1
+        return max(1, math.ceil((self.waiting + 1) * self.average_service_time / slots))
+
+    async def _admit(self, timeout=None):
+        """
+        Wait for a free slot
+
+        Args:
+            timeout (float): Seconds left until the request deadline, ends the wait
+                earlier than the pool's queue timeout when shorter
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            ModelOverloadedError: If the queue is full or the queue timeout passed
+            DeadlineExceededError: If the request deadline passed while waiting
+        """
+        if self.semaphore is None:
+            return 0.0
+
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return 0.0
+
+        if self.waiting >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise ModelOverloadedError(
+                f"Too many requests waiting for model {self.model_name}",
+                retry_after=self.retry_after(),
+                status_code=429
+            )
+
+        deadline_bound = timeout is not None and (self.queue_timeout is None or timeout < self.queue_timeout)
+        if not deadline_bound:
+            timeout = self.queue_timeout
+
+        start_time = time.perf_counter()
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(timeout):
+                await self.semaphore.acquire()
+        except TimeoutError:
+            if deadline_bound:
+                raise DeadlineExceededError(f"Request deadline passed while waiting for model {self.model_name}")
+            self.rejected_timeout += 1
+            raise ModelOverloadedError(
+                f"Timed out waiting for model {self.model_name}",
+                retry_after=self.retry_after(),
+                status_code=503
+            )
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - start_time
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    async def _pick_instance(self):
+        """
+        Get the least busy instance, growing the pool when every instance is busy
+
+        Returns:
+            list: The [instance, calls] entry
+        """
+        entry = min(self.instances, key=lambda item: item[1])
+
+        if entry[1] > 0 and len(self.instances) < self.max_size and not self.creating:
+            self.creating = True
+            try:
+                instance = await asyncio.to_thread(self.factory)
+                entry = [instance, 0]
+                self.instances.append(entry)
+                logging.info(f"Grew pool of model {self.model_name} to {len(self.instances)} instances")
+            except Exception as e:
+                logging.error(f"Failed to grow pool of model {self.model_name}: {str(e)}")
+            finally:
+                self.creating = False
+
+        return entry
+
+    @asynccontextmanager
+    async def acquire(self, timeout=None):
+        """
+        Acquire an instance for one call
+
+        Args:
+            timeout (float): Seconds left until the request deadline, None if it has none
+
+        Yields:
+            BaseModel: The instance to call
+        """
+        self.queue_wait_metric.observe(await self._admit(timeout))
+
+        self.in_flight += 1
+        start_time = time.perf_counter()
+        entry = None
+        try:
+            entry = await self._pick_instance()
+            entry[1] += 1
+            yield entry[0]
+        finally:
+            if entry is not None:
+                entry[1] -= 1
+            self.in_flight -= 1
+            self.completed += 1
+            service_time = time.perf_counter() - start_time
+            self.recent_service_times.append(service_time)
+            self.process_time_metric.observe(service_time)
+            # Exponentially weighted average used for Retry-After estimates
+            self.average_service_time += 0.1 * (service_time - self.average_service_time)
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+    def is_idle(self):
+        """
+        Whether no call is running in or waiting for the pool
+
+        Returns:
+            bool: True if the pool is idle
+        """
+        return self.in_flight == 0 and self.waiting == 0
+
+    def get_latency_percentile(self, percentile):
+        """
+        Get a percentile of the recent service times
+
+        Args:
+            percentile (float): Percentile between 0 and 100
+
+        Returns:
+            float: Service time in milliseconds, None if there were no calls yet
+        """
+        if not self.recent_service_times:
+            return None
+
+        ordered = sorted(self.recent_service_times)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return round(ordered[index] * 1000, 2)
+
+    def get_load(self):
+        """
+        Get the current load of the pool
+
+        Returns:
+            dict: In-flight and queued calls and recent latency percentiles
+        """
+        return {
+            "inFlight": self.in_flight,
+            "queued": self.waiting,
+            "p50Ms": self.get_latency_percentile(50),
+            "p95Ms": self.get_latency_percentile(95)
+        }
+
+    def get_stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: Instance count, in-flight and queued calls and queue wait times
+        """
+        admitted = self.completed + self.in_flight
+        return {
+            "instances": len(self.instances),
+            "minSize": self.min_size,
+            "maxSize": self.max_size,
+            "maxConcurrency": self.max_concurrency,
+            "maxQueue": self.max_queue,
+            "inFlight": self.in_flight,
+            "queued": self.waiting,
+            "completed": self.completed,
+            "rejectedQueueFull": self.rejected_queue_full,
+            "rejectedTimeout": self.rejected_timeout,
+            "averageQueueWaitMs": round(self.total_wait / admitted * 1000, 2) if admitted else 0,
+            "maxQueueWaitMs": round(self.max_wait * 1000, 2),
+            "averageServiceTimeMs": round(self.average_service_time * 1000, 2)
+        }
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.metrics import PREFIX_CACHE_LOOKUPS, PREFIX_CACHE_TURNS, PREFIX_CACHE_EVICTIONS
+
+def estimate_size(state):
+    """
+    Estimate the memory held by a cached state
+
+    Args:
+        state: The state, e.g. a NumPy array, bytes or a container of them
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    if hasattr(state, "nbytes"):
+        return int(state.nbytes)
+    if isinstance(state, (bytes, bytearray, str)):
+        return len(state)
+    if isinstance(state, dict):
+        return sys.getsizeof(state) + sum(estimate_size(key) + estimate_size(value) for key, value in state.items())
+    if isinstance(state, (list, tuple)):
+        return sys.getsizeof(state) + sum(estimate_size(item) for item in state)
+    return sys.getsizeof(state)
+
+class PrefixCache:
+    """
+    Cache of model state for conversation-history prefixes.
+
+    Chat requests carry the whole conversation on every turn. A model that
+    encodes the history can store the state reached after encoding it and, on
+    the next turn, fetch the state of the longest cached prefix and process
+    only the turns added since. Entries are keyed by the lowercased model
+    name, model version and a rolling hash of the turns, so equal histories
+    share entries whatever session they come from and a branch of a
+    conversation reuses the state of the common prefix. The cache is an LRU bounded by PREFIX_CACHE_MAX_BYTES
+    and PREFIX_CACHE_MAX_ENTRIES. Cached states are shared and must not be
+    modified by the models.
+
+    The cache lives in the process that runs the model. CPU-bound models in
+    process executor workers each fill a cache of their own, which the
+    statistics, metrics and unloading of the server do not reach, each up to
+    PREFIX_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self):
+        """
+        Initialize the cache from environment variables
+        """
+        self.max_bytes = int(os.environ.get("PREFIX_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+        self.max_entries = int(os.environ.get("PREFIX_CACHE_MAX_ENTRIES", 10000))
+
+        # (model_name, digest) -> (turns, state, size)
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.counters = {}
+        # Models running in the executor pool use the cache from worker threads
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def hash_turns(model_name, model_version, history):
+        """
+        Hash every prefix of a conversation history
+
+        Each hash covers the previous one and the next turn, so hashing all
+        prefixes takes one pass over the history. Only the actor and content of
+        a turn are hashed, extra fields such as errors do not break matches.
+
+        Args:
+            model_name (str): Name of the model
+            model_version (str): Version of the model
+            history (list): Turns of the conversation, oldest first
+
+        Returns:
+            list: Digest of the first 1, 2, ... turns
+        """
+        digest = hashlib.blake2b(f"{model_name}\0{model_version}".encode("utf-8"), digest_size=16).digest()
+        digests = []
+        for turn in history:
+            if isinstance(turn, dict):
+                turn = [turn.get("actor"), turn.get("content")]
+            canonical = json.dumps(turn, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+            digest = hashlib.blake2b(digest + canonical.encode("utf-8"), digest_size=16).digest()
+            digests.append(digest)
+        return digests
+
+    def _count(self, model_name, counter, amount=1):
+        counters = self.counters.setdefault(model_name, {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "turnsReused": 0,
+            "turnsProcessed": 0,
+            "stores": 0,
+            "evictions": 0
+        })
+        counters[counter] += amount
+
+    def lookup(self, model_name, model_version, history):
+        """
+        Find the state of the longest cached prefix of a conversation
+
+        Args:
+            model_name (str): Name of the model
+            model_version (str): Version of the model
+            history (list): Turns of the conversation, oldest first
+
+        Returns:
+            tuple: (number of turns covered by the state, state), (0, None) on a miss
+        """
+        model_name = model_name.lower()
+        digests = self.hash_turns(model_name, model_version, history)
+
+        with self.lock:
+            self._count(model_name, "lookups")
+            for index in range(len(digests) - 1, -1, -1):
+                key = (model_name, digests[index])
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+
+                self.entries.move_to_end(key)
+                turns, state, _ = entry
+                self._count(model_name, "hits")
+                self._count(model_name, "turnsReused", turns)
+                self._count(model_name, "turnsProcessed", len(history) - turns)
+                PREFIX_CACHE_LOOKUPS.labels(model_name, "hit").inc()
+                PREFIX_CACHE_TURNS.labels(model_name, "reused").inc(turns)
+                PREFIX_CACHE_TURNS.labels(model_name, "processed").inc(len(history) - turns)
+                return turns, state
+
+            self._count(model_name, "misses")
+            self._count(model_name, "turnsProcessed", len(history))
+            PREFIX_CACHE_LOOKUPS.labels(model_name, "miss").inc()
+            PREFIX_CACHE_TURNS.labels(model_name, "processed").inc(len(history))
+        return 0, None
+
+    def store(self, model_name, model_version, history, state, size=None):
+        """
+        Store the state reached after processing a conversation
+
+        Args:
+            model_name (str): Name of the model
+            model_version (str): Version of the model
+            history (list): Turns the state covers, oldest first
+            state: The state, treated as immutable once stored
+            size (int): Size of the state in bytes, estimated when not given
+        """
+        if not history:
+            return
+
+        model_name = model_name.lower()
+        size = estimate_size(state) if size is None else size
+        if size > self.max_bytes:
+            return
+
+        key = (model_name, self.hash_turns(model_name, model_version, history)[-1])
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            self.entries[key] = (len(history), state, size)
+            self.current_bytes += size
+            self._count(model_name, "stores")
+
+            while self.current_bytes > self.max_bytes or len(self.entries) > self.max_entries:
+                evicted_key = next(iter(self.entries))
+                self._remove(evicted_key)
+                self._count(evicted_key[0], "evictions")
+                PREFIX_CACHE_EVICTIONS.labels(evicted_key[0]).inc()
+
+    def _remove(self, key):
+        _, _, size = self.entries.pop(key)
+        self.current_bytes -= size
+
+    def remove_model(self, model_name):
+        """
+        Drop the states of a model, e.g. when it is unloaded or reloaded
+
+        Args:
+            model_name (str): Name of the model
+        """
+        model_name = model_name.lower()
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == model_name]:
+                self._remove(key)
+
+    def get_bytes_by_model(self):
+        """
+        Get the size of the cached states of each model
+
+        Returns:
+            dict: Model name to bytes
+        """
+        sizes = {}
+        with self.lock:
+            for (model_name, _), (_, _, size) in self.entries.items():
+                sizes[model_name] = sizes.get(model_name, 0) + size
+        return sizes
+
+    def get_stats(self):
+        """
+        Get cache statistics
+
+        Returns:
+            dict: Size of the cache and per-model counters with hit rates
+        """
+        with self.lock:
+            models = {}
+            for model_name, counters in self.counters.items():
+                models[model_name] = dict(counters)
+                models[model_name]["hitRate"] = round(counters["hits"] / counters["lookups"], 4) if counters["lookups"] else None
+                turns = counters["turnsReused"] + counters["turnsProcessed"]
+                models[model_name]["turnReuseRate"] = round(counters["turnsReused"] / turns, 4) if turns else None
+
+            return {
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+                "maxBytes": self.max_bytes,
+                "maxEntries": self.max_entries,
+                "models": models
+            }
+
+# Create a singleton instance
+prefix_cache = PrefixCache()
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+
+from src.requestContext import TIMEOUT_FIELD, DEADLINE_FIELD, set_request_context
+
+# Input fields that steer the request rather than select the output. The
+# model name is part of the key on its own, normalized.
+CONTROL_FIELDS = ("modelName", TIMEOUT_FIELD, DEADLINE_FIELD)
+
+class ResponseCache:
+    """
+    Content-addressed cache of model outputs for deterministic models.
+
+    Entries are keyed by model name, model version and a hash of the canonical
+    JSON of the input. The in-memory tier is an LRU bounded by
+    RESPONSE_CACHE_MAX_BYTES. When RESPONSE_CACHE_PATH is set, entries are also
+    written to a SQLite file that survives restarts, bounded by
+    RESPONSE_CACHE_DISK_MAX_ENTRIES. Concurrent requests for the same key are
+    coalesced so only one of them runs the model.
+    """
+
+    def __init__(self):
+        """
+        Initialize the cache from environment variables
+        """
+        self.max_bytes = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        self.disk_path = os.environ.get("RESPONSE_CACHE_PATH")
+        self.disk_max_entries = int(os.environ.get("RESPONSE_CACHE_DISK_MAX_ENTRIES", 100000))
+
+        # key -> (model_name, expires_at, value, size)
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.in_flight = {}
+        self.counters = {}
+
+        self.disk = None
+        self.disk_lock = threading.Lock()
+        if self.disk_path:
+            self._open_disk()
+
+    def _open_disk(self):
+        """
+        Open the SQLite tier, disabling it if the file cannot be used
+        """
+        try:
+            self.disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self.disk.execute("PRAGMA journal_mode=WAL")
+            self.disk.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, expires_at REAL, value TEXT)"
+            )
+            self.disk.commit()
+            logging.info(f"Response cache disk tier at {self.disk_path}")
+        except sqlite3.Error as e:
+            logging.error(f"Failed to open response cache at {self.disk_path}: {str(e)}")
+            self.disk = None
+
+    @staticmethod
+    def make_key(model_name, model_version, input_data):
+        """
+        Build the cache key of an input
+
+        Control fields such as the deadline are left out, so requests that
+        only differ in them share an entry and are coalesced.
+
+        Args:
+            model_name (str): Name of the model
+            model_version (str): Version of the model
+            input_data (dict): Input for the model
+
+        Returns:
+            str: Hex digest identifying the input for this model version
+        """
+        if isinstance(input_data, dict):
+            input_data = {field: value for field, value in input_data.items() if field not in CONTROL_FIELDS}
+        canonical = json.dumps(input_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        digest = hashlib.sha256()
+        digest.update(f"{model_name.lower()}\0{model_version}\0".encode("utf-8"))
+        digest.update(canonical.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _count(self, model_name, counter, amount=1):
+        counters = self.counters.setdefault(model_name, {
+            "hits": 0,
+            "diskHits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expired": 0
+        })
+        counters[counter] += amount
+
+    async def get_or_compute(self, model_name, model_version, ttl_seconds, input_data, compute):
+        """
+        Return the cached output for an input, computing and storing it on a miss
+
+        Args:
+            model_name (str): Name of the model
+            model_version (str): Version of the model
+            ttl_seconds (float): Lifetime of the entry, 0 for no expiry
+            input_data (dict): Input for the model
+            compute (callable): Coroutine function producing the output on a miss
+
+        Returns:
+            dict: Output for the input
+        """
+        key = self.make_key(model_name, model_version, input_data)
+
+        found, value = self._get_memory(model_name, key)
+        if found:
+            self._count(model_name, "hits")
+            return value
+
+        # Identical requests share one computation. It runs in its own task so a
+        # caller that gives up does not cancel the work for the others, and
+        # without the first caller's request context so its deadline and
+        # cancellation do not apply to the others; each caller keeps its own.
+        task = self.in_flight.get(key)
+        if task is None:
+            context = contextvars.copy_context()
+            context.run(set_request_context, None)
+            task = asyncio.create_task(self._load(model_name, key, ttl_seconds, compute), context=context)
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._count(model_name, "coalesced")
+
+        return await asyncio.shield(task)
+
+    async def _load(self, model_name, key, ttl_seconds, compute):
+        """
+        Look a key up on disk, computing and storing the output if it is not there
+        """
+        if self.disk is not None:
+            found, value = await asyncio.to_thread(self._get_disk, key)
+            if found:
+                self._count(model_name, "diskHits")
+                self._put_memory(model_name, key, value, self._expires_at(ttl_seconds))
+                return value
+
+        self._count(model_name, "misses")
+        value = await compute()
+
+        try:
+            encoded = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            # The call succeeded, only caching is not possible
+            logging.warning(f"Not caching output of model {model_name}: {str(e)}")
+            return value
+
+        expires_at = self._expires_at(ttl_seconds)
+        self._put_memory(model_name, key, value, expires_at, len(encoded))
+        if self.disk is not None:
+            await asyncio.to_thread(self._put_disk, model_name, key, encoded, expires_at)
+
+        return value
+
+    def _finish(self, key, task):
+        self.in_flight.pop(key, None)
+        # Retrieve the exception so it is not reported when every caller gave up
+        if not task.cancelled():
+            task.exception()
+
+    @staticmethod
+    def _expires_at(ttl_seconds):
+        return time.time() + ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+
+    def _get_memory(self, model_name, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+
+        _, expires_at, value, size = entry
+        if expires_at is not None and expires_at < time.time():
+            self._remove_memory(key)
+            self._count(model_name, "expired")
+            return False, None
+
+        self.entries.move_to_end(key)
+        return True, value
+
+    def _put_memory(self, model_name, key, value, expires_at, size=None):
+        size = len(json.dumps(value)) if size is None else size
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self._remove_memory(key)
+
+        self.entries[key] = (model_name, expires_at, value, size)
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            evicted_key, (evicted_model, _, _, _) = next(iter(self.entries.items()))
+            self._remove_memory(evicted_key)
+            self._count(evicted_model, "evictions")
+
+    def _remove_memory(self, key):
+        _, _, _, size = self.entries.pop(key)
+        self.current_bytes -= size
+
+    def _get_disk(self, key):
+        with self.disk_lock:
+            row = self.disk.execute(
+                "SELECT expires_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return False, None
+
+            expires_at, value = row
+            if expires_at is not None and expires_at < time.time():
+                self.disk.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.disk.commit()
+                return False, None
+
+        return True, json.loads(value)
+
+    def _put_disk(self, model_name, key, encoded, expires_at):
+        with self.disk_lock:
+            try:
+                self.disk.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, expires_at, value) VALUES (?, ?, ?, ?)",
+                    (key, model_name, expires_at, encoded)
+                )
+                # Keep the newest entries when the file grows past its bound
+                self.disk.execute(
+                    "DELETE FROM responses WHERE rowid <= "
+                    "(SELECT MAX(rowid) FROM responses) - ?",
+                    (self.disk_max_entries,)
+                )
+                self.disk.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Failed to write response cache entry: {str(e)}")
+
+    async def remove_model(self, model_name):
+        """
+        Drop the entries of a model from both tiers, e.g. after its code was reloaded
+
+        Args:
+            model_name (str): Name of the model
+        """
+        model_name = model_name.lower()
+        for key in [key for key, entry in self.entries.items() if entry[0] == model_name]:
+            self._remove_memory(key)
+        if self.disk is not None:
+            await asyncio.to_thread(self._remove_disk, model_name)
+
+    def _remove_disk(self, model_name):
+        with self.disk_lock:
+            try:
+                self.disk.execute("DELETE FROM responses WHERE model = ?", (model_name,))
+                self.disk.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Failed to remove response cache entries of {model_name}: {str(e)}")
+
+    def after_fork(self):
+        """
+        Open the disk tier again in a forked worker, SQLite connections must not be shared across fork
+        """
+        self.disk = None
+        self.disk_lock = threading.Lock()
+        if self.disk_path:
+            self._open_disk()
+
+    def close(self):
+        """
+        Close the disk tier
+        """
+        if self.disk is not None:
+            with self.disk_lock:
+                self.disk.close()
+            self.disk = None
+
+    def get_stats(self):
+        """
+        Get cache statistics
+
+        Returns:
+            dict: Size of the memory tier and per-model counters
+        """
+        return {
+            "entries": len(self.entries),
+            "bytes": self.current_bytes,
+            "maxBytes": self.max_bytes,
+            "diskEnabled": self.disk is not None,
+            "models": self.counters
+        }
@@ -0,0 +1,623 @@
+import os
+import re
+import json
+import time
+import fcntl
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from src.jsonCodec import json_codec
+from src.metrics import registry, VECTOR_INDEX_VECTORS, VECTOR_SEARCH_DURATION
+
+# Version of the files of a persisted collection
+INDEX_FORMAT_VERSION = 1
+
+# Rows allocated when a collection is created, doubled whenever it is full
+INITIAL_CAPACITY = 1024
+
+# Most scores computed at once by an exact search, bounds its temporary memory
+SCORE_CHUNK = 1 << 24
+
+# Rows sampled per IVF list to train the centroids
+TRAINING_SAMPLES_PER_LIST = 64
+TRAINING_ITERATIONS = 10
+
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError("NumPy is required for vector indexes, install numpy")
+
+def normalize(vectors):
+    """
+    Scale vectors to unit length so the dot product is the cosine similarity
+
+    Args:
+        vectors: 2D array-like of vectors
+
+    Returns:
+        numpy.ndarray: Contiguous float32 copy, zero vectors are left as they are
+    """
+    vectors = numpy.array(vectors, dtype=numpy.float32, order="C", ndmin=2)
+    norms = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    vectors /= norms
+    return vectors
+
+def top_k(scores, k):
+    """
+    Select the best `k` scores of each row
+
+    argpartition finds them in linear time, only those `k` are sorted.
+
+    Args:
+        scores (numpy.ndarray): Scores of shape (queries, candidates)
+        k (int): Number of results per row
+
+    Returns:
+        tuple: (indexes, scores), both of shape (queries, k), best first
+    """
+    candidates = scores.shape[1]
+    k = min(k, candidates)
+    if k < candidates:
+        indexes = numpy.argpartition(scores, candidates - k, axis=1)[:, candidates - k:]
+    else:
+        indexes = numpy.broadcast_to(numpy.arange(candidates), scores.shape)
+    selected = numpy.take_along_axis(scores, indexes, axis=1)
+    order = numpy.argsort(-selected, axis=1)
+    return numpy.take_along_axis(indexes, order, axis=1), numpy.take_along_axis(selected, order, axis=1)
+
+class VectorIndex:
+    """
+    Append-only collection of normalized float32 vectors with an id and metadata each.
+
+    The vectors are one contiguous (capacity, dimensions) matrix. A search
+    scores all of them with one matrix product and selects the top k with
+    argpartition. Once a collection holds VECTOR_INDEX_IVF_MIN_VECTORS vectors
+    it is partitioned IVF-style: k-means centroids split the vectors into
+    lists and a search only scores the lists of the `nprobe` centroids nearest
+    to the query. The centroids are trained again whenever the collection
+    grew VECTOR_INDEX_IVF_RETRAIN_GROWTH times since they were last trained.
+
+    With a directory the matrix, the list assignments and the item offsets
+    are memory-mapped files and items are appended to a JSON lines file, so a
+    restarted worker maps the collection and answers at once. Writers hold a
+    file lock and bump a shared generation counter, which other workers check
+    before every search to pick up what was added.
+
+    Every method blocks, the VectorStore calls them through asyncio.to_thread.
+    """
+
+    def __init__(self, name, dimensions, model_name, model_version, path=None):
+        """
+        Args:
+            name (str): Name of the collection
+            dimensions (int): Length of the vectors
+            model_name (str): Embedding model the vectors come from
+            model_version (str): MODEL_VERSION of that model
+            path (str): Directory of the collection files, None to keep it in memory
+        """
+        _require_numpy()
+        self.name = name
+        self.dimensions = dimensions
+        self.model_name = model_name
+        self.model_version = model_version
+        self.path = path
+
+        self.ivf_min_vectors = int(os.environ.get("VECTOR_INDEX_IVF_MIN_VECTORS", 100000))
+        self.ivf_lists = int(os.environ.get("VECTOR_INDEX_IVF_LISTS", 0))
+        self.retrain_growth = float(os.environ.get("VECTOR_INDEX_IVF_RETRAIN_GROWTH", 4))
+        self.default_nprobe = int(os.environ.get("VECTOR_INDEX_NPROBE", 8))
+
+        self.lock = threading.Lock()
+        self.count = 0
+        self.capacity = 0
+        self.trained_count = 0
+        self.vectors = None
+        self.assignments = None
+        self.item_offsets = None
+        self.items = []
+        self.items_fd = None
+        self.centroids = None
+        self.lists = None
+        self.generation = 0
+        self.generation_map = None
+
+        if path is None:
+            self._allocate(INITIAL_CAPACITY)
+            return
+
+        os.makedirs(path, exist_ok=True)
+        self.items_fd = os.open(self._file("items.jsonl"), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        with self._file_lock():
+            if not os.path.exists(self._file("index.json")):
+                self._allocate(INITIAL_CAPACITY)
+                self._save_meta()
+            self._open_generation()
+            self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Hold the lock that serializes writers of the collection across processes
+        """
+        if self.path is None:
+            yield
+            return
+        with open(self._file(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _open_generation(self):
+        path = self._file("generation")
+        if not os.path.exists(path) or os.path.getsize(path) < 8:
+            with open(path, "wb") as generation_file:
+                generation_file.write(b"\0" * 8)
+        self.generation_map = numpy.memmap(path, dtype=numpy.int64, mode="r+", shape=(1,))
+
+    def _map(self, name, dtype, shape):
+        """
+        Map a collection file, growing it to the shape first
+        """
+        path = self._file(name)
+        size = int(numpy.prod(shape)) * numpy.dtype(dtype).itemsize
+        with open(path, "ab") as data_file:
+            if os.fstat(data_file.fileno()).st_size < size:
+                data_file.truncate(size)
+        return numpy.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _allocate(self, capacity):
+        """
+        Make room for `capacity` vectors, keeping the ones already stored
+        """
+        if self.path is not None:
+            self.vectors = self._map("vectors.f32", numpy.float32, (capacity, self.dimensions))
+            self.assignments = self._map("assignments.i32", numpy.int32, (capacity,))
+            self.item_offsets = self._map("items.idx", numpy.int64, (capacity, 2))
+        else:
+            vectors = numpy.zeros((capacity, self.dimensions), dtype=numpy.float32)
+            assignments = numpy.zeros(capacity, dtype=numpy.int32)
+            if self.vectors is not None:
+                vectors[:self.count] = self.vectors[:self.count]
+                assignments[:self.count] = self.assignments[:self.count]
+            self.vectors = vectors
+            self.assignments = assignments
+        self.capacity = capacity
+
+    def _save_meta(self):
+        meta = {
+            "formatVersion": INDEX_FORMAT_VERSION,
+            "name": self.name,
+            "dimensions": self.dimensions,
+            "model": self.model_name,
+            "modelVersion": self.model_version,
+            "count": self.count,
+            "capacity": self.capacity,
+            "lists": len(self.centroids) if self.centroids is not None else 0,
+            "trainedCount": self.trained_count
+        }
+        temp_path = self._file("index.json.tmp")
+        with open(temp_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(temp_path, self._file("index.json"))
+
+    def _load(self):
+        """
+        Map the state written by the last writer
+        """
+        with open(self._file("index.json"), "r") as meta_file:
+            meta = json.load(meta_file)
+        if meta["formatVersion"] != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported format version {meta['formatVersion']} of vector collection {self.name}")
+
+        self.dimensions = meta["dimensions"]
+        self.model_name = meta["model"]
+        self.model_version = meta["modelVersion"]
+        if meta["capacity"] != self.capacity:
+            self._allocate(meta["capacity"])
+
+        previous_count = self.count
+        self.count = meta["count"]
+        if meta["lists"] == 0:
+            self.centroids = None
+            self.lists = None
+        elif meta["trainedCount"] != self.trained_count or self.lists is None:
+            self.centroids = numpy.load(self._file("centroids.npy"))
+            self._build_lists()
+        else:
+            self._extend_lists(previous_count, self.count)
+        self.trained_count = meta["trainedCount"]
+        self.generation = int(self.generation_map[0])
+
+    def _refresh(self):
+        """
+        Pick up vectors added by other processes since the last call
+        """
+        if self.path is not None and int(self.generation_map[0]) != self.generation:
+            self._load()
+
+    def _publish(self):
+        """
+        Make the stored vectors visible to other processes
+        """
+        self.vectors.flush()
+        self.assignments.flush()
+        self.item_offsets.flush()
+        self._save_meta()
+        self.generation_map[0] += 1
+        self.generation = int(self.generation_map[0])
+
+    def _build_lists(self):
+        assignments = self.assignments[:self.count]
+        order = numpy.argsort(assignments, kind="stable")
+        sizes = numpy.bincount(assignments, minlength=len(self.centroids))
+        self.lists = numpy.split(order, numpy.cumsum(sizes)[:-1])
+
+    def _extend_lists(self, start, end):
+        if self.lists is None or end <= start:
+            return
+        added = numpy.arange(start, end)
+        assignments = self.assignments[start:end]
+        # New lists rather than in-place growth, so running searches keep a consistent snapshot
+        lists = list(self.lists)
+        for list_index in numpy.unique(assignments):
+            lists[list_index] = numpy.concatenate((lists[list_index], added[assignments == list_index]))
+        self.lists = lists
+
+    def _assign(self, vectors):
+        """
+        Get the nearest centroid of each vector
+        """
+        assignments = numpy.empty(len(vectors), dtype=numpy.int32)
+        step = max(1, SCORE_CHUNK // len(self.centroids))
+        for start in range(0, len(vectors), step):
+            assignments[start:start + step] = numpy.argmax(vectors[start:start + step] @ self.centroids.T, axis=1)
+        return assignments
+
+    def _train(self):
+        """
+        Train the IVF centroids with spherical k-means on a sample and assign all vectors
+        """
+        start_time = time.perf_counter()
+        list_count = self.ivf_lists or int(numpy.sqrt(self.count))
+        list_count = max(1, min(list_count, self.count))
+
+        generator = numpy.random.default_rng(0)
+        sample_size = min(self.count, list_count * TRAINING_SAMPLES_PER_LIST)
+        sample = self.vectors[numpy.sort(generator.choice(self.count, sample_size, replace=False))]
+        centroids = sample[generator.choice(sample_size, list_count, replace=False)].copy()
+
+        for _ in range(TRAINING_ITERATIONS):
+            nearest = numpy.argmax(sample @ centroids.T, axis=1)
+            sums = numpy.zeros_like(centroids)
+            numpy.add.at(sums, nearest, sample)
+            # Empty lists keep their centroid
+            filled = numpy.bincount(nearest, minlength=list_count) > 0
+            centroids[filled] = normalize(sums[filled])
+
+        self.centroids = centroids
+        self.assignments[:self.count] = self._assign(self.vectors[:self.count])
+        self._build_lists()
+        self.trained_count = self.count
+        if self.path is not None:
+            temp_path = self._file("centroids.tmp.npy")
+            numpy.save(temp_path, centroids)
+            os.replace(temp_path, self._file("centroids.npy"))
+        logging.info(
+            f"Partitioned vector collection {self.name} into {list_count} lists "
+            f"in {round(time.perf_counter() - start_time, 2)}s"
+        )
+
+    def _should_train(self):
+        if self.ivf_min_vectors <= 0 or self.count < self.ivf_min_vectors:
+            return False
+        return self.centroids is None or self.count >= self.trained_count * self.retrain_growth
+
+    def add(self, vectors, items):
+        """
+        Append vectors with their items
+
+        Args:
+            vectors: Array-like of shape (n, dimensions)
+            items (list): One {"id", "metadata"} dict per vector, a missing id becomes the position
+
+        Returns:
+            list: The ids of the added vectors
+
+        Raises:
+            ValueError: If the vectors do not have the dimensions of the collection
+        """
+        vectors = normalize(vectors)
+        if vectors.shape[1] != self.dimensions:
+            raise ValueError(f"Collection {self.name} holds vectors of {self.dimensions} dimensions, got {vectors.shape[1]}")
+
+        with self.lock, self._file_lock():
+            self._refresh()
+            start = self.count
+            end = start + len(vectors)
+            if end > self.capacity:
+                capacity = self.capacity
+                while capacity < end:
+                    capacity *= 2
+                self._allocate(capacity)
+
+            self.vectors[start:end] = vectors
+            items = [
+                item if item.get("id") is not None else {**item, "id": start + offset}
+                for offset, item in enumerate(items)
+            ]
+            if self.path is not None:
+                lines = [json_codec.dumps_line(item) for item in items]
+                offset = os.fstat(self.items_fd).st_size
+                lengths = numpy.array([len(line) for line in lines], dtype=numpy.int64)
+                self.item_offsets[start:end, 0] = offset + numpy.cumsum(lengths) - lengths
+                self.item_offsets[start:end, 1] = lengths
+                os.write(self.items_fd, b"".join(lines))
+            else:
+                self.items.extend(items)
+
+            if self.centroids is not None:
+                self.assignments[start:end] = self._assign(vectors)
+            self.count = end
+            self._extend_lists(start, end)
+            if self._should_train():
+                self._train()
+
+            if self.path is not None:
+                self._publish()
+            return [item["id"] for item in items]
+
+    def search(self, queries, k, nprobe=None, exact=False):
+        """
+        Find the vectors most similar to each query
+
+        Args:
+            queries: Array-like of shape (queries, dimensions)
+            k (int): Number of results per query
+            nprobe (int): IVF lists scored per query, defaults to VECTOR_INDEX_NPROBE
+            exact (bool): Score every vector even if the collection is partitioned
+
+        Returns:
+            list: Per query, a list of (position, score) tuples, best first
+        """
+        queries = normalize(queries)
+        if queries.shape[1] != self.dimensions:
+            raise ValueError(f"Collection {self.name} holds vectors of {self.dimensions} dimensions, got {queries.shape[1]}")
+
+        with self.lock:
+            self._refresh()
+            count, vectors, centroids, lists = self.count, self.vectors, self.centroids, self.lists
+
+        if count == 0 or k <= 0:
+            return [[] for _ in queries]
+
+        start_time = time.perf_counter()
+        if centroids is None or exact:
+            mode = "exact"
+            results = []
+            matrix = vectors[:count]
+            step = max(1, SCORE_CHUNK // count)
+            for start in range(0, len(queries), step):
+                indexes, scores = top_k(queries[start:start + step] @ matrix.T, k)
+                results.extend(zip(indexes.tolist(), scores.tolist()))
+        else:
+            mode = "ivf"
+            results = []
+            probes, _ = top_k(queries @ centroids.T, nprobe or self.default_nprobe)
+            for query, probe in zip(queries, probes):
+                candidates = numpy.concatenate([lists[list_index] for list_index in probe])
+                if len(candidates) == 0:
+                    results.append(([], []))
+                    continue
+                indexes, scores = top_k((vectors[candidates] @ query)[numpy.newaxis, :], k)
+                results.append((candidates[indexes[0]].tolist(), scores[0].tolist()))
+        VECTOR_SEARCH_DURATION.labels(mode).observe(time.perf_counter() - start_time)
+
+        return [list(zip(indexes, scores)) for indexes, scores in results]
+
+    def find(self, queries, k, nprobe=None, exact=False):
+        """
+        Find the items most similar to each query
+
+        Args:
+            queries: Array-like of shape (queries, dimensions)
+            k (int): Number of results per query
+            nprobe (int): IVF lists scored per query, defaults to VECTOR_INDEX_NPROBE
+            exact (bool): Score every vector even if the collection is partitioned
+
+        Returns:
+            list: Per query, a list of {"id", "score", "metadata"} dicts, best first
+        """
+        results = []
+        for matches in self.search(queries, k, nprobe, exact):
+            items = self.get_items([position for position, _ in matches])
+            results.append([
+                {"id": item["id"], "score": round(score, 6), "metadata": item.get("metadata")}
+                for item, (_, score) in zip(items, matches)
+            ])
+        return results
+
+    def get_items(self, positions):
+        """
+        Read the items of stored vectors
+
+        Args:
+            positions (list): Positions of the vectors
+
+        Returns:
+            list: The {"id", "metadata"} dicts
+        """
+        if self.path is None:
+            return [self.items[position] for position in positions]
+        offsets = self.item_offsets
+        return [
+            json_codec.loads(os.pread(self.items_fd, int(offsets[position, 1]), int(offsets[position, 0])))
+            for position in positions
+        ]
+
+    def close(self):
+        """
+        Release the files of the collection
+        """
+        if self.items_fd is not None:
+            os.close(self.items_fd)
+            self.items_fd = None
+
+    def get_stats(self):
+        """
+        Get collection statistics
+
+        Returns:
+            dict: Size, model and partitioning of the collection
+        """
+        return {
+            "vectors": self.count,
+            "dimensions": self.dimensions,
+            "model": self.model_name,
+            "modelVersion": self.model_version,
+            "lists": len(self.centroids) if self.centroids is not None else 0,
+            "bytes": self.capacity * self.dimensions * 4,
+            "persisted": self.path is not None
+        }
+
+class VectorStore:
+    """
+    The vector collections of the service, by name.
+
+    Collections are kept in VECTOR_INDEX_DIR, one directory each, and only in
+    memory when it is not set. Existing collections are mapped at startup, and
+    ones created later by other workers when they are first asked for.
+    """
+
+    def __init__(self):
+        """
+        Initialize the store from environment variables
+        """
+        self.directory = os.environ.get("VECTOR_INDEX_DIR")
+        self.collections = {}
+        self.creating = asyncio.Lock()
+        registry.add_collector(self.collect_metrics)
+
+    async def start(self):
+        """
+        Map the collections persisted in VECTOR_INDEX_DIR
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            await self._open(name)
+        if self.collections:
+            logging.info(f"Vector collections: {', '.join(self.collections)}")
+
+    async def stop(self):
+        """
+        Close all collections
+        """
+        for collection in self.collections.values():
+            collection.close()
+        self.collections = {}
+
+    async def _open(self, name):
+        """
+        Map a collection persisted in VECTOR_INDEX_DIR
+
+        Args:
+            name (str): Name of the collection
+
+        Returns:
+            VectorIndex: The collection, None if there is none of that name
+        """
+        if not self.directory or not isinstance(name, str) or not COLLECTION_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        # index.json is written under the collection's file lock before anything
+        # else, and opening reads it under that lock
+        if not os.path.exists(os.path.join(path, "index.json")):
+            return None
+        try:
+            collection = await asyncio.to_thread(VectorIndex, name, 0, None, None, path)
+        except Exception as e:
+            logging.warning(f"Failed to open vector collection {name}: {str(e)}")
+            return None
+        self.collections[name] = collection
+        return collection
+
+    async def get(self, name):
+        """
+        Get a collection, mapping it if another worker created it
+
+        Args:
+            name (str): Name of the collection
+
+        Returns:
+            VectorIndex: The collection, None if it does not exist
+        """
+        collection = self.collections.get(name)
+        if collection is not None or not self.directory:
+            return collection
+
+        async with self.creating:
+            collection = self.collections.get(name)
+            if collection is None:
+                collection = await self._open(name)
+            return collection
+
+    async def get_or_create(self, name, dimensions, model_name, model_version):
+        """
+        Get a collection, creating it for the embedding model if it does not exist
+
+        Args:
+            name (str): Name of the collection
+            dimensions (int): Length of the vectors
+            model_name (str): Embedding model the vectors come from
+            model_version (str): MODEL_VERSION of that model
+
+        Returns:
+            VectorIndex: The collection
+
+        Raises:
+            ValueError: If the name is invalid
+        """
+        if not isinstance(name, str) or not COLLECTION_NAME.match(name):
+            raise ValueError("Collection names are 1 to 64 letters, digits, '_', '.' or '-', starting with a letter or digit")
+
+        async with self.creating:
+            collection = self.collections.get(name)
+            if collection is None:
+                path = os.path.join(self.directory, name) if self.directory else None
+                collection = await asyncio.to_thread(VectorIndex, name, dimensions, model_name, model_version, path)
+                self.collections[name] = collection
+                logging.info(f"Created vector collection {name} for model {collection.model_name}")
+            return collection
+
+    def collect_metrics(self):
+        """
+        Refresh the collection gauges before metrics are scraped
+        """
+        for name, collection in list(self.collections.items()):
+            VECTOR_INDEX_VECTORS.labels(name).set(collection.count)
+
+    def get_stats(self):
+        """
+        Get statistics of all collections
+
+        Returns:
+            dict: Statistics per collection
+        """
+        return {name: collection.get_stats() for name, collection in list(self.collections.items())}
+
+# Create a singleton instance
+vector_store = VectorStore()
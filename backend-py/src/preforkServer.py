@@ -0,0 +1,159 @@
+import os
+import gc
+import time
+import shutil
+import signal
+import socket
+import logging
+import tempfile
+import uvicorn
+
+from src.workerState import worker_state
+
+class PreforkServer:
+    """
+    Serves the app from several worker processes forked from one parent.
+
+    The parent loads the models before forking, so read-only weights and lookup
+    tables are shared copy-on-write by all workers instead of being loaded once
+    per worker. The parent only supervises: it forwards shutdown signals and
+    replaces workers that die. Workers accept connections on the same listening
+    socket. Worker 0 is the primary and is the only one that talks to the
+    registry, reporting the load of the whole node.
+    """
+
+    def __init__(self, app, model_manager, host, port, workers):
+        """
+        Initialize the server
+
+        Args:
+            app: The ASGI application
+            model_manager: The ModelManager instance
+            host (str): Address to listen on
+            port (int): Port to listen on
+            workers (int): Number of worker processes
+        """
+        self.app = app
+        self.model_manager = model_manager
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.children = {}
+        self.stopping = False
+        self.socket = None
+        self.state_dir = None
+
+    def run(self):
+        """
+        Load the models, fork the workers and supervise them until shutdown
+        """
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Accepted connections inherit this; without it small responses written in
+        # two parts wait for the client's delayed ACK
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(2048)
+        self.socket.set_inheritable(True)
+
+        self.state_dir = tempfile.mkdtemp(prefix="backend-py-workers-")
+
+        start_time = time.perf_counter()
+        self.model_manager.load_model_instances()
+        logging.info(f"Loaded models in parent in {round((time.perf_counter() - start_time) * 1000, 2)}ms")
+
+        # Keep the loaded objects out of garbage collection so the collector does
+        # not touch, and thereby copy, their memory pages in every worker
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+
+        try:
+            self._supervise()
+        finally:
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+            self.socket.close()
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _spawn(self, worker_id):
+        """
+        Fork one worker
+        """
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(worker_id)
+            os._exit(0)
+
+        self.children[pid] = worker_id
+        logging.info(f"Started worker {worker_id} with pid {pid}")
+
+    def _run_worker(self, worker_id):
+        """
+        Body of a forked worker
+        """
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        self.model_manager.after_fork()
+        worker_state.configure(self.state_dir, worker_id, self.workers)
+
+        config = uvicorn.Config(self.app, log_level="info")
+        uvicorn.Server(config).run(sockets=[self.socket])
+
+    def _supervise(self):
+        """
+        Replace workers that die until shutdown, then stop all of them
+        """
+        while not self.stopping:
+            time.sleep(0.5)
+            self._reap(replace=True)
+
+        logging.info(f"Stopping {len(self.children)} workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + 30
+        while self.children and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self._reap(replace=False)
+
+        for pid in list(self.children):
+            logging.warning(f"Killing worker {self.children[pid]} with pid {pid}")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+
+    def _reap(self, replace):
+        """
+        Collect exited workers, optionally starting replacements
+        """
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            worker_id = self.children.pop(pid, None)
+            if worker_id is None:
+                continue
+
+            # Its snapshot no longer describes a running process
+            try:
+                os.remove(os.path.join(self.state_dir, f"worker-{worker_id}.json"))
+            except FileNotFoundError:
+                pass
+
+            if replace and not self.stopping:
+                logging.warning(f"Worker {worker_id} with pid {pid} exited with status {status}, replacing it")
+                self._spawn(worker_id)
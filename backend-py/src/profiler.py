@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import threading
+from collections import Counter
+
+from src.models.baseModel import BaseModel
+from src.models.modelConfig import parse_bool
+from src.requestContext import get_request_context
+
+# Deepest stack recorded per sample, deeper frames are cut at the root side
+MAX_DEPTH = 128
+
+# Methods through which the ModelManager calls into a model
+MODEL_METHODS = {"process", "process_sync", "stream", "process_batch", "process_batch_sync"}
+
+class SamplingProfiler:
+    """
+    Statistical profiler that samples the stacks of the process on demand.
+
+    A CPU-time interval timer (SIGPROF) interrupts the process every
+    `interval_ms` of CPU time while a profile runs, and nothing is installed
+    otherwise. The signal handler runs on the event loop thread, so samples of
+    the loop are attributed to the route and model of the request context of
+    the task that was running. Threads of the thread executor are sampled too
+    and attributed to the model found on their stack. Models run in the
+    process executor are not visible, profile them with MODEL_EXECUTOR=thread.
+    Only the worker process serving the profile request is profiled.
+    """
+
+    def __init__(self):
+        """
+        Initialize the profiler from environment variables
+        """
+        self.enabled = parse_bool(os.environ.get("PROFILER_ENABLED", "false"))
+        self.default_interval_ms = float(os.environ.get("PROFILER_INTERVAL_MS", 5))
+        self.default_seconds = float(os.environ.get("PROFILER_DEFAULT_SECONDS", 10))
+        self.max_seconds = float(os.environ.get("PROFILER_MAX_SECONDS", 300))
+
+        self.active = False
+        self.model_filter = None
+        self.request_limit = None
+        self.requests_seen = 0
+        self.samples = Counter()
+        self.sample_count = 0
+        self.handler_time = 0.0
+        self.done = None
+
+    def _handle_signal(self, signum, frame):
+        if not self.active:
+            return
+        start_time = time.perf_counter()
+
+        context = get_request_context()
+        self._record(
+            frame,
+            context.route if context is not None and context.route else "unattributed",
+            context.model_name.lower() if context is not None and context.model_name else None,
+            require_model=False
+        )
+
+        main_thread = threading.get_ident()
+        for thread_id, thread_frame in sys._current_frames().items():
+            if thread_id != main_thread:
+                # Idle pool threads carry no model and are skipped
+                self._record(thread_frame, "executor", None, require_model=True)
+
+        self.sample_count += 1
+        self.handler_time += time.perf_counter() - start_time
+
+    def _record(self, frame, route, model_name, require_model):
+        codes = []
+        stack_model = None
+        while frame is not None and len(codes) < MAX_DEPTH:
+            code = frame.f_code
+            codes.append(code)
+            if stack_model is None and code.co_name in MODEL_METHODS:
+                instance = frame.f_locals.get("self")
+                if isinstance(instance, BaseModel):
+                    stack_model = instance.get_model_name().lower()
+            frame = frame.f_back
+
+        model_name = model_name or stack_model
+        if model_name is None and require_model:
+            return
+        if self.model_filter is not None and model_name != self.model_filter:
+            return
+
+        codes.reverse()
+        self.samples[(route, model_name or "no-model", tuple(codes))] += 1
+
+    def record_request(self, model_name):
+        """
+        Count a finished model request, ending a profile limited to a number of requests
+
+        Args:
+            model_name (str): Name of the model
+        """
+        if not self.active or self.request_limit is None:
+            return
+        if self.model_filter is not None and model_name.lower() != self.model_filter:
+            return
+
+        self.requests_seen += 1
+        if self.requests_seen >= self.request_limit:
+            self.done.set()
+
+    async def profile(self, seconds=None, requests=None, model_name=None, interval_ms=None):
+        """
+        Sample the process for a number of seconds or until a number of model requests finished
+
+        Args:
+            seconds (float): How long to sample, at most PROFILER_MAX_SECONDS
+            requests (int): Stop once this many model requests finished, None for no limit
+            model_name (str): Only keep samples of this model and only count its requests
+            interval_ms (float): CPU time between samples
+
+        Returns:
+            dict: The samples and a summary of the profile
+
+        Raises:
+            RuntimeError: If the profiler is disabled, already running or not on the main thread
+        """
+        if not self.enabled:
+            raise RuntimeError("Profiler is disabled, set PROFILER_ENABLED=true")
+        if self.active:
+            raise RuntimeError("A profile is already running")
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("Profiling needs the event loop on the main thread")
+
+        interval = max(1.0, interval_ms or self.default_interval_ms) / 1000
+        if seconds is None:
+            seconds = self.max_seconds if requests else self.default_seconds
+        seconds = min(seconds, self.max_seconds)
+
+        self.model_filter = model_name.lower() if model_name else None
+        self.request_limit = requests
+        self.requests_seen = 0
+        self.samples = Counter()
+        self.sample_count = 0
+        self.handler_time = 0.0
+        self.done = asyncio.Event()
+
+        previous_handler = signal.signal(signal.SIGPROF, self._handle_signal)
+        start_time = time.perf_counter()
+        self.active = True
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+        logging.info(f"Profiling for up to {seconds}s every {interval * 1000}ms")
+        try:
+            try:
+                await asyncio.wait_for(self.done.wait(), seconds)
+            except TimeoutError:
+                pass
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            self.active = False
+            signal.signal(signal.SIGPROF, previous_handler)
+
+        elapsed = time.perf_counter() - start_time
+        logging.info(f"Profile finished after {round(elapsed, 2)}s with {self.sample_count} samples")
+        return {
+            "samples": self.samples,
+            "intervalMs": interval * 1000,
+            "seconds": round(elapsed, 3),
+            "sampleCount": self.sample_count,
+            "requests": self.requests_seen,
+            "model": self.model_filter,
+            "overheadPercent": round(self.handler_time / elapsed * 100, 3) if elapsed > 0 else 0
+        }
+
+def frame_name(code):
+    """
+    Get a readable name of a code object for flame graphs
+
+    Args:
+        code: The code object
+
+    Returns:
+        str: Qualified function name with file and line
+    """
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def to_collapsed(profile):
+    """
+    Format a profile as collapsed stacks, one "frame;frame;... count" line per stack
+
+    The route and the model are the two root frames, so flame graphs split by them.
+
+    Args:
+        profile (dict): Result of SamplingProfiler.profile
+
+    Returns:
+        str: The collapsed stacks, as read by flamegraph.pl, speedscope and others
+    """
+    lines = []
+    for (route, model_name, codes), count in profile["samples"].most_common():
+        frames = [f"route {route}", f"model {model_name}"] + [frame_name(code).replace(";", ",") for code in codes]
+        lines.append(f"{';'.join(frames)} {count}")
+    return "\n".join(lines) + "\n"
+
+def to_speedscope(profile):
+    """
+    Format a profile as a speedscope file with one sampled profile per route and model
+
+    Args:
+        profile (dict): Result of SamplingProfiler.profile
+
+    Returns:
+        dict: The speedscope document
+    """
+    frames = []
+    frame_indexes = {}
+    profiles = {}
+
+    for (route, model_name, codes), count in profile["samples"].items():
+        stack = []
+        for code in codes:
+            index = frame_indexes.get(code)
+            if index is None:
+                index = frame_indexes[code] = len(frames)
+                frames.append({"name": code.co_qualname, "file": code.co_filename, "line": code.co_firstlineno})
+            stack.append(index)
+
+        entry = profiles.setdefault((route, model_name), {"samples": [], "weights": []})
+        entry["samples"].append(stack)
+        entry["weights"].append(count * profile["intervalMs"])
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"backend-py profile of {profile['seconds']}s",
+        "exporter": "backend-py",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": f"{model_name} {route}",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(entry["weights"]),
+                "samples": entry["samples"],
+                "weights": entry["weights"]
+            }
+            for (route, model_name), entry in sorted(profiles.items(), key=lambda item: -sum(item[1]["weights"]))
+        ]
+    }
+
+# Create a singleton instance
+profiler = SamplingProfiler()
@@ -0,0 +1,232 @@
+import os
+import time
+import asyncio
+import logging
+import contextvars
+
+from src.metrics import REQUESTS_ABANDONED, WORK_SAVED
+from src.models.errors import DeadlineExceededError, ClientDisconnectedError
+
+# Headers and body fields carrying the deadline. The timeout is relative to when
+# the request arrives, the deadline is an absolute Unix time in milliseconds.
+TIMEOUT_HEADER = "x-request-timeout-ms"
+DEADLINE_HEADER = "x-request-deadline"
+TIMEOUT_FIELD = "timeoutMs"
+DEADLINE_FIELD = "deadline"
+
+DEFAULT_TIMEOUT_MS = float(os.environ.get("REQUEST_DEFAULT_TIMEOUT_MS", 0))
+MAX_TIMEOUT_MS = float(os.environ.get("REQUEST_MAX_TIMEOUT_MS", 0))
+
+_current_context = contextvars.ContextVar("request_context", default=None)
+
+class RequestContext:
+    """
+    Per-request information passed down to the models.
+
+    Set for the duration of a model call and read with get_request_context().
+    Long running models can call check() between steps to stop early once the
+    request is no longer wanted.
+    """
+
+    __slots__ = ("model_name", "deadline", "start_time", "cancelled", "route")
+
+    def __init__(self, model_name=None, deadline=None, route=None):
+        """
+        Args:
+            model_name (str): Name of the requested model
+            deadline (float): Deadline on the time.monotonic() clock, None for no deadline
+            route (str): Route template the request came in on, e.g. for profiles
+        """
+        self.model_name = model_name
+        self.deadline = deadline
+        self.route = route
+        self.start_time = time.monotonic()
+        self.cancelled = False
+
+    @classmethod
+    def from_request(cls, headers, request_data, route=None):
+        """
+        Build the context of a request from its headers and JSON body
+
+        Args:
+            headers: Request headers
+            request_data (dict): Request body
+            route (str): Route template the request came in on
+
+        Returns:
+            RequestContext: The context
+        """
+        timeout_ms = None
+        deadline_ms = None
+        try:
+            if headers.get(TIMEOUT_HEADER) is not None:
+                timeout_ms = float(headers[TIMEOUT_HEADER])
+            elif request_data.get(TIMEOUT_FIELD) is not None:
+                timeout_ms = float(request_data[TIMEOUT_FIELD])
+
+            if headers.get(DEADLINE_HEADER) is not None:
+                deadline_ms = float(headers[DEADLINE_HEADER])
+            elif request_data.get(DEADLINE_FIELD) is not None:
+                deadline_ms = float(request_data[DEADLINE_FIELD])
+        except (TypeError, ValueError):
+            logging.warning("Ignoring invalid request timeout or deadline")
+
+        if deadline_ms is not None:
+            remaining_ms = deadline_ms - time.time() * 1000
+            timeout_ms = remaining_ms if timeout_ms is None else min(timeout_ms, remaining_ms)
+        if timeout_ms is None and DEFAULT_TIMEOUT_MS > 0:
+            timeout_ms = DEFAULT_TIMEOUT_MS
+        if timeout_ms is not None and MAX_TIMEOUT_MS > 0:
+            timeout_ms = min(timeout_ms, MAX_TIMEOUT_MS)
+
+        context = cls(request_data.get("modelName"), route=route)
+        if timeout_ms is not None:
+            context.deadline = context.start_time + timeout_ms / 1000
+        return context
+
+    def remaining(self):
+        """
+        Get the time left until the deadline
+
+        Returns:
+            float: Seconds, may be negative, None if there is no deadline
+        """
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def expired(self):
+        """
+        Whether the deadline has passed
+
+        Returns:
+            bool: True if the deadline has passed
+        """
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check(self):
+        """
+        Stop the calling model if the request is no longer wanted
+
+        Raises:
+            DeadlineExceededError: If the deadline has passed
+            ClientDisconnectedError: If the request was cancelled
+        """
+        if self.cancelled:
+            raise ClientDisconnectedError("Request was cancelled")
+        if self.expired():
+            raise DeadlineExceededError("Request deadline exceeded")
+
+def get_request_context():
+    """
+    Get the context of the request being processed
+
+    Available in async model code and in code started from it with
+    asyncio.to_thread. Synchronous models running in the executor pool do not
+    see it.
+
+    Returns:
+        RequestContext: The context, None outside of a request
+    """
+    return _current_context.get()
+
+def set_request_context(context):
+    """
+    Make a context the request context of the current task and the tasks it starts
+
+    Args:
+        context (RequestContext): The context
+    """
+    _current_context.set(context)
+
+def record_abandoned(model_name, reason, estimated_seconds):
+    """
+    Count a request whose work was dropped or cut short
+
+    Args:
+        model_name (str): Name of the model
+        reason (str): expired, deadline or disconnected
+        estimated_seconds (float): Model time estimated to be saved
+    """
+    model_name = (model_name or "unknown").lower()
+    REQUESTS_ABANDONED.labels(model_name, reason).inc()
+    if estimated_seconds > 0:
+        WORK_SAVED.labels(model_name, reason).inc(estimated_seconds)
+
+async def wait_for_disconnect(request):
+    """
+    Wait until the client of a request disconnects
+
+    Args:
+        request (Request): The incoming request
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def run_in_context(request, context, work, average_service_time=0.0):
+    """
+    Run the work of a request, cancelling it when the request is no longer wanted
+
+    Requests whose deadline has already passed are dropped without starting.
+    Running work is cancelled once the deadline passes or the client
+    disconnects.
+
+    Args:
+        request (Request): The incoming request, None when the caller watches for disconnects itself
+        context (RequestContext): The context of the request
+        work (callable): Coroutine function doing the work
+        average_service_time (float): Typical seconds the work takes, to estimate the time saved
+
+    Returns:
+        The result of the work
+
+    Raises:
+        DeadlineExceededError: If the deadline passed first
+        ClientDisconnectedError: If the client disconnected first
+    """
+    if context.expired():
+        record_abandoned(context.model_name, "expired", average_service_time)
+        raise DeadlineExceededError("Request deadline passed before it started")
+
+    token = _current_context.set(context)
+    try:
+        # The task copies the context, so the model sees the request context
+        task = asyncio.ensure_future(work())
+    finally:
+        _current_context.reset(token)
+
+    disconnect = asyncio.ensure_future(wait_for_disconnect(request)) if request is not None else None
+    try:
+        remaining = context.remaining()
+        try:
+            await asyncio.wait(
+                {task, disconnect} if disconnect is not None else {task},
+                timeout=max(0.0, remaining) if remaining is not None else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+        if task.done():
+            try:
+                return task.result()
+            except DeadlineExceededError:
+                # The model stopped itself after calling check()
+                record_abandoned(context.model_name, "deadline", average_service_time - (time.monotonic() - context.start_time))
+                raise
+
+        context.cancelled = True
+        task.cancel()
+        await asyncio.wait({task})
+
+        elapsed = time.monotonic() - context.start_time
+        reason = "disconnected" if disconnect is not None and disconnect.done() else "deadline"
+        record_abandoned(context.model_name, reason, average_service_time - elapsed)
+
+        if reason == "disconnected":
+            raise ClientDisconnectedError("Client disconnected")
+        raise DeadlineExceededError("Request deadline exceeded")
+    finally:
+        if disconnect is not None:
+            disconnect.cancel()
@@ -0,0 +1,320 @@
+import os
+import time
+import asyncio
+import logging
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+
+from src.jsonCodec import json_codec
+from src.models.baseModel import ModelType
+from src.models.errors import ModelOverloadedError
+from src.middlewares.logShipper import log_shipper
+
+# Create a router instance
+router = APIRouter()
+
+# Reference to model manager (to be set in setup)
+model_manager = None
+
+DEFAULT_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 8))
+MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 64))
+MAX_RETRIES = int(os.environ.get("BATCH_MAX_RETRIES", 3))
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    Streaming response that can be sent while the request body is still arriving
+
+    StreamingResponse normally reads from the client while streaming to notice
+    disconnects, which would take body chunks away from the route. Listening
+    only starts once the upload has been read completely. Until then a client
+    disconnect surfaces through the body reader itself.
+    """
+
+    def __init__(self, content, upload_done, **kwargs):
+        """
+        Args:
+            content: The body iterator
+            upload_done (asyncio.Event): Set once the request body has been read
+        """
+        super().__init__(content, **kwargs)
+        self.upload_done = upload_done
+
+    async def listen_for_disconnect(self, receive):
+        await self.upload_done.wait()
+        await super().listen_for_disconnect(receive)
+
+async def load_json_inputs(request):
+    """
+    Read the inputs of a JSON batch: an array of inputs, or an object with an
+    "inputs" array and an optional batch-level "modelName"
+
+    Args:
+        request (Request): The incoming request
+
+    Returns:
+        list: Tuples of the input, or None, and an error message, or None
+    """
+    try:
+        body = json_codec.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Request body must be valid JSON")
+
+    model_name = request.query_params.get("modelName")
+    if isinstance(body, dict):
+        model_name = body.get("modelName", model_name)
+        body = body.get("inputs")
+
+    if not isinstance(body, list):
+        raise HTTPException(status_code=422, detail="Request body must be an array of inputs or an object with an inputs array")
+
+    return [with_model_name(item, model_name) for item in body]
+
+async def iter_loaded_inputs(items):
+    for item in items:
+        yield item
+
+async def iter_ndjson_inputs(request):
+    """
+    Read the inputs of an NDJSON upload as the lines arrive
+
+    Args:
+        request (Request): The incoming request
+
+    Yields:
+        tuple: The input, or None, and an error message, or None
+    """
+    model_name = request.query_params.get("modelName")
+    buffer = b""
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield parse_ndjson_line(line, model_name)
+
+    if buffer.strip():
+        yield parse_ndjson_line(buffer, model_name)
+
+def parse_ndjson_line(line, model_name):
+    try:
+        return with_model_name(json_codec.loads(line), model_name)
+    except ValueError:
+        return None, "Line is not valid JSON"
+
+def with_model_name(item, model_name):
+    """
+    Fill in the batch-level model name of an input that does not name one
+
+    Returns:
+        tuple: The input, or None, and an error message, or None
+    """
+    if not isinstance(item, dict):
+        return None, "Input must be a JSON object"
+
+    if model_name and not item.get("modelName"):
+        item = {**item, "modelName": model_name}
+
+    return item, None
+
+async def process_item(model_type, input_data):
+    """
+    Run one input of a batch, retrying while the model is overloaded
+
+    Args:
+        model_type (ModelType): Type of model the batch endpoint serves
+        input_data (dict): The input
+
+    Returns:
+        tuple: Output, or None, error message, or None, and HTTP status for the item
+    """
+    model_name = input_data.get("modelName")
+    if not isinstance(model_name, str) or not model_name:
+        return None, "Missing model name", 400
+
+    model_result = model_manager.get_model_by_name(model_name)
+    if not model_result["success"]:
+        return None, model_result["error"], 400
+
+    model = model_result["model"]
+    if model.get_model_type() != model_type:
+        return None, f"Model {model.get_model_name()} is not a {model_type.value.lower()} model", 400
+
+    attempt = 0
+    while True:
+        try:
+            return await model_manager.process(model, input_data), None, 200
+        except ModelOverloadedError as e:
+            if attempt >= MAX_RETRIES:
+                return None, str(e), e.status_code
+            attempt += 1
+            await asyncio.sleep(e.retry_after)
+        except Exception:
+            logging.exception("Error processing batch item")
+            return None, "Error processing your request.", 500
+
+def stream_batch(model_type, inputs, ordered, concurrency):
+    """
+    Process the inputs of a batch with bounded concurrency and stream the results as NDJSON
+
+    Every line is an event: {"type": "result", "index": ..., "data": ...} or
+    {"type": "error", "index": ..., "error": ..., "status": ...} per input,
+    followed by {"type": "done", "total": ..., "failed": ..., "totalMs": ...}.
+    In ordered mode results come in input order, otherwise as they complete.
+    At most `concurrency` inputs are running or waiting to be sent at a time.
+
+    Args:
+        model_type (ModelType): Type of model the batch endpoint serves
+        inputs: Async iterator of (input, error) tuples
+        ordered (bool): Whether to keep the input order
+        concurrency (int): Maximum number of inputs being worked on
+
+    Returns:
+        UploadStreamingResponse: The NDJSON stream
+    """
+    upload_done = asyncio.Event()
+    endpoint = f"/api/process/{model_type.value.lower()}"
+
+    async def run_item(index, input_data, error, results):
+        start_time = time.time()
+        status = 400
+        output = None
+        if error is None:
+            output, error, status = await process_item(model_type, input_data)
+
+        if error is None:
+            event = {"type": "result", "index": index, "data": output}
+        else:
+            event = {"type": "error", "index": index, "error": error, "status": status}
+
+        log_shipper.enqueue({
+            "timestamp": int(start_time * 1000),
+            "endpoint": endpoint,
+            "input": input_data,
+            "model": input_data.get("modelName") if input_data else None,
+            "output": output if error is None else {"error": error},
+            "status": status,
+            "responseTimeMs": round((time.time() - start_time) * 1000, 2)
+        })
+        await results.put((index, event))
+
+    async def feed(slots, results, tasks):
+        count = 0
+        try:
+            async for input_data, error in inputs:
+                await slots.acquire()
+                task = asyncio.create_task(run_item(count, input_data, error, results))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                count += 1
+        except ClientDisconnect:
+            count = None
+        finally:
+            upload_done.set()
+        await results.put((None, count))
+
+    async def generate():
+        start_time = time.perf_counter()
+        slots = asyncio.Semaphore(concurrency)
+        results = asyncio.Queue()
+        tasks = set()
+        feeder = asyncio.create_task(feed(slots, results, tasks))
+
+        pending = {}
+        next_index = 0
+        sent = 0
+        failed = 0
+        total = -1
+        try:
+            while total < 0 or sent < total:
+                index, event = await results.get()
+
+                if index is None:
+                    if event is None:
+                        # Client went away during the upload
+                        return
+                    total = event
+                    continue
+
+                ready = [event]
+                if ordered:
+                    pending[index] = event
+                    ready = []
+                    while next_index in pending:
+                        ready.append(pending.pop(next_index))
+                        next_index += 1
+
+                for item in ready:
+                    sent += 1
+                    failed += item["type"] == "error"
+                    slots.release()
+                    yield json_codec.dumps_line(item)
+
+            yield json_codec.dumps_line({
+                "type": "done",
+                "total": total,
+                "failed": failed,
+                "totalMs": round((time.perf_counter() - start_time) * 1000, 2)
+            })
+        finally:
+            feeder.cancel()
+            running = list(tasks)
+            for task in running:
+                task.cancel()
+            await asyncio.gather(feeder, *running, return_exceptions=True)
+
+    return UploadStreamingResponse(generate(), upload_done, media_type="application/x-ndjson")
+
+@router.post("/api/process/{model_type}/batch")
+async def process_batch(model_type: str, request: Request):
+    """
+    Run many inputs through models of one type in a single request
+
+    The body is either a JSON array of inputs, a JSON object with an "inputs"
+    array, or an NDJSON upload with one input per line, which is processed while
+    it is still arriving. Inputs without a modelName use the batch-level one from
+    the body or the modelName query parameter. The ordered query parameter
+    (default true) selects input order or completion order for the results, and
+    concurrency limits how many inputs are worked on at once.
+
+    Args:
+        model_type (str): Type of the models, e.g. chat or summarize
+        request (Request): The incoming request
+
+    Returns:
+        UploadStreamingResponse: NDJSON stream with one event per input
+    """
+    try:
+        model_type = ModelType(model_type.upper())
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"Unknown model type: {model_type}")
+
+    ordered = request.query_params.get("ordered", "true").lower() not in ("false", "0", "no")
+    try:
+        concurrency = int(request.query_params.get("concurrency", DEFAULT_CONCURRENCY))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="concurrency must be an integer")
+    concurrency = min(max(1, concurrency), MAX_CONCURRENCY)
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        inputs = iter_ndjson_inputs(request)
+    else:
+        inputs = iter_loaded_inputs(await load_json_inputs(request))
+
+    return stream_batch(model_type, inputs, ordered, concurrency)
+
+def setup_routes(app, manager):
+    """
+    Setup batch routes for the application
+
+    Args:
+        app: The FastAPI application
+        manager: The ModelManager instance
+    """
+    global model_manager
+    model_manager = manager
+    app.include_router(router)
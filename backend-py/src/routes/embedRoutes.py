@@ -0,0 +1,274 @@
+import os
+import asyncio
+import logging
+from fastapi import APIRouter, Request, Depends
+from typing import Dict, Any
+
+from src.models.baseModel import ModelType
+from src.models.modelConfig import get_model_setting
+from src.models.vectorIndex import vector_store
+from src.models.errors import ModelOverloadedError, DeadlineExceededError, ClientDisconnectedError
+from src.middlewares.metrics import get_route_label
+from src.middlewares.requestBody import get_json_body
+from src.requestContext import RequestContext, run_in_context
+from src.routes.modelRoutes import json_response, overloaded_response
+
+# Create a router instance
+router = APIRouter()
+
+# Reference to model manager (to be set in setup)
+model_manager = None
+
+MAX_TEXTS = int(os.environ.get("EMBED_MAX_TEXTS", 256))
+DEFAULT_TOP_K = int(os.environ.get("SEARCH_DEFAULT_TOP_K", 10))
+MAX_TOP_K = int(os.environ.get("SEARCH_MAX_TOP_K", 1000))
+
+class RequestError(Exception):
+    """
+    Invalid request, answered with its status code and message
+    """
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def get_text_list(request_data, list_field, single_field):
+    """
+    Get the texts of a request, given as a list or as one text
+
+    Args:
+        request_data (dict): Request body
+        list_field (str): Field holding a list of texts
+        single_field (str): Field holding one text
+
+    Returns:
+        list: The texts
+
+    Raises:
+        RequestError: If the texts are missing, not strings or too many
+    """
+    texts = request_data.get(list_field)
+    if texts is None and request_data.get(single_field) is not None:
+        texts = [request_data[single_field]]
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+        raise RequestError(f"Request must contain {list_field}, a non-empty array of strings, or {single_field}")
+    if len(texts) > MAX_TEXTS:
+        raise RequestError(f"At most {MAX_TEXTS} texts can be sent in one request")
+    return texts
+
+def get_embedding_model(model_name):
+    """
+    Get an embedding model by name
+
+    Raises:
+        RequestError: If the model is missing, unknown or not an embedding model
+    """
+    if not model_name:
+        raise RequestError("Missing model name")
+    model_result = model_manager.get_model_by_name(model_name)
+    if not model_result["success"]:
+        raise RequestError(model_result["error"])
+    model = model_result["model"]
+    if model.get_model_type() != ModelType.EMBED:
+        raise RequestError(f"Model {model.get_model_name()} is not an embed model")
+    return model
+
+def get_model_version(model):
+    return get_model_setting(type(model), model.get_model_name(), "MODEL_VERSION", str)
+
+def check_collection_model(collection, model):
+    """
+    Make sure a collection holds vectors of the model
+
+    Raises:
+        RequestError: 409 if the collection was built with another model or version
+    """
+    if collection.model_name != model.get_model_name() or collection.model_version != get_model_version(model):
+        raise RequestError(
+            f"Collection {collection.name} holds vectors of model {collection.model_name} "
+            f"version {collection.model_version}",
+            status_code=409
+        )
+
+async def embed_texts(request, model, request_data, texts):
+    """
+    Run texts through an embedding model within the request's deadline
+
+    Only the model name and the texts are sent to the model, so responses are
+    cached by text whatever else the request contains.
+
+    Args:
+        request (Request): The incoming request
+        model (BaseModel): The embedding model
+        request_data (dict): Request body, read for the deadline
+        texts (list): The texts
+
+    Returns:
+        list: One embedding per text
+    """
+    context = RequestContext.from_request(request.headers, request_data, get_route_label(request.scope))
+    output = await run_in_context(
+        request,
+        context,
+        lambda: model_manager.process(model, {"modelName": model.get_model_name(), "texts": texts}),
+        model_manager.get_average_service_time(model.get_model_name())
+    )
+    embeddings = output.get("embeddings") if isinstance(output, dict) else None
+    if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+        raise ValueError(f"Model {model.get_model_name()} did not return one embedding per text")
+    return embeddings
+
+async def handle(request, work):
+    """
+    Run the work of an endpoint and turn its errors into responses
+
+    Args:
+        request (Request): The incoming request
+        work (callable): Coroutine function returning the response body
+
+    Returns:
+        Response: The encoded response
+    """
+    try:
+        return json_response(request, await work())
+    except RequestError as e:
+        return json_response(request, {"error": str(e)}, status_code=e.status_code)
+    except ModelOverloadedError as e:
+        return overloaded_response(request, e, {"error": str(e)})
+    except (DeadlineExceededError, ClientDisconnectedError) as e:
+        return json_response(request, {"error": str(e)}, status_code=e.status_code)
+    except Exception:
+        logging.exception("Error processing embedding request")
+        return json_response(request, {"error": "Error processing your request."}, status_code=500)
+
+@router.post("/api/process/embed")
+async def process_embed(request: Request, request_data: Dict[str, Any] = Depends(get_json_body)):
+    """
+    Embeds texts with a given model, optionally adding them to a collection
+
+    With a collection name the vectors are appended to that collection, which
+    is created for the model on first use. ids and metadata, one per text,
+    are stored with the vectors; by default the id is the position in the
+    collection and the metadata holds the text. Embeddings are then only
+    returned when returnEmbeddings is true.
+
+    Args:
+        request (Request): The incoming request
+        request_data (dict): Request body containing modelName, texts or text, and optionally collection, ids and metadata
+
+    Returns:
+        Response: embeddings and dimensions, and the collection and ids when added to one
+    """
+    async def work():
+        texts = get_text_list(request_data, "texts", "text")
+        model = get_embedding_model(request_data.get("modelName"))
+
+        collection_name = request_data.get("collection")
+        ids = request_data.get("ids")
+        metadata = request_data.get("metadata")
+        if collection_name is not None:
+            if ids is not None and (not isinstance(ids, list) or len(ids) != len(texts)):
+                raise RequestError("ids must be an array with one id per text")
+            if metadata is not None and (not isinstance(metadata, list) or len(metadata) != len(texts)):
+                raise RequestError("metadata must be an array with one entry per text")
+            collection = await vector_store.get(collection_name)
+            if collection is not None:
+                check_collection_model(collection, model)
+
+        embeddings = await embed_texts(request, model, request_data, texts)
+        response = {"model": model.get_model_name(), "dimensions": len(embeddings[0])}
+        if collection_name is None:
+            response["embeddings"] = embeddings
+            return response
+
+        try:
+            collection = await vector_store.get_or_create(
+                collection_name, len(embeddings[0]), model.get_model_name(), get_model_version(model)
+            )
+        except ValueError as e:
+            raise RequestError(str(e))
+        check_collection_model(collection, model)
+
+        items = [
+            {
+                "id": ids[index] if ids is not None else None,
+                "metadata": metadata[index] if metadata is not None else {"text": text}
+            }
+            for index, text in enumerate(texts)
+        ]
+        try:
+            response["ids"] = await asyncio.to_thread(collection.add, embeddings, items)
+        except ValueError as e:
+            raise RequestError(str(e), status_code=409)
+        response["collection"] = collection_name
+        if request_data.get("returnEmbeddings"):
+            response["embeddings"] = embeddings
+        return response
+
+    return await handle(request, work)
+
+@router.post("/api/process/search")
+async def process_search(request: Request, request_data: Dict[str, Any] = Depends(get_json_body)):
+    """
+    Finds the items of a collection most similar to one or more query texts
+
+    The queries are embedded with the model the collection was built with,
+    modelName may be left out. Partitioned collections score the lists of the
+    nprobe nearest centroids, exact: true scores every vector instead.
+
+    Args:
+        request (Request): The incoming request
+        request_data (dict): Request body containing collection, query or queries, and optionally topK, nprobe and exact
+
+    Returns:
+        Response: matches for a single query, or results with the matches of each query
+    """
+    async def work():
+        collection_name = request_data.get("collection")
+        if not collection_name:
+            raise RequestError("Missing collection name")
+        collection = await vector_store.get(collection_name)
+        if collection is None:
+            raise RequestError(f"Unknown collection: {collection_name}", status_code=404)
+
+        queries = get_text_list(request_data, "queries", "query")
+        try:
+            top_k = int(request_data.get("topK", DEFAULT_TOP_K))
+            nprobe = int(request_data["nprobe"]) if request_data.get("nprobe") is not None else None
+        except (TypeError, ValueError):
+            raise RequestError("topK and nprobe must be integers")
+        if not 1 <= top_k <= MAX_TOP_K:
+            raise RequestError(f"topK must be between 1 and {MAX_TOP_K}")
+        if nprobe is not None:
+            lists = len(collection.centroids) if collection.centroids is not None else None
+            if lists is None and nprobe < 1:
+                raise RequestError("nprobe must be at least 1")
+            if lists is not None and not 1 <= nprobe <= lists:
+                raise RequestError(f"nprobe must be between 1 and {lists}, the number of lists of collection {collection_name}")
+
+        model = get_embedding_model(request_data.get("modelName") or collection.model_name)
+        check_collection_model(collection, model)
+
+        embeddings = await embed_texts(request, model, request_data, queries)
+        results = await asyncio.to_thread(collection.find, embeddings, top_k, nprobe, bool(request_data.get("exact")))
+
+        response = {"collection": collection_name, "model": collection.model_name}
+        if request_data.get("queries") is None:
+            response["matches"] = results[0]
+        else:
+            response["results"] = results
+        return response
+
+    return await handle(request, work)
+
+def setup_routes(app, manager):
+    """
+    Setup embedding and search routes for the application
+
+    Args:
+        app: The FastAPI application
+        manager: The ModelManager instance
+    """
+    global model_manager
+    model_manager = manager
+    app.include_router(router)
@@ -1,28 +1,45 @@
 from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
 from datetime import datetime
 
 # Create a router instance
 router = APIRouter()
 
+# Reference to model manager (to be set in setup)
+model_manager = None
+
 @router.get("/health")
 async def health_check():
     """
     Health check endpoint
     
+    Responds with 503 until the preloaded models are warm, so health checks
+    only pass once the service can serve the models it advertises.
+    
     Returns:
-        dict: Response with status and timestamp
+        dict: Response with status, readiness and timestamp
     """
-    return {
-        "status": "ok",
+    ready = model_manager.ready
+    content = {
+        "status": "ok" if ready else "starting",
+        "ready": ready,
         "timestamp": datetime.now().isoformat()
     }
+    
+    if not ready:
+        return JSONResponse(status_code=503, content=content)
+    
+    return content
 
-def setup_routes(app):
+def setup_routes(app, manager):
     """
     Setup health routes for the application
     
     Args:
         app: The FastAPI application
+        manager: The ModelManager instance
     """
+    global model_manager
+    model_manager = manager
     app.include_router(router)
 
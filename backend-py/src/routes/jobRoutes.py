@@ -0,0 +1,164 @@
+import os
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import JSONResponse
+from typing import Dict, Any
+
+from src.models.baseModel import ModelType
+from src.models.errors import ModelOverloadedError
+from src.models.jobQueue import QUEUED, RUNNING, SUCCEEDED, CANCELLED
+from src.middlewares.requestBody import get_json_body
+
+# Create a router instance
+router = APIRouter()
+
+# Reference to job queue (to be set in setup)
+job_queue = None
+
+MAX_WAIT_SECONDS = float(os.environ.get("JOB_MAX_WAIT_SECONDS", 60))
+
+def job_status(job):
+    """
+    Get the public view of a job, without its input and result
+
+    Args:
+        job (dict): The job record
+
+    Returns:
+        dict: Id, model, status and timestamps of the job
+    """
+    return {
+        "jobId": job["id"],
+        "type": job["type"],
+        "model": job["model"],
+        "priority": job["priority"],
+        "status": job["status"],
+        "error": job["error"],
+        "createdAt": job["createdAt"],
+        "startedAt": job["startedAt"],
+        "finishedAt": job["finishedAt"],
+        "statusUrl": f"/api/jobs/{job['id']}",
+        "resultUrl": f"/api/jobs/{job['id']}/result"
+    }
+
+async def find_job(job_id, wait):
+    """
+    Get a job, waiting up to `wait` seconds for it to finish
+
+    Raises:
+        HTTPException: 404 if the job does not exist
+    """
+    job = await job_queue.wait(job_id, min(max(0.0, wait), MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@router.post("/api/jobs/{model_type}")
+async def submit_job(model_type: str, priority: int = 0, request_data: Dict[str, Any] = Depends(get_json_body)):
+    """
+    Queue a model request as a job instead of waiting for the model
+
+    The body is the same as for /api/process/{model_type}.
+
+    Args:
+        model_type (str): Type of the model, e.g. chat, summarize or generate_image
+        priority (int): Higher priorities run first
+        request_data (dict): Request body containing modelName and other data
+
+    Returns:
+        JSONResponse: 202 with the job status and where to poll it
+    """
+    try:
+        model_type = ModelType(model_type.upper())
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"Unknown model type: {model_type}")
+
+    try:
+        job = await job_queue.submit(model_type, request_data, priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelOverloadedError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"error": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    status = job_status(job)
+    return JSONResponse(status_code=202, content=status, headers={"Location": status["statusUrl"]})
+
+@router.get("/api/jobs")
+async def get_job_stats():
+    """
+    Get job queue statistics
+
+    Returns:
+        dict: Per-model queue depths and worker counts and job counters
+    """
+    return job_queue.get_stats()
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """
+    Get the status of a job
+
+    Args:
+        job_id (str): Id of the job
+        wait (float): Seconds to wait for the job to finish before answering, for long polling
+
+    Returns:
+        dict: The job status
+    """
+    return job_status(await find_job(job_id, wait))
+
+@router.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, wait: float = 0):
+    """
+    Get the result of a job
+
+    Args:
+        job_id (str): Id of the job
+        wait (float): Seconds to wait for the job to finish before answering
+
+    Returns:
+        The model output once the job succeeded, 202 with the status while it
+        is queued or running, 409 if it was cancelled and 500 if it failed
+    """
+    job = await find_job(job_id, wait)
+
+    if job["status"] == SUCCEEDED:
+        return job["result"]
+    if job["status"] in (QUEUED, RUNNING):
+        return JSONResponse(status_code=202, content=job_status(job))
+    if job["status"] == CANCELLED:
+        return JSONResponse(status_code=409, content=job_status(job))
+    return JSONResponse(status_code=500, content=job_status(job))
+
+@router.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job
+
+    Args:
+        job_id (str): Id of the job
+
+    Returns:
+        JSONResponse: The job status after cancelling, 202 if the job has not stopped yet
+    """
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if job["status"] in (QUEUED, RUNNING):
+        return JSONResponse(status_code=202, content=job_status(job))
+    return job_status(job)
+
+def setup_routes(app, queue):
+    """
+    Setup job routes for the application
+
+    Args:
+        app: The FastAPI application
+        queue: The JobQueue instance
+    """
+    global job_queue
+    job_queue = queue
+    app.include_router(router)
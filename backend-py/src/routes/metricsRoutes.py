@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.workerState import worker_state
+
+# Create a router instance
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Get metrics in the Prometheus text format
+    
+    Returns:
+        PlainTextResponse: Request, model, JSON codec, event loop and GC metrics,
+        added up over all workers of the node
+    """
+    return PlainTextResponse(worker_state.render_metrics(), media_type="text/plain; version=0.0.4")
+
+def setup_routes(app):
+    """
+    Setup metrics routes for the application
+    
+    Args:
+        app: The FastAPI application
+    """
+    app.include_router(router)
@@ -1,22 +1,99 @@
-from fastapi import APIRouter, Request, HTTPException, Body
+import time
+import asyncio
+import logging
+from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.responses import Response, StreamingResponse
 from typing import Dict, Any, List
 
+from src.jsonCodec import json_codec
+from src.metrics import JSON_ENCODE_DURATION
+from src.models.errors import ModelOverloadedError, DeadlineExceededError, ClientDisconnectedError
+from src.middlewares.metrics import get_route_label
+from src.middlewares.requestBody import get_json_body, set_json_response
+from src.requestContext import RequestContext, run_in_context, set_request_context, record_abandoned, wait_for_disconnect
+
 # Create a router instance
 router = APIRouter()
 
 # Reference to model manager (to be set in setup)
 model_manager = None
 
+def json_response(request, content, status_code=200, headers=None):
+    """
+    Encode a JSON response with the fast codec, bypassing FastAPI's encoder
+    
+    The content is left on the request scope so the logger middleware does not
+    have to parse the encoded body again.
+    
+    Args:
+        request (Request): The incoming request
+        content: Response body
+        status_code (int): HTTP status code
+        headers (dict): Extra response headers
+        
+    Returns:
+        Response: The pre-encoded response
+    """
+    start_time = time.perf_counter()
+    body = json_codec.dumps(content)
+    JSON_ENCODE_DURATION.labels(get_route_label(request.scope)).observe(time.perf_counter() - start_time)
+    set_json_response(request.scope, content)
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+
+def overloaded_response(request, error, content):
+    """
+    Build a 429 or 503 response for a model that cannot take more work
+    
+    Args:
+        request (Request): The incoming request
+        error (ModelOverloadedError): The raised error
+        content (dict): Response body in the shape of the endpoint
+        
+    Returns:
+        Response: Response with a Retry-After header
+    """
+    return json_response(
+        request,
+        content,
+        status_code=error.status_code,
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+async def process_request(request, model, request_data):
+    """
+    Run a request through a model within the request's deadline
+    
+    The deadline comes from the X-Request-Timeout-Ms or X-Request-Deadline
+    header or the timeoutMs or deadline field of the body. The model call is
+    cancelled when the deadline passes or the client disconnects.
+    
+    Args:
+        request (Request): The incoming request
+        model (BaseModel): The model instance
+        request_data (dict): Request body
+        
+    Returns:
+        dict: Output from the model
+    """
+    context = RequestContext.from_request(request.headers, request_data, get_route_label(request.scope))
+    return await run_in_context(
+        request,
+        context,
+        lambda: model_manager.process(model, request_data),
+        model_manager.get_average_service_time(model.get_model_name())
+    )
+
 @router.post("/api/process/chat")
-async def process_chat(request_data: Dict[str, Any] = Body(...)):
+async def process_chat(request: Request, request_data: Dict[str, Any] = Depends(get_json_body)):
     """
     Prompts a given model with a user message and conversation history
     
     Args:
+        request (Request): The incoming request
         request_data (dict): Request body containing modelName and other data
         
     Returns:
-        dict: Response from the model
+        Response: Response from the model
     """
     try:
         model_name = request_data.get("modelName")
@@ -36,8 +113,20 @@ async def process_chat(request_data: Dict[str, Any] = Body(...)):
                 "error": model_result["error"]
             }
         
-        response = await model_result["model"].process(request_data)
-        return response
+        response = await process_request(request, model_result["model"], request_data)
+        return json_response(request, response)
+    except ModelOverloadedError as e:
+        return overloaded_response(request, e, {
+            "actor": "system",
+            "content": f"Error: {str(e)}",
+            "error": str(e)
+        })
+    except (DeadlineExceededError, ClientDisconnectedError) as e:
+        return json_response(request, {
+            "actor": "system",
+            "content": f"Error: {str(e)}",
+            "error": str(e)
+        }, status_code=e.status_code)
     except Exception as e:
         # Log the error
         import logging
@@ -50,15 +139,16 @@ async def process_chat(request_data: Dict[str, Any] = Body(...)):
         }
 
 @router.post("/api/process/summarize")
-async def process_summarize(request_data: Dict[str, Any] = Body(...)):
+async def process_summarize(request: Request, request_data: Dict[str, Any] = Depends(get_json_body)):
     """
     Prompts a given model with a original text and summarize it
     
     Args:
+        request (Request): The incoming request
         request_data (dict): Request body containing modelName and other data
         
     Returns:
-        dict: Response from the model
+        Response: Response from the model
     """
     try:
         model_name = request_data.get("modelName")
@@ -77,8 +167,18 @@ async def process_summarize(request_data: Dict[str, Any] = Body(...)):
                 "error": model_result["error"]
             }
         
-        response = await model_result["model"].process(request_data)
-        return response
+        response = await process_request(request, model_result["model"], request_data)
+        return json_response(request, response)
+    except ModelOverloadedError as e:
+        return overloaded_response(request, e, {
+            "summary": f"Error: {str(e)}",
+            "error": str(e)
+        })
+    except (DeadlineExceededError, ClientDisconnectedError) as e:
+        return json_response(request, {
+            "summary": f"Error: {str(e)}",
+            "error": str(e)
+        }, status_code=e.status_code)
     except Exception as e:
         # Log the error
         import logging
@@ -88,19 +188,195 @@ async def process_summarize(request_data: Dict[str, Any] = Body(...)):
             "summary": "Error processing your request. Please try again."
         }
 
+def ndjson_line(event, encode_metric=None):
+    """
+    Encode an event as one NDJSON line
+    
+    Args:
+        event (dict): The event
+        encode_metric: Histogram child recording the encoding time, if any
+    """
+    start_time = time.perf_counter()
+    line = json_codec.dumps_line(event)
+    if encode_metric is not None:
+        encode_metric.observe(time.perf_counter() - start_time)
+    return line
+
+def stream_model_response(request, request_data):
+    """
+    Stream the output of the requested model as NDJSON
+    
+    Every line is an event: {"type": "chunk", "data": ...} for each model chunk,
+    followed by {"type": "done", "timeToFirstChunkMs": ..., "totalMs": ...}, or
+    {"type": "error", "error": ...} if the model cannot be used. Generation is
+    cancelled as soon as the client disconnects or the request deadline passes.
+    
+    Args:
+        request (Request): The incoming request
+        request_data (dict): Request body containing modelName and other data
+        
+    Returns:
+        StreamingResponse: The NDJSON stream
+    """
+    async def generate():
+        model_name = request_data.get("modelName")
+        if not model_name:
+            yield ndjson_line({"type": "error", "error": "Missing model name"})
+            return
+        
+        model_result = model_manager.get_model_by_name(model_name)
+        if not model_result["success"]:
+            yield ndjson_line({"type": "error", "error": model_result["error"]})
+            return
+        
+        context = RequestContext.from_request(request.headers, request_data, get_route_label(request.scope))
+        average_service_time = model_manager.get_average_service_time(model_name)
+        if context.expired():
+            record_abandoned(model_name, "expired", average_service_time)
+            yield ndjson_line({"type": "error", "error": "Request deadline passed before it started"})
+            return
+        # This task only serves this response, so the context does not leak to other requests
+        set_request_context(context)
+        
+        encode_metric = JSON_ENCODE_DURATION.labels(get_route_label(request.scope))
+        start_time = time.perf_counter()
+        time_to_first_chunk_ms = None
+        chunks = 0
+        disconnected = False
+        
+        model_stream = model_manager.stream(model_result["model"], request_data)
+        disconnect = asyncio.ensure_future(wait_for_disconnect(request))
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(model_stream.__anext__())
+                remaining = context.remaining()
+                await asyncio.wait(
+                    {next_chunk, disconnect},
+                    timeout=max(0.0, remaining) if remaining is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not next_chunk.done():
+                    # Client went away or the deadline passed, stop generating
+                    context.cancelled = True
+                    next_chunk.cancel()
+                    await asyncio.wait({next_chunk})
+                    saved = average_service_time - (time.perf_counter() - start_time)
+                    if disconnect.done():
+                        disconnected = True
+                        record_abandoned(model_name, "disconnected", saved)
+                        return
+                    record_abandoned(model_name, "deadline", saved)
+                    yield ndjson_line({"type": "error", "error": "Request deadline exceeded"})
+                    return
+                
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                
+                if time_to_first_chunk_ms is None:
+                    time_to_first_chunk_ms = (time.perf_counter() - start_time) * 1000
+                chunks += 1
+                yield ndjson_line({"type": "chunk", "data": chunk}, encode_metric)
+            
+            yield ndjson_line({
+                "type": "done",
+                "timeToFirstChunkMs": round(time_to_first_chunk_ms, 2) if time_to_first_chunk_ms is not None else None,
+                "totalMs": round((time.perf_counter() - start_time) * 1000, 2)
+            })
+        except ModelOverloadedError as e:
+            yield ndjson_line({"type": "error", "error": str(e), "retryAfter": e.retry_after})
+        except Exception:
+            logging.exception("Error streaming prompt")
+            yield ndjson_line({"type": "error", "error": "Error processing your request."})
+        finally:
+            disconnect.cancel()
+            await model_stream.aclose()
+            model_manager.record_stream(model_name, time_to_first_chunk_ms, chunks, disconnected)
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/api/process/chat/stream")
+async def process_chat_stream(request: Request, request_data: Dict[str, Any] = Depends(get_json_body)):
+    """
+    Streaming variant of /api/process/chat
+    
+    Args:
+        request (Request): The incoming request
+        request_data (dict): Request body containing modelName and other data
+        
+    Returns:
+        StreamingResponse: NDJSON stream of response chunks
+    """
+    return stream_model_response(request, request_data)
+
+@router.post("/api/process/summarize/stream")
+async def process_summarize_stream(request: Request, request_data: Dict[str, Any] = Depends(get_json_body)):
+    """
+    Streaming variant of /api/process/summarize
+    
+    Args:
+        request (Request): The incoming request
+        request_data (dict): Request body containing modelName and other data
+        
+    Returns:
+        StreamingResponse: NDJSON stream of summary chunks
+    """
+    return stream_model_response(request, request_data)
+
+def etag_matches(if_none_match, etag):
+    """
+    Check an If-None-Match header against an ETag
+    
+    Args:
+        if_none_match (str): Header value, a list of ETags or *
+        etag (str): Current ETag
+        
+    Returns:
+        bool: True if the client already has the current version
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as for GET requests
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def listing_response(request, listing):
+    """
+    Answer with an encoded model listing, or 304 if the client has it already
+    
+    Args:
+        request (Request): The incoming request
+        listing (tuple): (JSON body, ETag) from the model catalog
+        
+    Returns:
+        Response: 200 with the listing or 304 without a body
+    """
+    body, etag = listing
+    # Clients may keep the listing but must revalidate it, the model set can change at any time
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, headers=headers, media_type="application/json")
+
 @router.get("/api/models")
-async def get_models():
+async def get_models(request: Request):
     """
     Get available models
     
+    The ETag is the catalog version, send it back in If-None-Match to get a
+    304 while the model set is unchanged.
+    
+    Args:
+        request (Request): The incoming request
+        
     Returns:
-        dict: Object containing array of available models
+        Response: Object containing array of available models
     """
     try:
-        available_models = model_manager.get_available_models()
-        return {
-            "availableModels": available_models
-        }
+        return listing_response(request, model_manager.catalog.get_listing())
     except Exception as e:
         # Log the error
         import logging
@@ -112,21 +388,19 @@ async def get_models():
         }
 
 @router.get("/api/models/types/{model_type}")
-async def get_models_by_type(model_type: str):
+async def get_models_by_type(request: Request, model_type: str):
     """
     Get available models by type
     
     Args:
+        request (Request): The incoming request
         model_type (str): Type of models to retrieve
         
     Returns:
-        dict: Object containing array of available models of the specified type
+        Response: Object containing array of available models of the specified type
     """
     try:
-        available_models = model_manager.get_available_models_by_type(model_type)
-        return {
-            "availableModels": available_models
-        }
+        return listing_response(request, model_manager.catalog.get_listing(model_type))
     except Exception as e:
         # Log the error
         import logging
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from typing import Optional
+
+from src.profiler import profiler, to_collapsed, to_speedscope
+
+# Create a router instance
+router = APIRouter()
+
+# Reference to model manager (to be set in setup)
+model_manager = None
+
+FORMATS = ("collapsed", "speedscope")
+
+@router.post("/api/admin/profile")
+async def run_profile(
+    seconds: Optional[float] = None,
+    requests: Optional[int] = None,
+    model: Optional[str] = None,
+    interval_ms: Optional[float] = None,
+    output_format: str = Query("collapsed", alias="format")
+):
+    """
+    Profile this worker and return the samples once the profile is done
+    
+    Samples for `seconds`, or until `requests` model requests finished, only
+    counting and keeping samples of `model` when it is given. Needs
+    PROFILER_ENABLED=true. CPU-bound models run in the process executor are
+    not visible to the profiler and are rejected.
+    
+    Args:
+        seconds (float): How long to sample
+        requests (int): Stop after this many model requests
+        model (str): Only profile this model
+        interval_ms (float): CPU time between samples
+        output_format (str): collapsed for flamegraph.pl-style stacks or speedscope
+        
+    Returns:
+        Response: The profile, with a summary in X-Profile-* headers
+    """
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiler is disabled, set PROFILER_ENABLED=true")
+    if output_format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {output_format}, use one of {', '.join(FORMATS)}")
+    if (seconds is not None and seconds <= 0) or (requests is not None and requests <= 0):
+        raise HTTPException(status_code=400, detail="seconds and requests must be positive")
+    if model is not None and model_manager is not None and model_manager.executor.kind == "process":
+        model_class = model_manager.model_classes.get(model.lower())
+        if model_class is not None and model_class.is_cpu_bound():
+            raise HTTPException(
+                status_code=400,
+                detail=f"Model {model} runs in process executor workers, which are not profiled, profile it with MODEL_EXECUTOR=thread"
+            )
+    
+    try:
+        profile = await profiler.profile(seconds, requests, model, interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    headers = {
+        "X-Profile-Seconds": str(profile["seconds"]),
+        "X-Profile-Samples": str(profile["sampleCount"]),
+        "X-Profile-Requests": str(profile["requests"]),
+        "X-Profile-Overhead-Percent": str(profile["overheadPercent"])
+    }
+    if output_format == "speedscope":
+        return JSONResponse(to_speedscope(profile), headers=headers)
+    return PlainTextResponse(to_collapsed(profile), headers=headers)
+
+def setup_routes(app, manager):
+    """
+    Setup profiler routes for the application
+    
+    Args:
+        app: The FastAPI application
+        manager: The ModelManager instance
+    """
+    global model_manager
+    model_manager = manager
+    app.include_router(router)
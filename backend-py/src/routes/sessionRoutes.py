@@ -0,0 +1,224 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import aclosing
+from fastapi import APIRouter, WebSocket
+
+from src.jsonCodec import json_codec
+from src.metrics import CHAT_SESSION_BYTES
+from src.models.chatSessions import ENDPOINT
+from src.models.errors import ModelOverloadedError, DeadlineExceededError, ClientDisconnectedError
+
+# Create a router instance
+router = APIRouter()
+
+# Reference to chat session manager (to be set in setup)
+chat_sessions = None
+
+# Messages a client may send ahead while a turn is running
+MAX_PENDING_MESSAGES = int(os.environ.get("CHAT_SESSION_MAX_PENDING_MESSAGES", 16))
+
+async def send_event(websocket, event):
+    """
+    Send an event to the client as a JSON text frame
+    
+    Args:
+        websocket (WebSocket): The connection
+        event (dict): The event
+    """
+    body = json_codec.dumps(event)
+    CHAT_SESSION_BYTES.labels("sent").inc(len(body))
+    await websocket.send_text(body.decode("utf-8"))
+
+async def receive_messages(websocket, queue):
+    """
+    Read client messages into a queue, ending with None once the client disconnects
+    
+    Args:
+        websocket (WebSocket): The connection
+        queue (asyncio.Queue): Queue of parsed messages
+    """
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            
+            data = message.get("text")
+            if data is None:
+                data = message.get("bytes") or b""
+            CHAT_SESSION_BYTES.labels("received").inc(len(data))
+            
+            if queue.qsize() >= MAX_PENDING_MESSAGES:
+                await websocket.close(code=1008, reason="Too many pending messages")
+                return
+            try:
+                queue.put_nowait(json_codec.loads(data))
+            except ValueError:
+                queue.put_nowait(ValueError("Messages must be JSON"))
+    except Exception:
+        # The connection broke without a close handshake
+        pass
+    finally:
+        queue.put_nowait(None)
+
+async def handle_message(websocket, session, message):
+    """
+    Handle one client message
+    
+    Args:
+        websocket (WebSocket): The connection
+        session (ChatSession): The session of the connection, None before a start message
+        message (dict): The message
+        
+    Returns:
+        ChatSession: The session of the connection after the message
+    """
+    if not isinstance(message, dict):
+        error = str(message) if isinstance(message, ValueError) else "Messages must be JSON objects"
+        await send_event(websocket, {"type": "error", "error": error})
+        return session
+    
+    message_type = message.get("type", "message")
+    
+    if message_type == "start":
+        try:
+            new_session = chat_sessions.open_session(
+                message.get("modelName"),
+                message.get("sessionId"),
+                message.get("conversationHistory")
+            )
+        except ValueError as e:
+            await send_event(websocket, {"type": "error", "error": str(e)})
+            return session
+        
+        if session is not None and session is not new_session:
+            chat_sessions.detach(session, websocket)
+        chat_sessions.attach(new_session, websocket)
+        await send_session_event(websocket, new_session)
+        return new_session
+    
+    if session is None or session.websocket is not websocket:
+        error = "Send a start message first" if session is None else "The session is no longer held by this connection"
+        await send_event(websocket, {"type": "error", "error": error})
+        return session
+    
+    if message_type == "reset":
+        chat_sessions.reset(session)
+        await send_session_event(websocket, session)
+        return session
+    
+    if message_type != "message":
+        await send_event(websocket, {"type": "error", "error": f"Unknown message type: {message_type}"})
+        return session
+    
+    start_time = time.perf_counter()
+    try:
+        if message.get("stream"):
+            time_to_first_chunk_ms = None
+            async with aclosing(chat_sessions.stream_reply(session, message)) as chunks:
+                async for chunk in chunks:
+                    if time_to_first_chunk_ms is None:
+                        time_to_first_chunk_ms = (time.perf_counter() - start_time) * 1000
+                    await send_event(websocket, {"type": "chunk", "data": chunk})
+            await send_event(websocket, {
+                "type": "done",
+                "turns": len(session.history),
+                "timeToFirstChunkMs": round(time_to_first_chunk_ms, 2) if time_to_first_chunk_ms is not None else None,
+                "totalMs": round((time.perf_counter() - start_time) * 1000, 2)
+            })
+        else:
+            reply = await chat_sessions.reply(session, message)
+            await send_event(websocket, {
+                "type": "reply",
+                "data": reply,
+                "turns": len(session.history),
+                "totalMs": round((time.perf_counter() - start_time) * 1000, 2)
+            })
+    except ModelOverloadedError as e:
+        await send_event(websocket, {"type": "error", "error": str(e), "status": e.status_code, "retryAfter": e.retry_after})
+    except (DeadlineExceededError, ClientDisconnectedError) as e:
+        await send_event(websocket, {"type": "error", "error": str(e), "status": e.status_code})
+    except ValueError as e:
+        await send_event(websocket, {"type": "error", "error": str(e), "status": 400})
+    except Exception:
+        logging.exception("Error processing session message")
+        await send_event(websocket, {"type": "error", "error": "Error processing your request.", "status": 500})
+    return session
+
+async def send_session_event(websocket, session):
+    await send_event(websocket, {
+        "type": "session",
+        "sessionId": session.id,
+        "modelName": session.model_name,
+        "turns": len(session.history)
+    })
+
+@router.websocket(ENDPOINT)
+async def chat_session(websocket: WebSocket):
+    """
+    Chat over a WebSocket with the history kept on the server
+    
+    The client first sends {"type": "start", "modelName": ...}, optionally with
+    the sessionId of a session to resume and the conversationHistory to start
+    from, and gets {"type": "session", "sessionId": ...} back. Each turn is then
+    {"type": "message", "userMessage": ..., "stream": false}, answered with
+    {"type": "reply", "data": ...}, or with {"type": "chunk", "data": ...}
+    events and a final {"type": "done"} when streaming. {"type": "reset"}
+    clears the history. Failures are sent as {"type": "error", "error": ...}.
+    A turn still running when the client disconnects is cancelled.
+    
+    Args:
+        websocket (WebSocket): The connection
+    """
+    await websocket.accept()
+    
+    queue = asyncio.Queue()
+    reader = asyncio.create_task(receive_messages(websocket, queue))
+    session = None
+    try:
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            
+            turn = asyncio.ensure_future(handle_message(websocket, session, message))
+            await asyncio.wait({turn, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if not turn.done():
+                # Client went away during the turn, stop the model
+                turn.cancel()
+                await asyncio.wait({turn})
+                break
+            
+            try:
+                session = turn.result()
+            except Exception:
+                # Sending failed because the client went away
+                break
+    finally:
+        reader.cancel()
+        if session is not None:
+            chat_sessions.detach(session, websocket)
+
+@router.get("/api/sessions")
+async def get_session_stats():
+    """
+    Get chat session statistics
+    
+    Returns:
+        dict: Session counts, memory use and counters
+    """
+    return chat_sessions.get_stats()
+
+def setup_routes(app, sessions):
+    """
+    Setup chat session routes for the application
+    
+    Args:
+        app: The FastAPI application
+        sessions: The ChatSessionManager instance
+    """
+    global chat_sessions
+    chat_sessions = sessions
+    app.include_router(router)
@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+
+from src.jsonCodec import json_codec
+from src.middlewares.logShipper import log_shipper
+from src.middlewares.trafficCapture import traffic_capture
+from src.models.vectorIndex import vector_store
+
+# Create a router instance
+router = APIRouter()
+
+# Reference to model manager (to be set in setup)
+model_manager = None
+
+@router.get("/api/stats")
+async def get_stats():
+    """
+    Get runtime statistics of the service
+    
+    Returns:
+        dict: Statistics such as batching queue depths, batch-size histograms and log shipping counts
+    """
+    stats = model_manager.get_stats()
+    stats["logShipper"] = log_shipper.get_stats()
+    stats["trafficCapture"] = traffic_capture.get_stats()
+    stats["vectorCollections"] = vector_store.get_stats()
+    stats["jsonCodec"] = json_codec.name
+    return stats
+
+def setup_routes(app, manager):
+    """
+    Setup stats routes for the application
+    
+    Args:
+        app: The FastAPI application
+        manager: The ModelManager instance
+    """
+    global model_manager
+    model_manager = manager
+    app.include_router(router)
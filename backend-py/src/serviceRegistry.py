@@ -1,4 +1,5 @@
 import os
+import random
 import logging
 import asyncio
 import aiohttp
@@ -8,84 +9,198 @@ from typing import Dict, List, Optional
 class ServiceRegistry:
     """
     Handles registering with Service Registry in cluster mode.
+
+    One pooled HTTP session is used for the whole lifetime of the service.
+    After registering, the service sends periodic heartbeats carrying its
+    current load so the proxy can balance by load. Failed registrations are
+    retried with exponential backoff and jitter.
     """
-    
-    def __init__(self, model_manager):
+
+    def __init__(self, model_manager, get_load=None):
         """
         Initialize the ServiceRegistry
-        
+
         Args:
             model_manager: The ModelManager instance
+            get_load (callable): Returns the load reported in heartbeats, defaults to the model manager's load
         """
         self.registry_url = os.environ.get("REGISTRY_URL")
         self.service_url = os.environ.get("SERVICE_URL")
         self.enabled = bool(self.registry_url)
         self.model_manager = model_manager
-        
+        self.get_load = get_load or model_manager.get_load
+
+        self.heartbeat_interval = int(os.environ.get("REGISTRY_HEARTBEAT_INTERVAL_MS", 10000)) / 1000
+        self.retry_base_delay = int(os.environ.get("REGISTRY_RETRY_BASE_MS", 1000)) / 1000
+        self.retry_max_delay = int(os.environ.get("REGISTRY_RETRY_MAX_MS", 60000)) / 1000
+
+        self.session = None
+        self.heartbeat_task = None
+        self.registration_task = None
+        self.reregister = False
+
+    def get_session(self):
+        """
+        Get the shared HTTP session, creating it on first use
+
+        Returns:
+            aiohttp.ClientSession: The session
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=2, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=5),
+                headers={"Content-Type": "application/json"}
+            )
+        return self.session
+
+    def get_retry_delay(self, attempt):
+        """
+        Get the delay before a retry, exponential with full jitter
+
+        Args:
+            attempt (int): Number of attempts made so far
+
+        Returns:
+            float: Delay in seconds
+        """
+        delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt))
+        return random.uniform(0, delay)
+
+    def schedule_registration(self):
+        """
+        Register in the background, e.g. after the model set changed
+
+        Only one registration runs at a time. A change while one is being
+        sent makes it send again once done, so the registry ends up with the
+        latest models however many changes came in.
+
+        Returns:
+            asyncio.Task: The running registration
+        """
+        if self.registration_task is not None and not self.registration_task.done():
+            self.reregister = True
+        else:
+            self.registration_task = asyncio.create_task(self.register())
+        return self.registration_task
+
     async def register(self):
         """
-        Register this service with the registry
+        Register this service with the registry, retrying until it succeeds,
+        and start sending heartbeats
         """
         if not self.enabled:
             return
-        
+
+        attempt = 0
+        while True:
+            self.reregister = False
+            if await self._send_registration():
+                if not self.reregister:
+                    break
+                continue
+            delay = self.get_retry_delay(attempt)
+            attempt += 1
+            logging.info(f"Retrying registration in {delay:.1f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+        if self.heartbeat_task is None or self.heartbeat_task.done():
+            self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def _send_registration(self):
+        """
+        Send one registration request
+
+        Returns:
+            bool: True if the registry accepted it
+        """
         try:
             models = [
                 {"name": model["name"], "type": model["type"]}
-                for model in self.model_manager.available_models
+                for model in self.model_manager.catalog.get_models()
             ]
-            
+
             logging.info(f"Registering with registry at {self.registry_url} with {len(models)} models")
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.registry_url}/register",
-                    headers={"Content-Type": "application/json"},
-                    json={
-                        "url": self.service_url,
-                        "models": models
-                    }
-                ) as response:
-                    if response.status != 200:
-                        error = await response.text()
-                        logging.error(f"Failed to register with registry: {error}")
-                        
-                        # Retry registration after delay
-                        asyncio.create_task(self._retry_register())
+
+            async with self.get_session().post(
+                f"{self.registry_url}/register",
+                json={
+                    "url": self.service_url,
+                    "models": models
+                }
+            ) as response:
+                if response.status != 200:
+                    error = await response.text()
+                    logging.error(f"Failed to register with registry: {error}")
+                    return False
         except Exception as e:
             logging.error(f"Error registering with registry: {str(e)}")
-            
-            # Retry registration after delay
-            asyncio.create_task(self._retry_register())
-    
-    async def _retry_register(self):
+            return False
+
+        return True
+
+    async def _heartbeat_loop(self):
         """
-        Retry registration after a delay
+        Periodically report the current load to the registry
         """
-        await asyncio.sleep(10)
-        await self.register()
-    
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+
+            try:
+                async with self.get_session().post(
+                    f"{self.registry_url}/heartbeat",
+                    json={
+                        "url": self.service_url,
+                        "load": self.get_load()
+                    }
+                ) as response:
+                    if response.status == 404:
+                        # The registry lost our registration, e.g. after a restart
+                        logging.warning("Registry does not know this service, registering again")
+                        await self._send_registration()
+                    elif response.status != 200:
+                        logging.warning(f"Heartbeat rejected by registry: {await response.text()}")
+            except Exception as e:
+                logging.warning(f"Error sending heartbeat to registry: {str(e)}")
+
     async def unregister(self):
         """
-        Unregister this service from the registry
+        Unregister this service from the registry, stopping a registration still in progress
         """
+        if self.registration_task is not None:
+            self.registration_task.cancel()
+            try:
+                await self.registration_task
+            except asyncio.CancelledError:
+                pass
+            self.registration_task = None
+
         if not self.enabled:
             return
-        
+
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            try:
+                await self.heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self.heartbeat_task = None
+
         try:
             logging.info(f"Unregistering from registry at {self.registry_url}")
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.delete(
-                    f"{self.registry_url}/unregister",
-                    headers={"Content-Type": "application/json"},
-                    json={
-                        "url": self.service_url
-                    }
-                ) as response:
-                    if response.status != 200:
-                        error = await response.text()
-                        logging.error(f"Failed to unregister from registry: {error}")
+
+            async with self.get_session().delete(
+                f"{self.registry_url}/unregister",
+                json={
+                    "url": self.service_url
+                }
+            ) as response:
+                if response.status != 200:
+                    error = await response.text()
+                    logging.error(f"Failed to unregister from registry: {error}")
         except Exception as e:
             logging.error(f"Error unregistering from registry: {str(e)}")
-
+        finally:
+            if self.session is not None:
+                await self.session.close()
+                self.session = None
@@ -0,0 +1,198 @@
+import os
+import glob
+import time
+import asyncio
+import logging
+
+from src.jsonCodec import json_codec
+from src.metrics import registry
+
+class WorkerState:
+    """
+    Shares readiness, load and metrics between the workers of a multi-worker node.
+
+    Every worker periodically writes a snapshot to its own file in a state
+    directory shared by the node. Any worker can then answer /metrics and report
+    load for the whole node by adding the other workers' snapshots to its own.
+    Only used when the server runs with more than one worker.
+    """
+
+    def __init__(self):
+        self.state_dir = None
+        self.worker_id = None
+        self.worker_count = 1
+        self.interval = int(os.environ.get("BACKEND_WORKER_STATE_INTERVAL_MS", 1000)) / 1000
+        self.model_manager = None
+        self.task = None
+
+    @property
+    def enabled(self):
+        return self.state_dir is not None
+
+    @property
+    def is_primary(self):
+        """
+        Whether this process acts for the whole node, e.g. towards the registry
+        """
+        return not self.enabled or self.worker_id == 0
+
+    def configure(self, state_dir, worker_id, worker_count):
+        """
+        Make this process a worker of a multi-worker node
+
+        Args:
+            state_dir (str): Directory shared by the workers of the node
+            worker_id (int): Index of this worker, 0 is the primary
+            worker_count (int): Number of workers of the node
+        """
+        self.state_dir = state_dir
+        self.worker_id = worker_id
+        self.worker_count = worker_count
+
+    def get_path(self, worker_id):
+        return os.path.join(self.state_dir, f"worker-{worker_id}.json")
+
+    def start(self, model_manager):
+        """
+        Start publishing snapshots of this worker
+
+        Args:
+            model_manager: The ModelManager instance
+        """
+        self.model_manager = model_manager
+        if self.enabled and self.task is None:
+            self.task = asyncio.create_task(self._publish_loop())
+
+    async def stop(self):
+        """
+        Stop publishing snapshots
+        """
+        if self.task is None:
+            return
+
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    def snapshot(self):
+        """
+        Get the snapshot of this worker
+
+        Returns:
+            dict: Readiness, load and metrics of this worker
+        """
+        return {
+            "workerId": self.worker_id,
+            "pid": os.getpid(),
+            "updatedAt": time.time(),
+            "ready": self.model_manager.ready,
+            "load": self.model_manager.get_load(),
+            "metrics": registry.snapshot()
+        }
+
+    def publish(self):
+        """
+        Write the snapshot of this worker, replacing the previous one atomically
+        """
+        path = self.get_path(self.worker_id)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as state_file:
+            state_file.write(json_codec.dumps(self.snapshot()))
+        os.replace(temporary_path, path)
+
+    async def _publish_loop(self):
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                logging.warning(f"Failed to publish state of worker {self.worker_id}: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def read_other_workers(self):
+        """
+        Read the latest snapshots of the other workers of the node
+
+        Returns:
+            list: Snapshots
+        """
+        snapshots = []
+        for path in glob.glob(os.path.join(self.state_dir, "worker-*.json")):
+            if path == self.get_path(self.worker_id):
+                continue
+            try:
+                with open(path, "rb") as state_file:
+                    snapshots.append(json_codec.loads(state_file.read()))
+            except (OSError, ValueError):
+                # The worker is gone or being replaced
+                continue
+        return snapshots
+
+    def all_workers_ready(self):
+        """
+        Whether every worker of the node has warmed up its models
+
+        Returns:
+            bool: True once all workers reported ready
+        """
+        others = self.read_other_workers()
+        return self.model_manager.ready and len(others) >= self.worker_count - 1 and all(
+            snapshot["ready"] for snapshot in others
+        )
+
+    async def wait_for_workers(self):
+        """
+        Wait until every worker of the node is ready
+        """
+        if not self.enabled:
+            return
+
+        while not self.all_workers_ready():
+            await asyncio.sleep(self.interval)
+
+    def render_metrics(self):
+        """
+        Render the metrics of the node in the Prometheus text format
+
+        Returns:
+            str: Metrics of this worker added up with the other workers' snapshots
+        """
+        if not self.enabled:
+            return registry.render()
+        return registry.render([snapshot["metrics"] for snapshot in self.read_other_workers()])
+
+    def get_node_load(self):
+        """
+        Get the load of the node as reported to the registry
+
+        In-flight and queued calls add up over the workers, latency percentiles
+        are the worst of any worker.
+
+        Returns:
+            dict: Totals and per-model in-flight, queued and latency figures
+        """
+        load = self.model_manager.get_load()
+        if not self.enabled:
+            return load
+
+        models = {name: dict(model_load) for name, model_load in load["models"].items()}
+        for snapshot in self.read_other_workers():
+            for name, model_load in snapshot["load"]["models"].items():
+                combined = models.setdefault(name, {"inFlight": 0, "queued": 0, "p50Ms": None, "p95Ms": None})
+                combined["inFlight"] += model_load["inFlight"]
+                combined["queued"] += model_load["queued"]
+                for key in ("p50Ms", "p95Ms"):
+                    values = [value for value in (combined[key], model_load[key]) if value is not None]
+                    combined[key] = max(values) if values else None
+
+        return {
+            "inFlight": sum(model_load["inFlight"] for model_load in models.values()),
+            "queued": sum(model_load["queued"] for model_load in models.values()),
+            "workers": self.worker_count,
+            "models": models
+        }
+
+# Create a singleton instance
+worker_state = WorkerState()
@@ -9,7 +9,8 @@ const port = process.env.LOGGER_PORT;
 
 // Use middleware
 useCors(app);
-app.use(express.json());
+// Bulk log requests from backends carry many entries
+app.use(express.json({ limit: '10mb' }));
 useLogger(app);
 
 // Attach routes
@@ -28,6 +28,24 @@ class LogDatabase {
     });
   }
 
+  /**
+   * Insert many log entries into the database at once
+   * @param {Array<Object>} logEntries - The log entries to insert
+   * @returns {Promise<Array<Object>>} - The inserted documents
+   */
+  insertLogs(logEntries) {
+    return new Promise((resolve, reject) => {
+      this.db.insert(logEntries, (err, newDocs) => {
+        if (err) {
+          console.error('Failed to insert logs:', err);
+          reject(err);
+        } else {
+          resolve(newDocs);
+        }
+      });
+    });
+  }
+
   /**
    * Query logs with pagination and time filtering
    * @param {Object} options - Query options
@@ -16,6 +16,23 @@ module.exports.attach = app => {
     }
   });
 
+  /**
+   * Insert many log entries at once
+   */
+  app.post('/api/logs/bulk', async (req, res) => {
+    try {
+      const logEntries = req.body;
+      if (!Array.isArray(logEntries)) {
+        return res.status(400).json({ error: 'Request body must be an array of log entries' });
+      }
+      const newDocs = await logDb.insertLogs(logEntries);
+      res.status(201).json({ message: 'Logs saved successfully', count: newDocs.length });
+    } catch (error) {
+      console.error('Failed to insert logs:', error);
+      res.status(500).json({ error: 'Failed to save logs' });
+    }
+  });
+
   /**
    * Query logs with pagination
    */
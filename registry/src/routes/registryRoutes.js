@@ -59,4 +59,33 @@ module.exports.attach = (app, registry) => {
       });
     }
   });
+
+  /**
+   * Receive a heartbeat with the current load of a service
+   * POST /heartbeat
+   * Request body: { url: string, load: object }
+   */
+  app.post('/heartbeat', (req, res) => {
+    const { url, load } = req.body;
+
+    if (!url) {
+      return res.status(400).json({
+        success: false,
+        error: 'Missing required field: url'
+      });
+    }
+
+    const success = registry.updateServiceLoad(url, load);
+
+    if (success) {
+      res.status(200).json({
+        success: true
+      });
+    } else {
+      res.status(404).json({
+        success: false,
+        error: 'Service not registered'
+      });
+    }
+  });
 }
\ No newline at end of file
@@ -32,7 +32,13 @@ class ServiceRegistry {
     }
 
     console.log(`Registering service: ${url} with ${models.length} models`);
-    
+
+    // A service announces its whole model set again when it changes, so drop
+    // the index entries of models it no longer serves
+    if (this.services[url]) {
+      this.unregisterService(url);
+    }
+
     // Create or update service entry
     this.services[url] = {
       url,
@@ -190,6 +196,22 @@ class ServiceRegistry {
     }
   }
 
+  /**
+   * Update the load reported by a service heartbeat
+   * A heartbeat also counts as a successful health check.
+   * @param {string} url - URL of the service
+   * @param {Object} load - Load data, e.g. { inFlight, queued, models: { name: { inFlight, queued, p50Ms, p95Ms } } }
+   * @returns {boolean} - False if the service is not registered
+   */
+  updateServiceLoad(url, load) {
+    if (!this.services[url]) return false;
+
+    this.services[url].load = load || {};
+    this.services[url].lastHeartbeat = Date.now();
+    this.updateServiceHealth(url, true);
+    return true;
+  }
+
   startHealthChecks() {
     this.checker.startHealthChecks();
   }